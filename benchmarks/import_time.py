@@ -0,0 +1,101 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCHMARKS_DIR.parent
+
+DEFAULT_MODULES = ("src.generate_terraform", "src.run_batch", "src.run_ui")
+
+# Packages that must not be loaded by importing the pipeline modules, they are imported when an LLM client
+# or agents are actually built
+DEFERRED_PACKAGES = ("autogen", "agentic_framework", "openai", "tiktoken", "chromadb")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+loaded = sorted(name for name in {packages!r} if name in sys.modules)
+print("IMPORT_RESULT " + json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def _run_probe(module: str, *python_options: str) -> subprocess.CompletedProcess:
+    command = [sys.executable, *python_options, "-c", PROBE.format(module=module, packages=DEFERRED_PACKAGES)]
+    return subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+
+
+def _error(completed: subprocess.CompletedProcess) -> str:
+    lines = completed.stderr.strip().splitlines()
+    return lines[-1] if lines else "no result"
+
+
+def measure_import(module: str, repeats: int = 5) -> Dict[str, Any]:
+    """
+    Cold import time of the module, each measurement runs in a fresh interpreter.
+    The first (bytecode compiling) run is not counted.
+    """
+    _run_probe(module)
+    timings = []
+    loaded: list[str] = []
+    for _ in range(repeats):
+        completed = _run_probe(module)
+        result = next((json.loads(line[len("IMPORT_RESULT "):]) for line in completed.stdout.splitlines()
+                       if line.startswith("IMPORT_RESULT ")), None)
+        if result is None:
+            return {"error": _error(completed)}
+        timings.append(result["seconds"])
+        loaded = result["loaded"]
+    return {
+        "median_seconds": round(statistics.median(timings), 4),
+        "min_seconds": round(min(timings), 4),
+        "deferred_packages_loaded": loaded,
+    }
+
+
+def import_profile(module: str, top: int = 15) -> list[tuple[str, float]]:
+    """
+    Slowest imported packages (cumulative seconds) from `python -X importtime`.
+    """
+    completed = _run_probe(module, "-X", "importtime")
+    entries = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(cumulative) / 1_000_000))
+    return sorted(entries, key=lambda entry: entry[1], reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold import time of the pipeline entry points.")
+    parser.add_argument("--modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="Also print the N slowest imported packages of every module")
+    parser.add_argument("--max-seconds", type=float, help="Fail if a median import time is above this budget")
+    args = parser.parse_args()
+
+    failures = []
+    for module_name in args.modules:
+        metrics = measure_import(module_name, args.repeats)
+        print(f"{module_name}: {metrics}")
+        if "error" in metrics:
+            failures.append(f"{module_name}: import failed with {metrics['error']}")
+            continue
+        if metrics["deferred_packages_loaded"]:
+            failures.append(f"{module_name}: loads {', '.join(metrics['deferred_packages_loaded'])} at import time")
+        if args.max_seconds is not None and metrics["median_seconds"] > args.max_seconds:
+            failures.append(f"{module_name}: {metrics['median_seconds']}s > budget {args.max_seconds}s")
+        for package, seconds in import_profile(module_name, args.profile) if args.profile else []:
+            print(f"    {seconds:8.3f}s  {package}")
+
+    if failures:
+        print("Import time regressions:\n" + "\n".join(failures))
+        sys.exit(1)
+    print("No import time regressions.")
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCHMARKS_DIR.parent
+FIXTURES_DIR = REPO_ROOT / "infrastructure_data_examples"
+DEFAULT_RECORDING = BENCHMARKS_DIR / "recordings" / "default.json"
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+
+# Synthetic repository sizes (number of application source files next to the fixture docs)
+SYNTHETIC_SIZES = (10, 100, 1000)
+
+# Allowed relative growth of each metric before it is reported as a regression
+TOLERANCES = {
+    "rounds": 0.0,
+    "tool_calls": 0.0,
+    "llm_requests": 0.0,
+    "prompt_tokens": 0.10,
+    "completion_tokens": 0.10,
+    "wall_time": 0.50,
+    "peak_memory_mb": 0.25,
+}
+
+AGENT_CATEGORIES = {"init", "analysis", "generation", "tool_executor", "executor"}
+
+
+def make_synthetic_repo(path: Path, n_files: int) -> Path:
+    """
+    Create a source repository with the fixture docs/diagram, a few deployment configs and n application files.
+    """
+    shutil.copytree(FIXTURES_DIR, path)
+    (path / "Dockerfile").write_text("FROM eclipse-temurin:17-jre\nCOPY app.jar /app.jar\nEXPOSE 8080\n")
+    (path / "deploy").mkdir()
+    (path / "deploy" / "app.yaml").write_text("replicas: 3\ndatabase: mysql\nport: 8080\n")
+    for index in range(n_files):
+        package_dir = path / "src" / "main" / "java" / f"pkg{index // 50}"
+        package_dir.mkdir(parents=True, exist_ok=True)
+        (package_dir / f"Service{index}.java").write_text(
+            f"package pkg{index // 50};\n\npublic class Service{index} {{\n"
+            f"    public int handle(int value) {{ return value * {index}; }}\n}}\n"
+        )
+    return path
+
+
+def run_scenario(source_dir: str, dest_dir: str, recording: str) -> Dict[str, Any]:
+    """
+    Run the full workflow against the stub backend in the current process and collect metrics.
+    Must run in a fresh process: the LLM configuration is cached by the pipeline on first use and
+    peak memory is measured per process.
+    """
+    sys.path.insert(0, str(REPO_ROOT))
+    from benchmarks.stub_server import start_stub_server
+
+    # One stub server stands in for the large model, another one for the local model of cheap steps
+    server, backend = start_stub_server(recording)
+    local_server, local_backend = start_stub_server(recording)
+    os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ.setdefault("MODEL_NAME", "gpt-4o")
+    os.environ["LLAMA_API_BASE"] = f"http://127.0.0.1:{local_server.server_address[1]}"
+    os.environ.setdefault("LLAMA_MODEL_NAME", "stub-local")
+    os.environ["LLM_CACHE_DISABLED"] = "true"
+    os.environ["INCREMENTAL_ENABLED"] = "false"
+    os.environ["TRACE_DIR"] = ""
+
+    from src.generate_terraform import generate_terraform_infrastructure
+    from src.pipeline.instrumentation import RunTrace
+
+    trace = RunTrace(os.path.basename(source_dir))
+    started = time.perf_counter()
+    error = None
+    try:
+        generate_terraform_infrastructure(source_dir, dest_dir, trace=trace)
+    except Exception as e:
+        error = str(e)
+    wall_time = time.perf_counter() - started
+    server.shutdown()
+    local_server.shutdown()
+
+    stats = backend.stats()
+    metrics = {
+        "rounds": sum(1 for span in trace.spans if span["category"] in AGENT_CATEGORIES),
+        "tool_calls": sum(1 for span in trace.spans if span["category"] == "tool"),
+        "llm_requests": stats["requests"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "local_llm_requests": local_backend.stats()["requests"],
+        "wall_time": round(wall_time, 3),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if error:
+        metrics["error"] = error
+    return metrics
+
+
+def _run_in_subprocess(source_dir: Path, dest_dir: Path, recording: str) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "benchmarks.run_benchmark", "--scenario", str(source_dir), str(dest_dir),
+               "--recording", recording]
+    completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("BENCHMARK_RESULT "):
+            return json.loads(line[len("BENCHMARK_RESULT "):])
+    return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no result"}
+
+
+def run_benchmarks(recording: str, sizes: tuple[int, ...] = SYNTHETIC_SIZES) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        scenarios = {"fixtures": shutil.copytree(FIXTURES_DIR, tmp_dir / "fixtures")}
+        for size in sizes:
+            scenarios[f"synthetic_{size}"] = make_synthetic_repo(tmp_dir / f"synthetic_{size}", size)
+
+        for name, source_dir in scenarios.items():
+            dest_dir = tmp_dir / f"{name}_dest"
+            dest_dir.mkdir()
+            results[name] = _run_in_subprocess(source_dir, dest_dir, recording)
+            print(f"{name}: {results[name]}")
+    return results
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> list[str]:
+    """
+    Return a list of regressions: metrics that grew more than their tolerance over the baseline.
+    """
+    regressions = []
+    for scenario, metrics in results.items():
+        if "error" in metrics:
+            regressions.append(f"{scenario}: failed with {metrics['error']}")
+            continue
+        for metric, tolerance in TOLERANCES.items():
+            expected = baseline.get(scenario, {}).get(metric)
+            if expected is None:
+                continue
+            if metrics[metric] > expected * (1 + tolerance):
+                regressions.append(f"{scenario}.{metric}: {metrics[metric]} > baseline {expected} (+{tolerance:.0%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline performance benchmark of the Terraform generation workflow.")
+    parser.add_argument("--recording", default=str(DEFAULT_RECORDING))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SYNTHETIC_SIZES))
+    parser.add_argument("--scenario", nargs=2, metavar=("SOURCE", "DEST"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print("BENCHMARK_RESULT " + json.dumps(run_scenario(args.scenario[0], args.scenario[1], args.recording)))
+        sys.exit(0)
+
+    benchmark_results = run_benchmarks(args.recording, tuple(args.sizes))
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(benchmark_results, baseline_file, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline found at {args.baseline}, run with --update-baseline first")
+        sys.exit(1)
+    with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+        found = compare_with_baseline(benchmark_results, json.load(baseline_file))
+    if found:
+        print("Performance regressions:\n  " + "\n  ".join(found))
+        sys.exit(1)
+    print("No performance regressions")
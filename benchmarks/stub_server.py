@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+NEED_TOOL_PATTERN = re.compile(r"NEED_TOOL\s*\n\s*Tool:?\s*\{?(\w+)\}?\s*\n(\{.*?\})\s*(?=NEED_TOOL|$)", re.DOTALL)
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """
+    Key of a recorded exchange: hash of the request messages (model and sampling params are ignored).
+    """
+    return hashlib.sha256(json.dumps(body.get("messages"), sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _estimate_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value, default=str)) // 4)
+
+
+class StubBackend:
+    """
+    OpenAI compatible chat completions backend answering from a recording.
+
+    A recording has exact 'exchanges' (request hash -> response message, captured in record mode) and
+    'rules' matched against the system message. A rule either replays 'responses' in order (indexed by the
+    number of assistant messages already in the conversation) or, with "handler": "need_tool", turns the
+    NEED_TOOL requests of the last message into tool calls.
+    """
+
+    def __init__(self, recording: Dict[str, Any], upstream: Optional[str] = None, record_path: Optional[str] = None):
+        self.recording = recording
+        self.recording.setdefault("exchanges", {})
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_path = record_path
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def _rule_message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages", [])
+        system = " ".join(str(m.get("content")) for m in messages if m.get("role") == "system")
+        for rule in self.recording.get("rules", []):
+            if rule["match"].lower() not in system.lower():
+                continue
+            if rule.get("handler") == "need_tool":
+                return self._need_tool_message(messages)
+            responses = rule["responses"]
+            turn = sum(1 for m in messages if m.get("role") == "assistant")
+            return self._to_message(responses[min(turn, len(responses) - 1)])
+        return self._to_message(self.recording.get("default", "OK"))
+
+    @staticmethod
+    def _to_message(response: Any) -> Dict[str, Any]:
+        if isinstance(response, str):
+            return {"role": "assistant", "content": response}
+        message = {"role": "assistant", "content": response.get("content")}
+        if response.get("tool_calls"):
+            message["tool_calls"] = [
+                {"id": f"call_{index}", "type": "function",
+                 "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}}
+                for index, call in enumerate(response["tool_calls"])
+            ]
+        return message
+
+    @staticmethod
+    def _need_tool_message(messages: list[Dict[str, Any]]) -> Dict[str, Any]:
+        last = str(messages[-1].get("content", "")) if messages else ""
+        calls = NEED_TOOL_PATTERN.findall(last)
+        if not calls:
+            return {"role": "assistant", "content": "TOOL_RESULT\nResult: no tool request found"}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": f"call_{index}", "type": "function", "function": {"name": name, "arguments": arguments}}
+                for index, (name, arguments) in enumerate(calls)
+            ],
+        }
+
+    def _forward(self, path: str, body: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        request = urllib.request.Request(f"{self.upstream}{path}", data=json.dumps(body).encode("utf-8"),
+                                         headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return json.loads(response.read())
+
+    def complete(self, path: str, body: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        key = request_key(body)
+        if self.upstream:
+            completion = self._forward(path, body, headers)
+            with self._lock:
+                self.recording["exchanges"][key] = completion["choices"][0]["message"]
+                if self.record_path:
+                    with open(self.record_path, "w", encoding="utf-8") as file:
+                        json.dump(self.recording, file, indent=2)
+        else:
+            message = self.recording["exchanges"].get(key) or self._rule_message(body)
+            usage = {"prompt_tokens": _estimate_tokens(body.get("messages")), "completion_tokens": _estimate_tokens(message)}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            completion = {
+                "id": f"stub-{key[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+                "usage": usage,
+            }
+
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += completion.get("usage", {}).get("prompt_tokens", 0)
+            self.completion_tokens += completion.get("usage", {}).get("completion_tokens", 0)
+        return completion
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens}
+
+
+def _make_handler(backend: StubBackend):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self.send_error(404, "Only chat completions are supported")
+                return
+            headers = {"Content-Type": "application/json"}
+            if self.headers.get("Authorization"):
+                headers["Authorization"] = self.headers["Authorization"]
+            payload = json.dumps(backend.complete(self.path, body, headers)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            payload = json.dumps(backend.stats()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def start_stub_server(recording_path: str, port: int = 0, upstream: Optional[str] = None,
+                      record: bool = False) -> tuple[ThreadingHTTPServer, StubBackend]:
+    """
+    Start the stub server in a daemon thread, port 0 picks a free port (see server.server_address).
+    """
+    with open(recording_path, "r", encoding="utf-8") as file:
+        recording = json.load(file)
+    backend = StubBackend(recording, upstream=upstream, record_path=recording_path if record else None)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(backend))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI compatible stub server replaying recorded LLM responses.")
+    parser.add_argument("--recording", default="benchmarks/recordings/default.json")
+    parser.add_argument("--port", type=int, default=4444)
+    parser.add_argument("--upstream", help="Forward requests to this base URL and record the responses")
+    args = parser.parse_args()
+
+    stub_server, _ = start_stub_server(args.recording, args.port, upstream=args.upstream, record=bool(args.upstream))
+    print(f"Stub LLM server listening on http://127.0.0.1:{stub_server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub_server.shutdown()
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(Path.home(), ".cache", "infrastructure_to_terraform", "llm")
+
+
+def file_digest(file_path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the sha256 hex digest of a file, reading it in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent on-disk cache for LLM responses.
+
+    Entries are stored as JSON files keyed by a hash of the request content (e.g. image bytes),
+    the prompt text and the model name. Old entries are dropped after `max_age_seconds`,
+    least recently used entries are evicted once `max_entries` or `max_bytes` is exceeded.
+    The size of the cache is tracked while entries are written, the directory is scanned only when a limit
+    is exceeded or every `evict_interval_seconds` (for expired entries and writes of other processes).
+    """
+
+    def __init__(
+            self,
+            cache_dir: Optional[str | Path] = None,
+            max_entries: int = 1000,
+            max_bytes: int = 100 * 1024 * 1024,
+            max_age_seconds: Optional[float] = 7 * 24 * 3600,
+            enabled: bool = True,
+            evict_interval_seconds: float = 300,
+    ):
+        self.cache_dir = Path(os.path.expanduser(str(cache_dir or DEFAULT_CACHE_DIR)))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.evict_interval_seconds = evict_interval_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (entries, bytes) of the cache directory, None until the first scan
+        self._usage: Optional[tuple[int, int]] = None
+        self._last_evict = 0.0
+
+    @staticmethod
+    def make_key(content_digest: str, prompt: str, model: Optional[str]) -> str:
+        """
+        Build the cache key from the content hash, the prompt text and the model name.
+        """
+        payload = json.dumps([content_digest, prompt, model or ""], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for the key or None if it is missing, expired or the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+
+        entry_path = self._entry_path(key)
+        try:
+            modified = entry_path.stat().st_mtime
+            if self.max_age_seconds is not None and time.time() - modified > self.max_age_seconds:
+                entry_path.unlink(missing_ok=True)
+                self._count(hit=False)
+                return None
+            with open(entry_path, "r", encoding="utf-8") as file:
+                value = json.load(file)["value"]
+            # Touch the entry so eviction keeps recently used responses
+            os.utime(entry_path)
+        except (OSError, ValueError, KeyError):
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a JSON-serializable value under the key and evict old entries if needed.
+        """
+        if not self.enabled:
+            return
+
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced_size: Optional[int] = entry_path.stat().st_size
+        except OSError:
+            replaced_size = None
+        tmp_path = entry_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"created": time.time(), "value": value}, file, ensure_ascii=False)
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, entry_path)
+
+        with self._lock:
+            if self._usage is not None:
+                entries, total_bytes = self._usage
+                self._usage = (entries + (replaced_size is None), total_bytes + size - (replaced_size or 0))
+            evict_due = (self._usage is None or self._usage[0] > self.max_entries or self._usage[1] > self.max_bytes
+                         or time.monotonic() - self._last_evict > self.evict_interval_seconds)
+        if evict_due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove expired entries and the least recently used ones above the size limits.
+        Returns the number of removed entries.
+        """
+        if not self.cache_dir.is_dir():
+            return 0
+
+        entries = []
+        for entry_path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        now = time.time()
+        removed = 0
+        kept = []
+        for modified, size, entry_path in entries:
+            if self.max_age_seconds is not None and now - modified > self.max_age_seconds:
+                entry_path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                kept.append((modified, size, entry_path))
+
+        # Newest first, drop everything that does not fit into the limits
+        kept.sort(key=lambda entry: entry[0], reverse=True)
+        total_bytes = 0
+        kept_entries = kept_bytes = 0
+        for index, (_, size, entry_path) in enumerate(kept):
+            total_bytes += size
+            if index >= self.max_entries or total_bytes > self.max_bytes:
+                entry_path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                kept_entries += 1
+                kept_bytes += size
+
+        with self._lock:
+            self._usage = (kept_entries, kept_bytes)
+            self._last_evict = time.monotonic()
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove all cache entries and reset counters.
+        """
+        for entry_path in self.cache_dir.glob("*/*.json"):
+            entry_path.unlink(missing_ok=True)
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._usage = (0, 0)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "enabled": self.enabled, "dir": str(self.cache_dir)}
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Return the process wide LLM response cache configured from environment variables.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        max_age_hours = os.getenv("LLM_CACHE_MAX_AGE_HOURS", "168")
+        _llm_cache = LLMResponseCache(
+            cache_dir=os.getenv("LLM_CACHE_DIR") or None,
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024),
+            max_age_seconds=float(max_age_hours) * 3600 if max_age_hours else None,
+            enabled=os.getenv("LLM_CACHE_DISABLED", "false").lower() not in ("1", "true", "yes"),
+        )
+    return _llm_cache
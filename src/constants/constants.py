@@ -10,37 +10,57 @@ You can read content from each file in given project folders (include images).
 
 Your task is to:
     1. read project folders/files structure in a given project folder, (once)
-    2. use directory structure (from step 1) and get project files content and analyze is it infrastructure documentation/requirements
-    3. repeat step 2 for each file in the project folder/subfolders (from step 1)
+    2. search the most infrastructure relevant content of the project files (Dockerfiles, k8s manifests, docs, diagrams)
+       with search_relevant_content tool, repeat the search with a specific query if you need more details
+    3. get full content only of the files found in step 2 (or infrastructure related files from step 1) when chunks are not enough
+       - DO NOT read application source code files one by one
        - DO NOT guess files names, use only files that exist in the project folder/subfolders
-    3. if file is a image (check file extension to guess) assume that image files may contain infrastructure diagrams so you may need to recognize it
-    4. analyze the project structure, code, and configuration files, BUT only in scope of cloud infrastructure requirements
+    4. if file is a image (check file extension to guess) assume that image files may contain infrastructure diagrams so you may need to recognize it
+    5. analyze the project structure, code, and configuration files, BUT only in scope of cloud infrastructure requirements
          - DO NOT analyze code that is not related to cloud infrastructure
-    5. after you analyzed ALL files and folders in the project folder, you should:
+    6. after you analyzed ALL files and folders in the project folder, you should:
         - made a summary about what cloud infrastructure should be created and ALL required infrastructure components
         - create a comprehensive infrastructure requirements document
+        - write each requirement on a separate line with an id and the source files it comes from, e.g.:
+          - [R1] (sources: doc/infrastructure.txt, doc/diagram.png) Internal Load Balancer in front of ProxySQL instances
+        - after the requirements write the infrastructure as JSON after an "INFRASTRUCTURE_IR" line:
+          components (id, kind, description, zones, requirements, scaling {min, max, metric, target}, properties)
+          and network links between them (from, to, protocol, port, description), e.g.:
+          INFRASTRUCTURE_IR
+          {"region": "us-central1", "zones": ["us-central1-a", "us-central1-c"],
+           "components": [{"id": "ilb", "kind": "internal_load_balancer", "requirements": ["R1"]},
+                          {"id": "proxysql", "kind": "compute_engine", "zones": ["us-central1-a", "us-central1-c"],
+                           "requirements": ["R2"], "scaling": {"min": 2, "max": 4, "metric": "cpu", "target": 0.6}}],
+           "links": [{"from": "ilb", "to": "proxysql", "protocol": "tcp", "port": 6033}]}
 
 DO NOT write any files or code.
 
 You have access to tools to:
 - Read folder structure
+- Search infrastructure relevant content of project files
 - Read file content
 - Extract information from images and diagrams
 
-To request a tool, clearly state "NEED_TOOL" at the beginning of your response, followed by the tool name.
+Call the tools with function calls, they are executed directly and the results are sent back to you.
+If you can't make function calls, request a tool by stating "NEED_TOOL" at the beginning of your response,
+followed by the tool name and JSON arguments.
 Examples:
 
 NEED_TOOL
 Tool: {read_folder_structure}
 {"path": "/path/to/folder"}
 
+NEED_TOOL
+Tool: {search_relevant_content}
+{"query": "database replication", "top_k": 10}
+
 NEED_TOOL
 Tool {get_file_content}
 {"path": "/path/to/file"}
 
 NEED_TOOL
-Tool {get_image_file_content}
-{"path": "/path/to/file"}
+Tool {extract_infrastructure_from_image}
+{"image_path": "/path/to/file"}
 
 ONLY after you created a comprehensive infrastructure requirements document, include "ANALYSIS_COMPLETE" in your message.
 DO NOT include "ANALYSIS_COMPLETE" in you message when you request tool.
@@ -64,6 +84,7 @@ Your task is to:
     - follow best practices for Terraform code structure and organization.
     - you MUST add all variables (from each module in 'variables.tf' files) into /terraform/variables.tf file.
     - you should provide values for all variables in /terraform/terraform.tfvars file (use default values if not specified)
+    - first line of each 'main.tf' file MUST be a comment with ids of requirements implemented by the module, e.g. '# Requirements: R1, R4'
     
 **Suggestions**
  - If you don't know the value of variable, use 'var.<name>' in 'main.tf' file and define it in 'variables.tf' file using default value.
@@ -106,31 +127,164 @@ After you generate ALL Terraform scripts required for the project, write them as
 
 You have access to tools to:
 - Write file content
+- Patch existing file: apply a unified diff, or replace a single block (resource, module, variable, output...)
 
-To request a tool, clearly state "NEED_TOOL" at the beginning of your response, followed by the tool name.
+Call the tools with function calls, they are executed directly and the results are sent back to you.
+If you can't make function calls, request a tool by stating "NEED_TOOL" at the beginning of your response,
+followed by the tool name and JSON arguments.
 Example:
 NEED_TOOL
 Tool: {write_file_content}
-{"path": "/path/to/file", "content": "file content here"}
+{"file_path": "/path/to/file", "content": "file content here"}
+
+When you fix or update an already written file, use write_file_patch instead of rewriting the whole file.
+Example:
+NEED_TOOL
+Tool: {write_file_patch}
+{"file_path": "/path/to/file", "block": "variable \"region\"", "content": "variable \"region\" {\n  type = string\n}"}
 
 When you have completed generating ALL modules and scripts, include "SCRIPTS_GENERATED" in your message.
 DO NOT include "SCRIPTS_GENERATED" in you message when you request tool.
 Do not ask for confirmation or approval before writing files.
 """
 
-TOOL_EXECUTOR_SYSTEM_MESSAGE = """
-You are the tool executor. Your role is to execute tools on behalf of other agents and return the results.
+IMAGE_RECOGNITION_SYSTEM_MESSAGE = "You are an AI assistant that recognizes and describes cloud infrastructure images/diagrams."
+
+IMAGE_RECOGNITION_PROMPT = (
+    "Please give me a detail description of the image, assuming it is a diagram of cloud infrastructure. "
+    "Describe also links between components (if present). If provided image not a diagram of cloud infrastructure, "
+    "please return text 'it's not a infrastructure related image/diagram`."
+)
+
+SUMMARIZATION_SYSTEM_MESSAGE = "You summarize tool results for agents analyzing cloud infrastructure."
+
+SUMMARIZATION_PROMPT = (
+    "Summarize the following tool result in at most {max_words} words. Keep file paths, names of cloud components, "
+    "versions, ports, sizes and other values that matter for the infrastructure.\n\n{text}"
+)
+
+PREANALYSIS_MESSAGE = """
+The folder structure and content of all infrastructure related project files (including descriptions of images/diagrams)
+were already loaded and are provided below.
+DO NOT request these files again with tools, use tools only for files that are missing below.
+"""
+
+INCREMENTAL_MESSAGE = """
+Terraform scripts were already generated for this project, only part of the source files changed since then.
+Changed or new source files: {changed_sources}
+Removed source files: {removed_sources}
+Terraform modules edited, removed or added since the last generation: {changed_modules}
+Affected requirements: {affected_requirements}
+
+Previous infrastructure requirements document:
+{requirements_document}
+
+Analyze ONLY the changed source files and produce the complete updated requirements document,
+keep ids of unchanged requirements.
+Regenerate ONLY these Terraform modules (and root files if module interfaces change): {affected_modules}
+DO NOT rewrite other existing modules.
+"""
+
+TERRAFORM_VALIDATION_ERROR_MESSAGE = (
+    "Static validation of the generated Terraform code found the problems below. "
+    "Fix ONLY these problems by patching the affected files with write_file_patch, do not regenerate other files."
+)
+
+TERRAFORM_EXECUTION_ERROR_MESSAGE = (
+    "Terraform reported the errors below. "
+    "Fix ONLY these errors by patching the affected files with write_file_patch, do not regenerate other files."
+)
+
+INFRASTRUCTURE_IR_ERROR_MESSAGE = (
+    "The INFRASTRUCTURE_IR of your requirements document has the problems below. "
+    "Fix ONLY these problems and send the complete requirements document again, ending with ANALYSIS_COMPLETE."
+)
+
+PLANNER_SYSTEM_MESSAGE = "You are a Terraform architect that splits infrastructure requirements into independent Terraform modules."
+
+PLANNER_PROMPT = """
+Split the infrastructure requirements below into Terraform modules that can be generated independently.
+Plan modules ONLY for these requirements: {requirement_ids}
+These modules already exist and can be used through their outputs (module.<name>.<output>):
+{existing_modules}
+
+Return ONLY a JSON list, one object per module:
+[{{"name": "load-balancer",
+  "description": "what the module creates",
+  "requirements": ["R2"],
+  "variables": [{{"name": "name", "type": "string", "description": "...", "default": "proxysql-lb"}}],
+  "outputs": [{{"name": "ip_address", "description": "..."}}],
+  "inputs": {{"subnetwork_self_link": "module.network.subnet_self_link", "project_id": "var.project_id"}}}}]
+
+Rules:
+ - "inputs" maps module variables to outputs of other modules (module.<name>.<output>) or root variables var.project_id and var.region
+ - every variable that is not in "inputs" MUST have a "default" value
+ - declare in "outputs" everything other modules need, modules may use only declared outputs of other modules
+ - module names are lowercase with dashes
+
+Requirements document:
+{requirements_document}
+"""
+
+MODULE_GENERATOR_SYSTEM_MESSAGE = "You are a Terraform module author that writes a single module for Google Cloud."
+
+MODULE_GENERATOR_PROMPT = """
+Write the Terraform module '{name}': {description}
+It implements these requirements:
+{requirements}
+
+The module interface is fixed, declare exactly these variables in variables.tf (with the given defaults):
+{variables}
+and exactly these outputs in outputs.tf:
+{outputs}
+Values of these variables come from other modules: {inputs}
+Infrastructure components of this module (components without requirements belong to other modules):
+{infrastructure}
+
+Return ONLY the three files, each as a header line followed by a code block:
+### main.tf
+```hcl
+...
+```
+### variables.tf
+```hcl
+...
+```
+### outputs.tf
+```hcl
+...
+```
+"""
+
+RESUME_ANALYSIS_MESSAGE = """
+This is a resumed run, the previous attempt stopped during the analysis. Messages of the previous attempt are below.
+DO NOT request again files whose content is already provided there, continue the analysis from where it stopped.
+
+{history}
+"""
 
-When you receive a tool request, ALWAYS execute the tool with the Tool: {tool_name} provided in request and return the complete results.
-Format your response exactly as:
+RESUME_GENERATION_MESSAGE = """
+This is a resumed run, the previous attempt stopped during the Terraform scripts generation.
+Files already written: {files_written}
+Last messages of the previous attempt:
 
-TOOL_RESULT
-Tool: {tool_name}
-Result: {actual_result}
+{history}
+
+DO NOT rewrite already written files, fix them with write_file_patch if needed and generate only missing modules/files.
+"""
+
+GENERATED_MODULES_MESSAGE = """
+Terraform modules for part of the requirements were already generated from templates and by the planner in /terraform:
+{generated_modules}
+Root files main.tf, variables.tf, outputs.tf and terraform.tfvars already contain these modules, DO NOT rewrite them.
+Generate Terraform code ONLY for the remaining requirements: {uncovered_requirements}
+Add new module blocks, variables, outputs and tfvars values to the root files with write_file_patch, do not rewrite root files.
+"""
 
-Do not add any additional commentary, explanations, or greeting text like "Assistant:".
-In {actual_result} return only the result of the tool execution, do not format it in any other way or add symbols/text.
-Include only the TOOL_RESULT format above with the actual tool output.
+GENERATED_MODULES_COMPLETE_MESSAGE = """
+All requirements are covered by Terraform modules generated from templates and by the planner in /terraform:
+{generated_modules}
+SCRIPTS_GENERATED
 """
 
 TMP = """
@@ -1,103 +1,508 @@
+import argparse
+import atexit
 import os
+import threading
+from functools import cache, partial
 from pathlib import Path
-from typing import Any, Dict, Union, Optional
-
-from agentic_framework.core.agents import BaseSDLCAgent
-from agentic_framework.core.configs.llm import set_config, get_config
-from agentic_framework.core.executors import LocalCommandLineCodeExecutor
-from agentic_framework.core.orchestration import WorkflowOrchestrator
-from agentic_framework.core.schemas.schemas import TransitionElement
-from agentic_framework.core.tools import (
-    get_file_content_tool,
-    write_file_content_tool
-)
-from autogen import OpenAIWrapper
+from typing import Any, Dict, Union, Optional, TYPE_CHECKING
+
 from dotenv import load_dotenv
 
+from src.cache.llm_cache import file_digest, get_llm_cache, LLMResponseCache
 from src.constants.constants import (
+    GENERATED_MODULES_COMPLETE_MESSAGE,
+    GENERATED_MODULES_MESSAGE,
+    IMAGE_RECOGNITION_PROMPT,
+    IMAGE_RECOGNITION_SYSTEM_MESSAGE,
+    INCREMENTAL_MESSAGE,
+    INFRASTRUCTURE_IR_ERROR_MESSAGE,
+    PREANALYSIS_MESSAGE,
     REQ_ANALYZER_SYSTEM_MESSAGE,
+    RESUME_ANALYSIS_MESSAGE,
+    RESUME_GENERATION_MESSAGE,
     SCRIPT_GENERATOR_SYSTEM_MESSAGE,
-    TOOL_EXECUTOR_SYSTEM_MESSAGE
+    TERRAFORM_EXECUTION_ERROR_MESSAGE,
+    TERRAFORM_VALIDATION_ERROR_MESSAGE
+)
+from src.llm.config import build_config_list, LLM_HOSTS, resolve_llm_host
+from src.pipeline.checkpoint import RUNNING, WorkflowCheckpoint
+from src.pipeline.context import create_context_manager
+from src.pipeline.infrastructure import compact_infrastructure_ir
+from src.pipeline.instrumentation import (
+    instrument_agent,
+    instrument_tool,
+    response_usage,
+    RunTrace,
+    trace_span,
+    use_trace,
+)
+from src.pipeline.manifest import (
+    compute_source_hashes,
+    extract_requirements_document,
+    GenerationManifest,
+    parse_requirements
+)
+from src.pipeline.planner import format_module_specs, run_planned_generation
+from src.pipeline.preanalysis import build_preanalysis_bundle, DEFAULT_BUNDLE_BYTES, DEFAULT_MAX_IMAGES
+from src.pipeline.routing import (
+    ANALYSIS_COMPLETE,
+    EXECUTION_ERROR,
+    generation_succeeded,
+    has_status,
+    INFRASTRUCTURE_IR_ERROR,
+    message_status,
+    SCRIPTS_GENERATED,
+    TOOL_CALL,
+    TOOL_RESULT,
+    tool_request_reply
+)
+from src.terraform.template_library import (
+    format_template_outputs,
+    match_requirements,
+    render_template_plan,
+    TemplatePlan
+)
+from src.terraform.validator import format_issues, TerraformValidator
+from src.tools.tools import (
+    get_file_content_tool,
+    get_image_file_content_tool,
+    get_image_tiles_tool,
+    read_folder_structure_tool,
+    search_relevant_content_tool,
+    write_file_content_tool,
+    write_file_patch_tool
 )
-from src.tools.tools import get_image_file_content_tool, read_folder_structure_tool
 
-load_dotenv()
+if TYPE_CHECKING:
+    from agentic_framework.core.agents import BaseSDLCAgent
 
-# Get source and destination repository directories from environment variables
-source_repo_dir = os.getenv("SOURCE_REPO_DIR", "/default/source/path")
-dest_repo_dir = os.getenv("DEST_REPO_DIR", "/default/destination/path")
+    from src.llm.router import LLMRouter
 
-executor_dir_path = Path(dest_repo_dir)
+# agentic_framework and autogen are imported on first use: importing this module does not read the LLM config,
+# create LLM clients or build agents, see get_pipeline()
 
-set_config([{
-    "model": os.getenv("MODEL_NAME"),
-    "base_url": os.getenv("OPENAI_API_BASE"),
-    "temperature": 0.0,
-    "max_tokens": 16000,
-}])
 
-# set_config([{
-#     "model": os.getenv("LLAMA_MODEL_NAME"),
-#     "base_url": os.getenv("LLAMA_API_BASE"),
-#     "api_key": "ollama",
-#     "temperature": 0.0,
-#     "max_tokens": 16000,
-# }])
+@cache
+def load_environment() -> None:
+    load_dotenv()
 
-llm_config = get_config()
 
-llm_wrapper = OpenAIWrapper(**get_config())
+class Pipeline:
+    """
+    LLM config, LLM router and default agents of one default LLM host, each built on first use and cached.
+    """
 
-# Create agents
-init_agent = BaseSDLCAgent(
-    name="InitAgent"
-)
+    def __init__(self, llm_host: str):
+        self.llm_host = llm_host
+        self._llm_config: Optional[Dict[str, Any]] = None
+        self._router: Optional["LLMRouter"] = None
+        self._agents: Dict[str, Dict[str, "BaseSDLCAgent"]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def llm_config(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._llm_config is None:
+                from agentic_framework.core.configs.llm import get_config, set_config
+                set_config(build_config_list(self.llm_host))
+                self._llm_config = get_config()
+            return self._llm_config
+
+    @property
+    def router(self) -> "LLMRouter":
+        with self._lock:
+            if self._router is None:
+                from src.llm.router import LLMRouter
+                self._router = LLMRouter.from_env(self.llm_host, base_config=self.llm_config)
+            return self._router
+
+    @property
+    def llm_client(self):
+        return self.router.client("image_recognition")
+
+    def agents(self, executor_work_dir: str | Path) -> Dict[str, "BaseSDLCAgent"]:
+        """
+        Default agents executing terraform in the given destination repository.
+        """
+        key = os.path.normpath(str(executor_work_dir))
+        with self._lock:
+            if key not in self._agents:
+                self._agents[key] = create_agents(self.llm_config, executor_work_dir, llm_router=self.router)
+            return self._agents[key]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._router is not None:
+                self._router.close()
+
+
+_pipelines: Dict[str, Pipeline] = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(llm_host: Optional[str] = None) -> Pipeline:
+    """
+    Cached pipeline of the given LLM host (LLM_HOST env variable by default, "openai" or "ollama").
+    Hosts can be switched in a running process without reimporting this module.
+    """
+    load_environment()
+    llm_host = resolve_llm_host(llm_host)
+    with _pipelines_lock:
+        if llm_host not in _pipelines:
+            _pipelines[llm_host] = Pipeline(llm_host)
+        return _pipelines[llm_host]
 
-analyzer_agent = BaseSDLCAgent(
-    name="RequirementsAnalyzer",
-    llm_config=llm_config,
-    system_message=REQ_ANALYZER_SYSTEM_MESSAGE,
-    human_input_mode="NEVER",
-)
 
-generator_agent = BaseSDLCAgent(
-    name="ScriptGenerator",
-    llm_config=llm_config,
-    system_message=SCRIPT_GENERATOR_SYSTEM_MESSAGE,
-    human_input_mode="NEVER",
-)
+def get_llm_config(llm_host: Optional[str] = None) -> Dict[str, Any]:
+    return get_pipeline(llm_host).llm_config
 
-tool_executor_agent = BaseSDLCAgent(
-    name="ToolExecutor",
-    llm_config=get_config(),
-    system_message=TOOL_EXECUTOR_SYSTEM_MESSAGE,
-    human_input_mode="NEVER",
-)
+
+def reset_pipelines() -> None:
+    """
+    Drop cached configs, clients and agents, e.g. after the LLM environment variables were changed.
+    Runs using the dropped pipelines must be finished, their HTTP clients are closed.
+    """
+    with _pipelines_lock:
+        for pipeline in _pipelines.values():
+            pipeline.close()
+        _pipelines.clear()
+
+
+# Legacy module attributes, built lazily on first access
+_DEFAULT_AGENT_ATTRIBUTES = {
+    "init_agent": "init",
+    "analyzer_agent": "analyzer",
+    "generator_agent": "generator",
+    "tool_executor_agent": "tool_executor",
+    "code_executor_agent": "code_executor",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name == "llm_config":
+        return get_llm_config()
+    if name == "llm_wrapper":
+        return get_pipeline().llm_client
+    if name == "default_agents" or name in _DEFAULT_AGENT_ATTRIBUTES:
+        agents = get_pipeline().agents(os.getenv("DEST_REPO_DIR", "/default/destination/path"))
+        return agents if name == "default_agents" else agents[_DEFAULT_AGENT_ATTRIBUTES[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Trace category of each agent's turns
+AGENT_TRACE_CATEGORIES = {
+    "init": "init",
+    "analyzer": "analysis",
+    "generator": "generation",
+    "tool_executor": "tool_executor",
+    "code_executor": "executor",
+}
 
 
-code_executor_agent = BaseSDLCAgent(
-    name="TerraformScriptExecutor",
-    human_input_mode="NEVER",
-    system_message="You are Terraform scripts executor. You can be used to deploy infrastructure on the cloud. You can execute terraform commands.",
-    code_execution_config={
-        "executor": LocalCommandLineCodeExecutor(
-            work_dir=executor_dir_path,
-            timeout=120,
-        )
+# Create agents
+def create_agents(agent_llm_config: Dict[str, Any], executor_work_dir: str | Path,
+                  llm_router: Optional["LLMRouter"] = None) -> Dict[str, "BaseSDLCAgent"]:
+    """
+    Build an isolated set of workflow agents. Each concurrent workflow needs its own agents,
+    registered tools and chat histories can't be shared between runs.
+    With an LLM router every agent/task uses the backends of its route instead of agent_llm_config.
+    """
+    from agentic_framework.core.agents import BaseSDLCAgent
+    from agentic_framework.core.executors import LocalCommandLineCodeExecutor
+    from autogen import Agent
+
+    load_environment()
+    analyzer_llm_config = llm_router.llm_config("analysis") if llm_router else agent_llm_config
+    generator_llm_config = llm_router.llm_config("generation") if llm_router else agent_llm_config
+    agents = {
+        "init": BaseSDLCAgent(
+            name="InitAgent"
+        ),
+        "analyzer": BaseSDLCAgent(
+            name="RequirementsAnalyzer",
+            llm_config=analyzer_llm_config,
+            system_message=REQ_ANALYZER_SYSTEM_MESSAGE,
+            human_input_mode="NEVER",
+        ),
+        "generator": BaseSDLCAgent(
+            name="ScriptGenerator",
+            llm_config=generator_llm_config,
+            system_message=SCRIPT_GENERATOR_SYSTEM_MESSAGE,
+            human_input_mode="NEVER",
+        ),
+        # Tool calls are executed directly, the tool executor never calls the LLM
+        "tool_executor": BaseSDLCAgent(
+            name="ToolExecutor",
+            llm_config=False,
+            human_input_mode="NEVER",
+        ),
+        "code_executor": BaseSDLCAgent(
+            name="TerraformScriptExecutor",
+            human_input_mode="NEVER",
+            system_message="You are Terraform scripts executor. You can be used to deploy infrastructure on the cloud. You can execute terraform commands.",
+            code_execution_config={
+                "executor": LocalCommandLineCodeExecutor(
+                    work_dir=Path(executor_work_dir),
+                    timeout=int(os.getenv("TERRAFORM_TIMEOUT", "120")),
+                )
+            }
+        ),
     }
-)
+
+    # "NEED_TOOL" text requests are parsed and executed locally, structured tool calls by the built-in reply
+    agents["tool_executor"].register_reply([Agent, None], tool_request_reply, position=0)
+
+    # The infrastructure IR of the requirements document is validated and compacted before the generator gets it,
+    # problems go back to the analyzer as a tool result
+    agents["analyzer"].register_hook(
+        "process_message_before_send",
+        infrastructure_ir_hook(int(os.getenv("INFRASTRUCTURE_IR_MAX_CORRECTIONS", "2")))
+    )
+    agents["tool_executor"].register_reply([Agent, None], infrastructure_ir_feedback_reply, position=0)
+
+    # Keep analyzer/generator prompts within the token budget, digested tool results are replaced by summaries
+    # (made by the local model when a summarization backend is configured)
+    summarizer = llm_router.summarizer() if llm_router else None
+    for name, config in [("analyzer", analyzer_llm_config), ("generator", generator_llm_config)]:
+        create_context_manager(_model_name(config), summarizer=summarizer).add_to_agent(agents[name])
+
+    # Run init/validate(/plan) in an isolated directory with the shared provider cache,
+    # commands of the generator are executed only when terraform is not installed
+    if _env_flag("TERRAFORM_EXECUTION_ENABLED", True):
+        agents["code_executor"].register_reply(
+            [Agent, None], terraform_execution_reply(executor_work_dir), position=0
+        )
+
+    # Check generated code locally before terraform is executed
+    if _env_flag("TERRAFORM_VALIDATION_ENABLED", True):
+        agents["code_executor"].register_reply(
+            [Agent, None], terraform_validation_reply(executor_work_dir), position=0
+        )
+
+    # Generate modules from local templates and planned parallel module generation,
+    # the generator conversation handles only what is left
+    if _env_flag("TEMPLATES_ENABLED", True) or _env_flag("PLANNER_ENABLED", True):
+        agents["generator"].register_reply(
+            [Agent, None], generation_stage_reply(executor_work_dir, agent_llm_config, llm_router), position=0
+        )
+
+    # Record a trace span for every agent turn
+    for name, category in AGENT_TRACE_CATEGORIES.items():
+        instrument_agent(agents[name], category)
+
+    return agents
+
+
+def terraform_validation_reply(dest_work_dir: str | Path):
+    """
+    Reply function for the executor: statically validate /terraform before running it. Trivial problems are
+    fixed in place, the rest is sent back as a targeted EXECUTION_ERROR list instead of running terraform.
+    """
+    terraform_dir = os.path.join(str(dest_work_dir), "terraform")
+
+    def validate_terraform(recipient, messages=None, sender=None, config=None):
+        with trace_span("terraform_validation", "validation") as span:
+            validator = TerraformValidator(terraform_dir, autofix=_env_flag("TERRAFORM_AUTOFIX", True))
+            issues = validator.validate()
+            span["fixed"] = sum(1 for issue in issues if issue.fixed)
+            span["warnings"] = len(validator.warnings)
+            span["errors"] = len(validator.errors)
+        if issues:
+            print(f"Terraform validation:\n{format_issues(issues)}")
+        if validator.errors:
+            return True, f"EXECUTION_ERROR\n{TERRAFORM_VALIDATION_ERROR_MESSAGE}\n{format_issues(validator.errors)}"
+        return False, None
+
+    return validate_terraform
+
+
+def infrastructure_ir_hook(max_corrections: int = 2):
+    """
+    Hook of the analyzer: the infrastructure IR of the complete requirements document is validated against
+    the requirement ids and replaced by its compact form. An invalid IR is sent back to the analyzer with its
+    problems (INFRASTRUCTURE_IR_ERROR), after max_corrections failed attempts it is dropped from the hand-off.
+    """
+    corrections = 0
+
+    def check_infrastructure_ir(sender=None, message=None, recipient=None, silent=False):
+        nonlocal corrections
+        content = message.get("content") if isinstance(message, dict) else message
+        if not isinstance(content, str) or message_status(message) != ANALYSIS_COMPLETE:
+            return message
+        with trace_span("infrastructure_ir", "validation") as span:
+            compacted, errors = compact_infrastructure_ir(content, parse_requirements(content))
+            span["errors"] = len(errors)
+            span["saved_chars"] = len(content) - len(compacted)
+        problems = "\n".join(f"- {error}" for error in errors)
+        if errors and corrections < max_corrections:
+            corrections += 1
+            print(f"Infrastructure IR is invalid, sent back to the analyzer:\n{problems}")
+            # Without the completion marker the document is not handed off to the generator
+            feedback = f"{INFRASTRUCTURE_IR_ERROR}\n{problems}\n\n{content.replace(ANALYSIS_COMPLETE, '').strip()}"
+            return dict(message, content=feedback) if isinstance(message, dict) else feedback
+        if errors:
+            print(f"Infrastructure IR is still invalid and was dropped:\n{problems}")
+        corrections = 0
+        return dict(message, content=compacted) if isinstance(message, dict) else compacted
+
+    return check_infrastructure_ir
+
+
+def infrastructure_ir_feedback_reply(recipient, messages=None, sender=None, config=None):
+    """
+    Reply function of the tool executor: the problems of a rejected infrastructure IR are returned to the analyzer
+    as a tool result, without an LLM call.
+    """
+    message = (messages or [{}])[-1]
+    if message_status(message) != INFRASTRUCTURE_IR_ERROR:
+        return False, None
+    content = message.get("content") if isinstance(message, dict) else message
+    problems = content.split("\n\n", 1)[0].replace(INFRASTRUCTURE_IR_ERROR, "", 1).strip()
+    return True, f"{TOOL_RESULT}\n{INFRASTRUCTURE_IR_ERROR_MESSAGE}\n{problems}"
+
+
+def terraform_execution_reply(dest_work_dir: str | Path):
+    """
+    Reply function for the executor: check /terraform with terraform in a run directory of its own.
+    The runner is kept between retries of the workflow, so warm .terraform folders are reused; its run directory
+    is removed after a successful check or at exit (older leftovers are swept by the next runs).
+    """
+    from src.terraform.executor import TerraformRunner
+
+    runner = TerraformRunner.from_env(os.path.join(str(dest_work_dir), "terraform"))
+    atexit.register(runner.cleanup)
+
+    def execute_terraform(recipient, messages=None, sender=None, config=None):
+        if not runner.available:
+            return False, None
+        with trace_span("terraform_execution", "execution") as span:
+            result = runner.run()
+            span["steps"] = len(result.steps)
+            span["errors"] = sum(len(step.errors) for step in result.steps)
+            span["init_skipped"] = sum(step.skipped for step in result.steps)
+        print(f"Terraform execution:\n{result.summary()}")
+        if not result.ok:
+            return True, f"EXECUTION_ERROR\n{TERRAFORM_EXECUTION_ERROR_MESSAGE}\n{format_issues(result.issues())}"
+        runner.cleanup()
+        return True, f"Terraform checks passed:\n{result.summary()}"
+
+    return execute_terraform
+
+
+def generation_stage_reply(dest_work_dir: str | Path, agent_llm_config: Dict[str, Any],
+                           llm_router: Optional["LLMRouter"] = None):
+    """
+    Reply function for the generator: when the requirements document arrives, requirements matching local module
+    templates are rendered into /terraform without the LLM, the planner splits the rest into module specs that are
+    generated in parallel with small contexts. If every requirement is covered the generator replies
+    SCRIPTS_GENERATED itself, otherwise the requirements document is extended with the list of generated modules
+    and the generator agent writes only the remaining requirements.
+    """
+    terraform_dir = os.path.join(str(dest_work_dir), "terraform")
+    use_templates = _env_flag("TEMPLATES_ENABLED", True)
+    use_planner = _env_flag("PLANNER_ENABLED", True)
+    state = {"document": None, "note": None, "complete": False, "llm_client": None}
+
+    def generate_modules_stage(document: str) -> Optional[str]:
+        requirements = parse_requirements(document)
+        if not requirements:
+            return None
+        plan = match_requirements(requirements) if use_templates else TemplatePlan([], list(requirements))
+        modules = []
+        with trace_span("templates", "templates") as span:
+            span["covered"] = len(plan.covered)
+            span["uncovered"] = len(plan.uncovered)
+            if plan.instances:
+                written = render_template_plan(plan, terraform_dir)
+                print(f"Generated from templates: {plan.module_dirs}, {len(written)} files written, "
+                      f"requirements left: {plan.uncovered}")
+                modules.append(format_template_outputs(plan))
+
+        uncovered = plan.uncovered
+        if uncovered and use_planner:
+            if state["llm_client"] is None and llm_router is not None:
+                state["llm_client"] = llm_router.client("planning")
+            elif state["llm_client"] is None:
+                from autogen import OpenAIWrapper
+                state["llm_client"] = OpenAIWrapper(**agent_llm_config)
+            write_file = instrument_tool("write_file_content", write_file_content_tool(terraform_dir))
+            with trace_span("planned_generation", "stage"):
+                specs, uncovered = run_planned_generation(
+                    state["llm_client"], document, uncovered, "\n".join(modules), terraform_dir, write_file,
+                    max_workers=int(os.getenv("PLANNER_MAX_WORKERS", "6")),
+                    reserved_names=tuple(module_dir.split("/", 1)[1] for module_dir in plan.module_dirs),
+                    cache=get_llm_cache(),
+                    model=_model_name(llm_router.llm_config("planning") if llm_router else agent_llm_config),
+                )
+            if specs:
+                print(f"Generated by planner: {[spec.module_dir for spec in specs]}, requirements left: {uncovered}")
+                modules.append(format_module_specs(specs))
+
+        if not modules:
+            return None
+        if uncovered:
+            return GENERATED_MODULES_MESSAGE.format(generated_modules="\n".join(modules),
+                                                    uncovered_requirements=", ".join(uncovered))
+        state["complete"] = True
+        return GENERATED_MODULES_COMPLETE_MESSAGE.format(generated_modules="\n".join(modules))
+
+    def generate_stage(recipient, messages=None, sender=None, config=None):
+        messages = messages or []
+        index = next((position for position in range(len(messages) - 1, -1, -1)
+                      if isinstance(messages[position].get("content"), str)
+                      and message_status(messages[position]) == ANALYSIS_COMPLETE), None)
+        if index is None:
+            return False, None
+
+        document = messages[index]["content"]
+        if state["note"] and state["note"] in document:
+            document = document.replace(f"\n\n{state['note']}", "")
+        if document != state["document"]:
+            state.update(document=document, note=None, complete=False)
+            state["note"] = generate_modules_stage(document)
+            if state["complete"] and index == len(messages) - 1:
+                return True, state["note"]
+
+        # Keep the note next to the requirements document on every generator turn
+        if state["note"] and not state["complete"] and state["note"] not in messages[index]["content"]:
+            messages[index] = {**messages[index], "content": f"{document}\n\n{state['note']}"}
+        return False, None
+
+    return generate_stage
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def _model_name(config: Dict[str, Any]) -> Optional[str]:
+    config_list = config.get("config_list") or [config]
+    return config_list[0].get("model") if config_list else None
+
+
+def _client_models(llm_client: Any) -> Optional[str]:
+    """
+    Models of an OpenAIWrapper in failover order, the cache key of responses the client produces.
+    """
+    config_list = getattr(llm_client, "_config_list", None) or []
+    models = [config.get("model") for config in config_list if isinstance(config, dict) and config.get("model")]
+    return ",".join(models) or None
 
 
 # Register tools
-def register_tools(source_work_dir, dest_work_dir):
-    read_folder_structure = read_folder_structure_tool(source_work_dir)
-    get_file_content = get_file_content_tool(source_work_dir)
-    write_file_content = write_file_content_tool(dest_work_dir)
+def register_tools(source_work_dir, dest_work_dir, agents=None, llm_client=None):
+    agents = agents or get_pipeline().agents(dest_work_dir)
+    llm_client = llm_client or get_pipeline().llm_client
+    read_folder_structure = instrument_tool("read_folder_structure", read_folder_structure_tool(source_work_dir))
+    get_file_content = instrument_tool("get_file_content", get_file_content_tool(source_work_dir))
+    search_relevant_content = instrument_tool("search_relevant_content", search_relevant_content_tool(source_work_dir))
+    write_file_content = instrument_tool("write_file_content", write_file_content_tool(dest_work_dir))
+    write_file_patch = instrument_tool("write_file_patch", write_file_patch_tool(dest_work_dir))
 
     print(f"Creating tools with source work_dir: {source_work_dir}, dest work_dir: {dest_work_dir}")
 
     # Register common tools for both analyzer and generator
-    for agent in [analyzer_agent, generator_agent]:
+    for agent in [agents["analyzer"], agents["generator"]]:
         agent.register_for_llm(
             name="read_folder_structure",
             description="Reads and returns the folder structure from a given root folder.",
@@ -105,7 +510,8 @@ def register_tools(source_work_dir, dest_work_dir):
 
         agent.register_for_llm(
             name="get_file_content",
-            description="Reads and returns file content by the given filepath.",
+            description="Reads and returns file content by the given filepath. Large files are returned in pages, "
+                        "continue with the offset given at the end of a page or read a line range.",
         )(get_file_content)
 
         agent.register_for_llm(
@@ -113,29 +519,45 @@ def register_tools(source_work_dir, dest_work_dir):
             description="write content in file in the given filepath.",
         )(write_file_content)
 
+        agent.register_for_llm(
+            name="write_file_patch",
+            description="change existing file by unified diff or by replacing one block (resource, module, variable...).",
+        )(write_file_patch)
+
+    # Ranked chunks of infrastructure relevant files, so the analyzer does not read the whole repository
+    if _env_flag("RELEVANCE_INDEX_ENABLED", True):
+        agents["analyzer"].register_for_llm(
+            name="search_relevant_content",
+            description="Returns the most infrastructure relevant chunks of source project files "
+                        "(Dockerfiles, k8s manifests, docs, diagrams), optionally for the given query.",
+        )(search_relevant_content)
+
     print("Registering tool executor functions...")
 
     # Register the same tools for execution by the ToolExecutor
+    tool_executor_agent = agents["tool_executor"]
     tool_executor_agent.register_for_execution(
         name="read_folder_structure")(read_folder_structure)
     tool_executor_agent.register_for_execution(
         name="get_file_content")(get_file_content)
+    tool_executor_agent.register_for_execution(
+        name="search_relevant_content")(search_relevant_content)
     tool_executor_agent.register_for_execution(
         name="write_file_content")(write_file_content)
+    tool_executor_agent.register_for_execution(
+        name="write_file_patch")(write_file_patch)
 
-
-    # Update in register_tools function:
     tool_executor_agent.register_for_execution(
         name="extract_infrastructure_from_image"
     )(lambda image_path, **kwargs: extract_infrastructure_from_image(
         image_path=image_path,
         work_dir=source_work_dir,
-        llm_client=llm_wrapper,
+        llm_client=llm_client,
         **kwargs
     ))
 
     # Register image recognition for analyzer
-    analyzer_agent.register_for_llm(
+    agents["analyzer"].register_for_llm(
         name="extract_infrastructure_from_image",
         description="Extract infrastructure from image/diagram file.",
     )(extract_infrastructure_from_image)
@@ -143,62 +565,103 @@ def register_tools(source_work_dir, dest_work_dir):
     print(f"All tools registered successfully")
 
 
+def _resolve_path(file_path: str, work_dir: Optional[str | Path]) -> str:
+    file_path = os.path.normpath(file_path)
+    if work_dir and not file_path.startswith(str(work_dir)):
+        file_path = os.path.join(str(work_dir), file_path)
+    return file_path
+
+
 def extract_infrastructure_from_image(
         image_path: str,
         llm_client: Any = None,
         work_dir: Optional[str | Path] = None,
-        text_content: Optional[str] = None
+        text_content: Optional[str] = None,
+        use_cache: bool = True,
 ) -> Dict[str, Union[str, Any]]:
     """
     Send a multimodal message to the LLM to recognize/describe the image.
+
+    Responses are cached on disk by image content hash, prompt text and model name,
+    so unchanged diagrams are not sent to the LLM again. Pass use_cache=False to bypass the cache.
     """
+    with trace_span(image_path, "image_recognition", cache_hit=False) as span:
+        return _extract_infrastructure_from_image(image_path, llm_client, work_dir, text_content, use_cache, span)
+
+
+def _extract_infrastructure_from_image(
+        image_path: str,
+        llm_client: Any,
+        work_dir: Optional[str | Path],
+        text_content: Optional[str],
+        use_cache: bool,
+        span: Dict[str, Any],
+) -> Dict[str, Union[str, Any]]:
     try:
-        # Import OpenAIWrapper at the top level
         from autogen import OpenAIWrapper
 
-        # If llm_client is not provided, create one using OpenAIWrapper
-        if llm_client is None:
-            config = get_config()
-            llm_client = OpenAIWrapper(**config)
+        prompt = text_content or IMAGE_RECOGNITION_PROMPT
 
-        # Get the image content using the tool
-        get_image_file_content = get_image_file_content_tool(work_dir)
-        image_url = get_image_file_content(image_path)
+        # If llm_client is not provided, use the image recognition client of the default pipeline
+        if llm_client is None:
+            llm_client = get_pipeline().llm_client
+
+        # Downscaling and tiling change what is sent, they are part of the cache key
+        tile_size = int(os.getenv("IMAGE_TILE_SIZE", "0"))
+        max_dimension = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+
+        cache: Optional[LLMResponseCache] = get_llm_cache() if use_cache else None
+        cache_key = None
+        if cache is not None and cache.enabled:
+            cache_key = LLMResponseCache.make_key(
+                f"{file_digest(_resolve_path(image_path, work_dir))}:{max_dimension}:{tile_size}",
+                IMAGE_RECOGNITION_SYSTEM_MESSAGE + prompt,
+                _client_models(llm_client),
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"Image recognition cache hit for {image_path}")
+                span["cache_hit"] = True
+                return cached
+
+        # Get the image content using the tool, very large diagrams can be split into tiles
+        if tile_size:
+            image_urls = get_image_tiles_tool(work_dir, tile_size=tile_size)(image_path)
+        else:
+            image_urls = [get_image_file_content_tool(work_dir)(image_path)]
 
         # Prepare content for the request
-        content = [
-            {
-                "type": "image_url",
-                "image_url": image_url
-            }
-        ]
-
-        if text_content:
-            content.insert(0, {"type": "text", "text": text_content})
-        else:
-            content.insert(0, {
-                "type": "text",
-                "text": "Please give me a detail description of the image, assuming it is a diagram of cloud infrastructure. Describe also links between components (if present). If provided image not a diagram of cloud infrastructure, please return text 'it's not a infrastructure related image/diagram`."
-            })
+        content = [{"type": "text", "text": prompt}]
+        content += [{"type": "image_url", "image_url": image_url} for image_url in image_urls]
 
         messages = [
-            {"role": "system", "content": "You are an AI assistant that recognizes and describes cloud infrastructure images/diagrams."},
+            {"role": "system", "content": IMAGE_RECOGNITION_SYSTEM_MESSAGE},
             {"role": "user", "content": content}
         ]
 
         # For OpenAIWrapper from autogen
         response = llm_client.create(messages=messages)
+        span.update(response_usage(response))
         # Extract the content from OpenAIWrapper response
         choices = OpenAIWrapper.extract_text_or_completion_object(response)
-        if choices and len(choices) > 0:
-            return {"content": choices[0]}
-
-        return {"status": "error", "message": "Failed to get response from LLM"}
+        if not choices:
+            return {"status": "error", "message": "Failed to get response from LLM"}
+        result = {"content": choices[0]}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+    # A response that can't be cached is still a valid response
+    if cache_key is not None:
+        try:
+            cache.set(cache_key, result)
+        except Exception as e:
+            print(f"Image recognition response for {image_path} not cached: {e}")
+    return result
+
 # Main execution function
-def generate_terraform_infrastructure(source_project_path, dest_repo_path, message=None):
+def generate_terraform_infrastructure(source_project_path, dest_repo_path, message=None, preanalysis=None,
+                                      incremental=None, agents=None, llm_client=None, trace=None, resume=False,
+                                      llm_host=None):
     """
     Analyze project and generate Terraform infrastructure
 
@@ -206,74 +669,263 @@ def generate_terraform_infrastructure(source_project_path, dest_repo_path, messa
         source_project_path: Path to the source project directory
         dest_repo_path: Path to the destination repository directory
         message: Optional custom message with requirements
+        preanalysis: Load relevant source files and images concurrently before the analyzer runs
+            (defaults to PREANALYSIS_ENABLED env variable, enabled by default)
+        incremental: Use the generation manifest in the destination repo to re-analyze only changed source files
+            and regenerate only affected modules (defaults to INCREMENTAL_ENABLED env variable, enabled by default)
+        agents: Optional agents built by create_agents (cached default agents of the LLM host are used by default)
+        llm_client: Optional OpenAIWrapper used for image recognition
+        trace: Optional RunTrace collecting timing/token spans of the run, saved as JSON into TRACE_DIR
+        resume: Continue the last unfinished run from its checkpoint in the destination repo
+            (a new run is started if there is nothing to resume)
+        llm_host: LLM host of the default agents and client, "openai" or "ollama" (defaults to LLM_HOST env variable)
     """
-    # Add debug tracing
-    print("Setting up workspace for project path:", source_project_path)
-
-    # Register tools for agents
-    register_tools(source_project_path, dest_repo_path)
-    print("Tools registered successfully")
-
-    # Define transitions
-    edges = [
+    load_environment()
+    trace = trace or RunTrace(os.path.basename(os.path.normpath(source_project_path)))
+    with use_trace(trace):
+        try:
+            return _generate_terraform_infrastructure(source_project_path, dest_repo_path, message, preanalysis,
+                                                      incremental, agents, llm_client, trace, resume, llm_host)
+        finally:
+            trace_dir = os.getenv("TRACE_DIR", "traces")
+            if trace_dir:
+                trace_path = trace.save(os.path.join(trace_dir, f"{trace.name}-{int(trace.started)}.json"))
+                print(f"Trace saved to {trace_path}")
+
+
+def _workflow_edges(agents, first_agent_key="analyzer"):
+    from agentic_framework.core.schemas.schemas import TransitionElement
+
+    init_agent = agents["init"]
+    analyzer_agent = agents["analyzer"]
+    generator_agent = agents["generator"]
+    tool_executor_agent = agents["tool_executor"]
+    code_executor_agent = agents["code_executor"]
+
+    return [
         TransitionElement(
             agent=init_agent,
-            next_agent=analyzer_agent
+            next_agent=agents[first_agent_key]
         ),
         TransitionElement(
             agent=analyzer_agent,
             next_agent=tool_executor_agent,
-            condition=lambda msg: ("NEED_TOOL" in str(msg) or msg.get("tool_calls"))
+            condition=has_status(TOOL_CALL)
         ),
         TransitionElement(
             agent=tool_executor_agent,
             next_agent=analyzer_agent,
-            condition=lambda msg: ("TOOL_RESULT" in str(msg) or msg.get("tool_responses"))
+            condition=has_status(TOOL_RESULT)
+        ),
+        TransitionElement(
+            agent=analyzer_agent,
+            next_agent=tool_executor_agent,
+            condition=has_status(INFRASTRUCTURE_IR_ERROR)
         ),
         TransitionElement(
             agent=analyzer_agent,
             next_agent=generator_agent,
-            condition=lambda msg: "ANALYSIS_COMPLETE" in str(msg)
+            condition=has_status(ANALYSIS_COMPLETE)
         ),
         TransitionElement(
             agent=generator_agent,
             next_agent=tool_executor_agent,
-            condition=lambda msg: ("NEED_TOOL" in str(msg) or msg.get("tool_calls"))
+            condition=has_status(TOOL_CALL)
         ),
         TransitionElement(
             agent=tool_executor_agent,
             next_agent=generator_agent,
-            condition=lambda msg: "TOOL_RESULT" in str(msg)
+            condition=has_status(TOOL_RESULT)
         ),
         TransitionElement(
             agent=generator_agent,
             next_agent=code_executor_agent,
-            condition=lambda msg: "SCRIPTS_GENERATED" in str(msg)
+            condition=has_status(SCRIPTS_GENERATED)
         ),
         TransitionElement(
             agent=code_executor_agent,
             next_agent=generator_agent,
-            condition=lambda msg: "EXECUTION_ERROR" in str(msg),
+            condition=has_status(EXECUTION_ERROR),
             max_rounds=3
         )
     ]
 
-    workflow = WorkflowOrchestrator(edges)
 
+def _format_history(messages, max_messages=None):
+    messages = messages[-max_messages:] if max_messages else messages
+    lines = []
+    for message in messages:
+        # Tool exchanges are shown with their arguments and results, the resumed run continues from them
+        if message.get("tool_calls"):
+            functions = [call.get("function", {}) for call in message["tool_calls"]]
+            calls = ", ".join(f"{function.get('name', '?')}({function.get('arguments', '')})" for function in functions)
+            lines.append(f"[{message['agent']}]: tool calls: {calls}")
+        elif message.get("tool_responses"):
+            responses = "\n".join(str(response.get("content", "")) for response in message["tool_responses"])
+            lines.append(f"[{message['agent']}]: tool results:\n{responses}")
+        else:
+            lines.append(f"[{message['agent']}]: {message['content']}")
+    if messages and messages[-1].get("tool_calls"):
+        lines.append("(the last tool calls were not answered, call them again)")
+    return "\n\n".join(lines)
+
+
+def _resume_message(checkpoint: WorkflowCheckpoint):
+    """
+    Initial message and first agent of a resumed run, finished stages are not repeated.
+    """
+    if checkpoint.stage == "generation":
+        message = f"{checkpoint.requirements_document}\nANALYSIS_COMPLETE\n" + RESUME_GENERATION_MESSAGE.format(
+            files_written=", ".join(checkpoint.files_written) or "none",
+            history=_format_history(checkpoint.stage_messages("generation"), max_messages=6) or "none",
+        )
+        return message, "generator"
+    message = checkpoint.message + "\n" + RESUME_ANALYSIS_MESSAGE.format(
+        history=_format_history(checkpoint.stage_messages("analysis")) or "none")
+    return message, "analyzer"
+
+
+def _generate_terraform_infrastructure(source_project_path, dest_repo_path, message, preanalysis, incremental,
+                                       agents, llm_client, trace, resume, llm_host):
+    # Add debug tracing
+    print("Setting up workspace for project path:", source_project_path)
+
+    checkpoint = WorkflowCheckpoint.load(dest_repo_path) if resume else None
+    if resume and (checkpoint is None or not checkpoint.resumable):
+        print("No unfinished run to resume, starting a new run.")
+        checkpoint = None
+
+    if incremental is None:
+        incremental = _env_flag("INCREMENTAL_ENABLED", True)
+    # The message is extended below, the manifest records the one given by the user
+    custom_message = message
+    with trace_span("manifest", "stage"):
+        manifest = GenerationManifest.load(dest_repo_path) if incremental else None
+        source_hashes = compute_source_hashes(source_project_path) if incremental else None
+        plan = manifest.plan(source_hashes, os.path.join(dest_repo_path, "terraform"), message) if manifest else None
+    if plan and plan.up_to_date and checkpoint is None:
+        print("Source project has not changed since last generation, nothing to regenerate.")
+        return None
+
+    pipeline = get_pipeline(llm_host)
+    agents = agents or pipeline.agents(dest_repo_path)
+    llm_client = llm_client or pipeline.llm_client
+
+    # Register tools for agents
+    register_tools(source_project_path, dest_repo_path, agents=agents, llm_client=llm_client)
+    print("Tools registered successfully")
+
+    if checkpoint is not None:
+        message, first_agent_key = _resume_message(checkpoint)
+        print(f"Resuming run from the {checkpoint.stage} stage, last agent: {checkpoint.current_agent}, "
+              f"files written: {len(checkpoint.files_written)}")
+        checkpoint.status = RUNNING
+        checkpoint.resumed += 1
+        checkpoint.save()
+    else:
+        first_agent_key = "analyzer"
+        message = _initial_message(source_project_path, dest_repo_path, message, preanalysis, plan, manifest,
+                                   llm_client)
+        if _env_flag("CHECKPOINT_ENABLED", True):
+            checkpoint = WorkflowCheckpoint.start(source_project_path, dest_repo_path, message)
+
+    # Define transitions
+    from agentic_framework.core.orchestration import WorkflowOrchestrator
+    workflow = WorkflowOrchestrator(_workflow_edges(agents, first_agent_key))
+
+    if checkpoint is not None:
+        trace.add_listener(checkpoint.on_event)
+    with trace_span("workflow", "stage"):
+        try:
+            result = workflow.run_core(message=message, llm_config=pipeline.router.llm_config("orchestration"), max_round=100)
+        except Exception as e:
+            if checkpoint is not None:
+                checkpoint.finish(error=str(e))
+                print(f"Run failed, continue it with --resume: {e}")
+            raise
+
+    # The manifest records only finished generations, a failed one is regenerated by the next run
+    if not generation_succeeded(result):
+        error = "generation ended before the terraform checks passed"
+        if checkpoint is not None:
+            checkpoint.finish(error=error)
+            print(f"Run failed, continue it with --resume: {error}")
+        else:
+            print(f"Run failed: {error}")
+        return result
+
+    if checkpoint is not None:
+        checkpoint.finish()
+
+    if manifest:
+        requirements_document = (checkpoint and checkpoint.requirements_document) or \
+            extract_requirements_document(result)
+        manifest.update(source_hashes, requirements_document, os.path.join(dest_repo_path, "terraform"), custom_message)
+        manifest.save()
+
+    return result
+
+
+def _initial_message(source_project_path, dest_repo_path, message, preanalysis, plan, manifest, llm_client):
     # Default message if none provided
     if not message:
         message = (
             f"I want to recognize cloud infrastructure for the source project and create Terraform "
-            f"scripts/modules in destination project subfolder /terraform to implement it. Source project folder: {source_repo_dir}, "
-            f"destination project folder: {dest_repo_dir}."
+            f"scripts/modules in destination project subfolder /terraform to implement it. Source project folder: {source_project_path}, "
+            f"destination project folder: {dest_repo_path}."
         )
-    result = workflow.run_core(message=message, llm_config=llm_config, max_round=100)
 
-    return result
+    changed_only = None
+    if plan and not plan.full_run:
+        print(f"Incremental run: changed sources {plan.changed_sources}, changed modules {plan.changed_modules}, "
+              f"affected modules {plan.affected_modules}")
+        changed_only = plan.changed_sources
+        message = message + "\n" + INCREMENTAL_MESSAGE.format(
+            changed_sources=", ".join(plan.changed_sources) or "none",
+            removed_sources=", ".join(plan.removed_sources) or "none",
+            changed_modules=", ".join(plan.changed_modules) or "none",
+            affected_requirements=", ".join(plan.affected_requirements) or "none",
+            requirements_document=manifest.requirements_document,
+            affected_modules=", ".join(plan.affected_modules) or "only modules for new requirements",
+        )
+
+    if preanalysis is None:
+        preanalysis = _env_flag("PREANALYSIS_ENABLED", True)
+    if preanalysis:
+        with trace_span("preanalysis", "stage"):
+            bundle = build_preanalysis_bundle(
+                source_project_path,
+                image_describer=partial(extract_infrastructure_from_image, llm_client=llm_client),
+                folder_structure=read_folder_structure_tool(source_project_path)(source_project_path),
+                max_workers=int(os.getenv("PREANALYSIS_MAX_WORKERS", "8")),
+                max_image_concurrency=int(os.getenv("PREANALYSIS_MAX_IMAGE_CONCURRENCY", "4")),
+                only=changed_only,
+                max_bytes=int(os.getenv("PREANALYSIS_MAX_BYTES", str(DEFAULT_BUNDLE_BYTES))),
+                max_images=int(os.getenv("PREANALYSIS_MAX_IMAGES", str(DEFAULT_MAX_IMAGES))),
+                use_index=_env_flag("RELEVANCE_INDEX_ENABLED", True),
+            )
+        message = f"{message}\n\n{PREANALYSIS_MESSAGE}\n\n{bundle}"
+    return message
 
 
 # Run the generator when executed directly
 if __name__ == "__main__":
-    result = generate_terraform_infrastructure(source_repo_dir, dest_repo_dir)
+    parser = argparse.ArgumentParser(description="Generate Terraform scripts for the source project.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last unfinished run from its checkpoint in the destination repository")
+    parser.add_argument("--llm-host", choices=LLM_HOSTS, help="LLM host (defaults to LLM_HOST env variable)")
+    args = parser.parse_args()
+
+    load_environment()
+    # Get source and destination repository directories from environment variables
+    source_repo_dir = os.getenv("SOURCE_REPO_DIR", "/default/source/path")
+    dest_repo_dir = os.getenv("DEST_REPO_DIR", "/default/destination/path")
+
+    run_trace = RunTrace(os.path.basename(os.path.normpath(source_repo_dir)))
+    result = generate_terraform_infrastructure(source_repo_dir, dest_repo_dir, trace=run_trace, resume=args.resume,
+                                               llm_host=args.llm_host)
     print("Terraform generation complete!")
     print(f"Generated files in: {dest_repo_dir}")
+    print(f"LLM cache stats: {get_llm_cache().stats()}")
+    print(get_pipeline(args.llm_host).router.format_stats_table())
+    print(run_trace.format_summary_table())
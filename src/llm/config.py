@@ -0,0 +1,36 @@
+import os
+from typing import Any, Dict, Optional
+
+LLM_HOSTS = ("openai", "ollama")
+
+
+def resolve_llm_host(llm_host: Optional[str] = None) -> str:
+    """
+    LLM host name, LLM_HOST env variable by default. Raises ValueError for unknown hosts.
+    """
+    llm_host = (llm_host or os.getenv("LLM_HOST") or "openai").strip().strip('"').lower()
+    if llm_host not in LLM_HOSTS:
+        raise ValueError(f"Unknown LLM host '{llm_host}', expected one of {', '.join(LLM_HOSTS)}")
+    return llm_host
+
+
+def build_config_list(llm_host: Optional[str] = None) -> list[Dict[str, Any]]:
+    """
+    autogen config_list of the given LLM host, read from the environment when called (not at import time).
+    """
+    llm_host = resolve_llm_host(llm_host)
+    max_tokens = int(os.getenv("MAX_TOKENS", "16000"))
+    if llm_host == "ollama":
+        return [{
+            "model": os.getenv("LLAMA_MODEL_NAME"),
+            "base_url": os.getenv("LLAMA_API_BASE"),
+            "api_key": "ollama",
+            "temperature": 0.0,
+            "max_tokens": max_tokens,
+        }]
+    return [{
+        "model": os.getenv("MODEL_NAME"),
+        "base_url": os.getenv("OPENAI_API_BASE"),
+        "temperature": 0.0,
+        "max_tokens": max_tokens,
+    }]
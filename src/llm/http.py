@@ -0,0 +1,283 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: `rate` requests per second on average with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until the tokens are available. Returns the time spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def tokens_per_minute_limiter(tokens_per_minute: float) -> Optional[RateLimiter]:
+    """
+    Token bucket for a tokens-per-minute provider limit, None if the limit is 0.
+    """
+    return RateLimiter(tokens_per_minute / 60, burst=int(tokens_per_minute)) if tokens_per_minute else None
+
+
+# Responses worth retrying: rate limited, overloaded or temporarily unavailable provider
+RETRY_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+# Only chat/completion requests are coalesced, identical bodies give identical answers at temperature 0
+COALESCED_PATHS = ("/chat/completions", "/completions", "/embeddings")
+
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds of a rate limit header value: "20", "1.5s", "6m0s", "250ms". None if it can't be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Delay requested by the provider: retry-after(-ms) or the reset time of an exhausted rate limit.
+    """
+    if response.headers.get("retry-after-ms"):
+        delay = parse_duration(response.headers["retry-after-ms"])
+        return delay / 1000 if delay is not None else None
+    delay = parse_duration(response.headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    resets = [parse_duration(response.headers.get(f"x-ratelimit-reset-{kind}"))
+              for kind in ("requests", "tokens")
+              if response.headers.get(f"x-ratelimit-remaining-{kind}") == "0"]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[tuple[int, list[tuple[bytes, bytes]], bytes, Dict[str, Any]]] = None
+
+
+class PooledTransport(httpx.BaseTransport):
+    """
+    Transport of the shared client: bounded connection pool with keep-alive, token bucket scheduling
+    (requests and estimated prompt tokens), retries with exponential backoff and full jitter, and coalescing
+    of identical in-flight requests.
+
+    A 429 or an exhausted x-ratelimit-remaining header pauses all requests of the pool until the provider's
+    reset time, so concurrent workflows back off together instead of retrying into the limit.
+    """
+
+    def __init__(self, max_connections: int = 20, rate_limiter: Optional[RateLimiter] = None,
+                 token_limiter: Optional[RateLimiter] = None, max_retries: int = 3, backoff: float = 1.0,
+                 max_backoff: float = 60.0, coalesce: bool = True, transport: Optional[httpx.BaseTransport] = None):
+        self.transport = transport or httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.rate_limiter = rate_limiter
+        self.token_limiter = token_limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.coalesce = coalesce
+        self.paused_until = 0.0
+        self.stats = {"attempts": 0, "retries": 0, "rate_limited": 0, "coalesced": 0, "waited_seconds": 0.0}
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def _wait_for_capacity(self, request: httpx.Request) -> None:
+        waited = 0.0
+        while True:
+            with self._lock:
+                delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            time.sleep(delay)
+            waited += delay
+        if self.rate_limiter is not None:
+            waited += self.rate_limiter.acquire()
+        if self.token_limiter is not None:
+            # Prompt tokens estimated from the body size, capped so one large request can't block forever
+            waited += self.token_limiter.acquire(min(len(request.content) / 4, self.token_limiter.burst))
+        if waited:
+            self._count("waited_seconds", waited)
+
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        delay = retry_after(response) if response is not None else None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        return min(delay, self.max_backoff)
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            self._wait_for_capacity(request)
+            self._count("attempts")
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff_delay(attempt, None))
+                attempt += 1
+                continue
+
+            delay = self._backoff_delay(attempt, response)
+            if response.status_code == 429:
+                # All requests of the pool wait, not only the retry of this one
+                self._count("rate_limited")
+                self.pause(delay)
+            elif response.headers.get("x-ratelimit-remaining-requests") == "0" and retry_after(response):
+                # Limit reached by this request, hold the next ones until the window resets
+                self.pause(min(retry_after(response), self.max_backoff))
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response
+            response.close()
+            self._count("retries")
+            if response.status_code != 429:
+                time.sleep(delay)
+            attempt += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, waited_seconds=round(self.stats["waited_seconds"], 3))
+
+    @staticmethod
+    def _coalesce_key(request: httpx.Request) -> Optional[str]:
+        if request.method != "POST" or not request.url.path.endswith(COALESCED_PATHS):
+            return None
+        body = request.content
+        if b'"stream": true' in body or b'"stream":true' in body:
+            return None
+        return hashlib.sha256(str(request.url).encode("utf-8") + b"\n" + body).hexdigest()
+
+    @staticmethod
+    def _buffered(status_code: int, headers: list[tuple[bytes, bytes]], content: bytes,
+                  extensions: Dict[str, Any]) -> httpx.Response:
+        return httpx.Response(status_code, headers=headers, content=content, extensions=extensions)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = self._coalesce_key(request) if self.coalesce else None
+        if key is None:
+            return self._send(request)
+
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            leader = in_flight is None
+            if leader:
+                in_flight = self._in_flight[key] = _InFlight()
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.response is None:
+                # The leader failed, send the request on its own
+                return self._send(request)
+            self._count("coalesced")
+            status_code, headers, content, extensions = in_flight.response
+            return self._buffered(status_code, headers, content, dict(extensions, coalesced=True))
+
+        try:
+            response = self._send(request)
+            try:
+                # Raw bytes, content-encoding is decoded by every client reading its copy
+                content = b"".join(response.iter_raw())
+            finally:
+                response.close()
+            extensions = {key: value for key, value in response.extensions.items()
+                          if key in ("http_version", "reason_phrase")}
+            in_flight.response = (response.status_code, response.headers.raw, content, extensions)
+            return self._buffered(*in_flight.response)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            in_flight.done.set()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class SharedHttpClient(httpx.Client):
+    """
+    httpx client with a bounded connection pool, shared by all OpenAI clients of the process.
+    Rate limiting, retries and coalescing of identical requests are done by its PooledTransport.
+
+    autogen deep-copies llm_config for every agent, returning self from __deepcopy__ keeps one pool
+    (and its keep-alive connections) for all agents and workflows.
+    """
+
+    def __init__(self, max_connections: int = 20, rate_limiter: Optional[RateLimiter] = None,
+                 timeout: float = 600.0, token_limiter: Optional[RateLimiter] = None, max_retries: int = 3,
+                 coalesce: bool = True, **kwargs: Any):
+        self.pooled_transport = PooledTransport(max_connections=max_connections, rate_limiter=rate_limiter,
+                                                token_limiter=token_limiter, max_retries=max_retries,
+                                                coalesce=coalesce, transport=kwargs.pop("transport", None))
+        super().__init__(timeout=timeout, transport=self.pooled_transport, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    def stats(self) -> Dict[str, Any]:
+        return self.pooled_transport.summary()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "SharedHttpClient":
+        return self
+
+
+def with_http_client(config: Dict[str, Any], http_client: httpx.Client) -> Dict[str, Any]:
+    """
+    Return a copy of an llm config where every config_list entry uses the given http client.
+    A SharedHttpClient retries by itself, the retries of the OpenAI client are turned off to avoid retry storms.
+    """
+    extra = {"http_client": http_client}
+    if isinstance(http_client, SharedHttpClient) and http_client.pooled_transport.max_retries:
+        extra["max_retries"] = 0
+    config = dict(config)
+    if "config_list" in config:
+        config["config_list"] = [dict(entry, **extra) for entry in config["config_list"]]
+    else:
+        config.update(extra)
+    return config
+
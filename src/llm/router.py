@@ -0,0 +1,286 @@
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from src.constants.constants import SUMMARIZATION_PROMPT, SUMMARIZATION_SYSTEM_MESSAGE
+from src.llm.config import build_config_list, LLM_HOSTS, resolve_llm_host
+from src.llm.http import RateLimiter, SharedHttpClient, tokens_per_minute_limiter, with_http_client
+
+# Backend of each workflow task, None is the default LLM host. The large model writes HCL,
+# cheap steps go to the local model.
+DEFAULT_TASK_ROUTES: Dict[str, Optional[str]] = {
+    "analysis": None,
+    "generation": None,
+    "planning": None,
+    "image_recognition": None,
+    "summarization": "ollama",
+}
+
+# Per-backend defaults, overridden by LLM_<HOST>_MAX_CONCURRENCY / LLM_<HOST>_REQUESTS_PER_SECOND
+DEFAULT_MAX_CONCURRENCY = {"openai": 20, "ollama": 2}
+
+# Usage is at the end of a completion (and in the last event of a stream), only the tail of the body is kept
+USAGE_TAIL_BYTES = 4096
+
+USAGE_TOKENS_PATTERN = re.compile(rb'"(prompt_tokens|completion_tokens)"\s*:\s*(\d+)')
+
+
+def parse_usage(tail: bytes) -> Dict[str, int]:
+    """
+    Prompt and completion tokens of the last "usage" object in the tail of a completion body or event stream.
+    """
+    start = tail.rfind(b'"usage"')
+    if start == -1:
+        return {}
+    usage = {}
+    for name, value in USAGE_TOKENS_PATTERN.findall(tail, start):
+        usage.setdefault(name.decode("ascii"), int(value))
+    return usage
+
+
+class _UsageStream(httpx.SyncByteStream):
+    """
+    Response body passed through to the client unchanged; its decoded tail is kept and parsed for the usage
+    when the body is closed, so the stats hook neither buffers nor consumes the response.
+    """
+
+    def __init__(self, stream: httpx.SyncByteStream, content_encoding: str,
+                 on_usage: Callable[[Dict[str, int]], None]):
+        self._stream = stream
+        self._decoder = zlib.decompressobj(zlib.MAX_WBITS | 32) if content_encoding in ("gzip", "deflate") else None
+        self._on_usage = on_usage
+        self._tail = b""
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            data = self._decoder.decompress(chunk) if self._decoder else chunk
+            self._tail = (self._tail + data)[-USAGE_TAIL_BYTES:]
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_usage(parse_usage(self._tail))
+
+
+class BackendStats:
+    """
+    Thread-safe request, latency, token and cost counters of one backend, fed by httpx event hooks.
+    Tokens are counted from the usage of the completion once the client has read and closed the body.
+    """
+
+    def __init__(self, prompt_cost_per_1k: float = 0.0, completion_cost_per_1k: float = 0.0):
+        self.prompt_cost_per_1k = prompt_cost_per_1k
+        self.completion_cost_per_1k = completion_cost_per_1k
+        self.requests = 0
+        self.responses = 0
+        self.errors = 0
+        self.latency_seconds = 0.0
+        self.max_latency_seconds = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request) -> None:
+        request.extensions["llm_started"] = time.monotonic()
+        with self._lock:
+            self.requests += 1
+
+    def on_response(self, response: httpx.Response) -> None:
+        latency = time.monotonic() - response.request.extensions.get("llm_started", time.monotonic())
+        with self._lock:
+            self.responses += 1
+            self.errors += int(response.status_code >= 400)
+            self.latency_seconds += latency
+            self.max_latency_seconds = max(self.max_latency_seconds, latency)
+        # A coalesced response was paid once, by the request that actually went to the provider
+        if response.status_code >= 400 or response.extensions.get("coalesced"):
+            return
+        content_encoding = response.headers.get("content-encoding", "identity").lower()
+        if response.is_stream_consumed:
+            # Buffered by the transport (coalescing leader), the content is already in memory
+            self.on_usage(parse_usage(response.content[-USAGE_TAIL_BYTES:]))
+        elif content_encoding in ("identity", "gzip", "deflate") and isinstance(response.stream, httpx.SyncByteStream):
+            response.stream = _UsageStream(response.stream, content_encoding, self.on_usage)
+
+    def on_usage(self, usage: Dict[str, int]) -> None:
+        with self._lock:
+            self.prompt_tokens += usage.get("prompt_tokens") or 0
+            self.completion_tokens += usage.get("completion_tokens") or 0
+
+    @property
+    def cost(self) -> float:
+        return (self.prompt_tokens * self.prompt_cost_per_1k + self.completion_tokens * self.completion_cost_per_1k) / 1000
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                # Requests without any response: connection errors and timeouts
+                "failed_connections": self.requests - self.responses,
+                "avg_latency_seconds": round(self.latency_seconds / self.responses, 3) if self.responses else 0.0,
+                "max_latency_seconds": round(self.max_latency_seconds, 3),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "cost": round(self.cost, 4),
+            }
+
+
+class LLMBackend:
+    """
+    One LLM host: its config list and a pooled HTTP client limiting concurrent requests to the host.
+    Every client using the config list (agents, OpenAIWrapper instances) shares the pool and the stats.
+    """
+
+    def __init__(self, name: str, config_list: list[Dict[str, Any]], max_concurrency: int = 20,
+                 requests_per_second: float = 0.0, tokens_per_minute: float = 0.0, max_retries: int = 3,
+                 prompt_cost_per_1k: float = 0.0, completion_cost_per_1k: float = 0.0):
+        self.name = name
+        self.stats = BackendStats(prompt_cost_per_1k, completion_cost_per_1k)
+        self.http_client = SharedHttpClient(
+            max_connections=max_concurrency,
+            rate_limiter=RateLimiter(requests_per_second) if requests_per_second else None,
+            token_limiter=tokens_per_minute_limiter(tokens_per_minute),
+            max_retries=max_retries,
+            event_hooks={"request": [self.stats.on_request], "response": [self.stats.on_response]},
+        )
+        self.config_list = with_http_client({"config_list": config_list}, self.http_client)["config_list"]
+
+    @classmethod
+    def from_env(cls, name: str) -> "LLMBackend":
+        prefix = f"LLM_{name.upper()}_"
+        return cls(
+            name,
+            build_config_list(name),
+            max_concurrency=int(os.getenv(f"{prefix}MAX_CONCURRENCY", str(DEFAULT_MAX_CONCURRENCY.get(name, 20)))),
+            requests_per_second=float(os.getenv(f"{prefix}REQUESTS_PER_SECOND", "0")),
+            tokens_per_minute=float(os.getenv(f"{prefix}TOKENS_PER_MINUTE", "0")),
+            max_retries=int(os.getenv(f"{prefix}MAX_RETRIES", "3")),
+            prompt_cost_per_1k=float(os.getenv(f"{prefix}PROMPT_COST_PER_1K", "0")),
+            completion_cost_per_1k=float(os.getenv(f"{prefix}COMPLETION_COST_PER_1K", "0")),
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.config_list and self.config_list[0].get("model"))
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+def parse_routes(value: str) -> Dict[str, list[str]]:
+    """
+    Parse LLM_ROUTES, e.g. "summarization:ollama,generation:openai>ollama" (">" separates failover backends).
+    """
+    routes = {}
+    for item in value.split(","):
+        if ":" not in item:
+            continue
+        task, hosts = item.split(":", 1)
+        routes[task.strip()] = [resolve_llm_host(host) for host in hosts.split(">") if host.strip()]
+    return routes
+
+
+class LLMRouter:
+    """
+    Per-task backend selection with failover.
+
+    The LLM config of a task lists the backends of its route in order, autogen clients try the next config
+    when a backend fails. Tasks without a route use the default host.
+    """
+
+    def __init__(self, backends: Dict[str, LLMBackend], routes: Dict[str, list[str]], default_host: str,
+                 base_config: Optional[Dict[str, Any]] = None, failover: bool = True):
+        self.backends = backends
+        self.routes = routes
+        self.default_host = default_host
+        self.base_config = base_config or {}
+        self.failover = failover
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_host: Optional[str] = None,
+                 base_config: Optional[Dict[str, Any]] = None) -> "LLMRouter":
+        default_host = resolve_llm_host(default_host)
+        routes = {task: [host or default_host] for task, host in DEFAULT_TASK_ROUTES.items()}
+        routes.update(parse_routes(os.getenv("LLM_ROUTES", "")))
+        # Keep settings next to the config list (cache seed, timeout...), a flat config has nothing to keep
+        base_config = {key: value for key, value in (base_config or {}).items() if key != "config_list"} \
+            if base_config and "config_list" in base_config else {}
+        return cls({host: LLMBackend.from_env(host) for host in LLM_HOSTS}, routes, default_host, base_config,
+                   failover=os.getenv("LLM_FAILOVER", "true").lower() in ("1", "true", "yes"))
+
+    def backends_for(self, task: str) -> list[LLMBackend]:
+        """
+        Configured backends of the task in failover order, empty if none of its backends is configured.
+        """
+        hosts = list(self.routes.get(task, [self.default_host]))
+        # Cheap tasks routed to a local model are skipped rather than sent to the large model
+        if self.failover and DEFAULT_TASK_ROUTES.get(task) is None:
+            hosts += [host for host in [self.default_host, *self.backends] if host not in hosts]
+        return [self.backends[host] for host in hosts if host in self.backends and self.backends[host].configured]
+
+    def has_route(self, task: str) -> bool:
+        return bool(self.backends_for(task))
+
+    def llm_config(self, task: str) -> Dict[str, Any]:
+        backends = self.backends_for(task) or [self.backends[self.default_host]]
+        return dict(self.base_config, config_list=[entry for backend in backends for entry in backend.config_list])
+
+    def client(self, task: str):
+        """
+        Cached OpenAIWrapper of the task.
+        """
+        with self._lock:
+            if task not in self._clients:
+                from autogen import OpenAIWrapper
+                self._clients[task] = OpenAIWrapper(**self.llm_config(task))
+            return self._clients[task]
+
+    def complete(self, task: str, system_message: str, prompt: str) -> str:
+        from autogen import OpenAIWrapper
+
+        response = self.client(task).create(messages=[
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt},
+        ])
+        choices = OpenAIWrapper.extract_text_or_completion_object(response)
+        return str(choices[0]) if choices and choices[0] else ""
+
+    def summarizer(self, max_words: int = 120) -> Optional[Callable[[str], str]]:
+        """
+        Summarize function running on the summarization backend, None if no backend is configured for it.
+        """
+        if not self.has_route("summarization"):
+            return None
+        return lambda text: self.complete("summarization", SUMMARIZATION_SYSTEM_MESSAGE,
+                                          SUMMARIZATION_PROMPT.format(max_words=max_words, text=text))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(backend.stats.summary(), **backend.http_client.stats())
+                for name, backend in self.backends.items() if backend.stats.requests}
+
+    def format_stats_table(self) -> str:
+        lines = [f"{'backend':<10} {'requests':>8} {'errors':>6} {'retries':>7} {'429':>5} {'shared':>6} "
+                 f"{'avg s':>7} {'max s':>7} {'prompt':>9} {'completion':>10} {'cost':>8}"]
+        for name, stats in self.stats().items():
+            lines.append(f"{name:<10} {stats['requests']:>8} {stats['errors'] + stats['failed_connections']:>6} "
+                         f"{stats['retries']:>7} {stats['rate_limited']:>5} {stats['coalesced']:>6} "
+                         f"{stats['avg_latency_seconds']:>7} {stats['max_latency_seconds']:>7} "
+                         f"{stats['prompt_tokens']:>9} {stats['completion_tokens']:>10} {stats['cost']:>8}")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        for backend in self.backends.values():
+            backend.close()
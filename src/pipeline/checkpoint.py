@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.pipeline.instrumentation import written_file_path
+from src.pipeline.routing import ANALYSIS_COMPLETE, message_status
+
+CHECKPOINT_FILE_NAME = ".terraform_generation_checkpoint.jsonl"
+
+RUNNING = "running"
+FAILED = "failed"
+COMPLETED = "completed"
+
+# Records of the checkpoint log, one JSON object per line
+START_RECORD = "start"
+MESSAGE_RECORD = "message"
+FILE_RECORD = "file"
+STATUS_RECORD = "status"
+
+
+def _is_requirements_document(message: Dict[str, Any]) -> bool:
+    # The marker counts only where the workflow routes on it, not in prose, code blocks or rejected documents
+    return message.get("category") == "analysis" and message_status(message) == ANALYSIS_COMPLETE
+
+
+class WorkflowCheckpoint:
+    """
+    Workflow state persisted in the destination repository after every agent turn: the message history,
+    the current agent, the requirements document and the files written so far.
+    A failed run can be resumed from it without repeating the finished stages.
+
+    The state is an append-only JSONL log: the run (with its initial message) is recorded once, then every
+    agent turn, written file and status change adds one line, so a turn costs one short write whatever the history
+    length. Agent turns keep their tool calls and tool responses, a resumed run sees a tool exchange in full.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.source_dir = ""
+        self.dest_dir = ""
+        self.message = ""
+        self.status = RUNNING
+        self.error: Optional[str] = None
+        self.current_agent: Optional[str] = None
+        self.messages: list[Dict[str, Any]] = []
+        self.requirements_document: Optional[str] = None
+        self.files_written: list[str] = []
+        self.resumed = 0
+        self.updated = 0.0
+        self._lock = threading.Lock()
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        kind = record.get("type")
+        if kind == START_RECORD:
+            self.source_dir = record.get("source_dir", "")
+            self.dest_dir = record.get("dest_dir", "")
+            self.message = record.get("message", "")
+        elif kind == MESSAGE_RECORD:
+            message = {key: value for key, value in record.items() if key not in ("type", "time")}
+            self.current_agent = message["agent"]
+            self.messages.append(message)
+            if _is_requirements_document(message):
+                self.requirements_document = message["content"].replace(ANALYSIS_COMPLETE, "").strip()
+        elif kind == FILE_RECORD:
+            if record["path"] not in self.files_written:
+                self.files_written.append(record["path"])
+        elif kind == STATUS_RECORD:
+            self.status = record["status"]
+            self.error = record.get("error")
+            self.resumed = record.get("resumed", self.resumed)
+        self.updated = record.get("time", self.updated)
+
+    def _append(self, record: Dict[str, Any], mode: str = "a") -> None:
+        record = dict(record, time=time.time())
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._apply(record)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, mode, encoding="utf-8") as file:
+                file.write(line)
+
+    @classmethod
+    def load(cls, dest_repo_dir: str | Path) -> Optional["WorkflowCheckpoint"]:
+        path = Path(dest_repo_dir) / CHECKPOINT_FILE_NAME
+        if not path.is_file():
+            return None
+        checkpoint = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        checkpoint._apply(json.loads(line))
+                    except (ValueError, KeyError, AttributeError):
+                        # Line torn by an interrupted write
+                        print(f"Ignoring unreadable checkpoint record in {path}")
+        except OSError as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+        return checkpoint
+
+    @classmethod
+    def start(cls, source_dir: str | Path, dest_repo_dir: str | Path, message: str) -> "WorkflowCheckpoint":
+        checkpoint = cls(Path(dest_repo_dir) / CHECKPOINT_FILE_NAME)
+        # A new run replaces the log of the previous one
+        checkpoint._append({"type": START_RECORD, "source_dir": str(source_dir), "dest_dir": str(dest_repo_dir),
+                            "message": message}, mode="w")
+        return checkpoint
+
+    @property
+    def stage(self) -> str:
+        return "generation" if self.requirements_document else "analysis"
+
+    @property
+    def resumable(self) -> bool:
+        return self.status != COMPLETED and bool(self.message)
+
+    def on_event(self, event: Dict[str, Any]) -> None:
+        """
+        Trace listener: record agent turns (with tool calls and responses) and written files.
+        """
+        file_path = written_file_path(event)
+        if event["event"] == "agent_message":
+            record = {"type": MESSAGE_RECORD, "agent": event["agent"], "category": event.get("category"),
+                      "content": event["content"]}
+            for key in ("tool_calls", "tool_responses"):
+                if event.get(key):
+                    record[key] = event[key]
+            self._append(record)
+        elif file_path and file_path not in self.files_written:
+            self._append({"type": FILE_RECORD, "path": file_path})
+
+    def stage_messages(self, stage: str) -> list[Dict[str, Any]]:
+        """
+        Messages of the given stage in the last attempt: analysis turns come before the requirements document,
+        generation turns after it.
+        """
+        index = next((position for position, message in enumerate(self.messages)
+                      if _is_requirements_document(message)), len(self.messages))
+        return self.messages[:index] if stage == "analysis" else self.messages[index + 1:]
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.status = FAILED if error else COMPLETED
+        self.error = error
+        self.save()
+
+    def save(self) -> None:
+        """
+        Record the current status and resume count.
+        """
+        self._append({"type": STATUS_RECORD, "status": self.status, "error": self.error, "resumed": self.resumed})
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+DIGESTED_TEMPLATE = (
+    "[digested {kind}, {tokens} tokens] {summary}\n"
+    "[full content omitted, request the tool again if you need it]"
+)
+
+
+class ContextManager:
+    """
+    Keeps the prompt of an agent within a token budget.
+
+    Registered as a 'process_all_messages_before_reply' hook, it only changes the messages sent to the LLM,
+    the chat history itself stays intact. Tool results that were already answered by the agent are replaced
+    with a short summary; if the prompt is still over budget the oldest unpinned
+    messages are shortened as well. The first message (task) and the requirements document are pinned.
+    With a summarizer (e.g. a small local model) digests get a real summary instead of the truncated text.
+    """
+
+    def __init__(
+            self,
+            model: Optional[str] = None,
+            max_tokens: int = 60000,
+            keep_last: int = 4,
+            summary_tokens: int = 200,
+            pinned_markers: tuple[str, ...] = ("ANALYSIS_COMPLETE",),
+            summarizer: Optional[Callable[[str], str]] = None,
+            summarizer_input_tokens: int = 4000,
+    ):
+        import tiktoken
+
+        try:
+            self.encoding = tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.max_tokens = max_tokens
+        self.keep_last = keep_last
+        self.summary_tokens = summary_tokens
+        self.pinned_markers = pinned_markers
+        self.summarizer = summarizer
+        self.summarizer_input_tokens = summarizer_input_tokens
+        self._summaries: Dict[str, str] = {}
+        self.stats: List[Dict[str, int]] = []
+        self._token_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _content_text(message: Dict[str, Any]) -> str:
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        return json.dumps(content, ensure_ascii=False, default=str) if content is not None else ""
+
+    def count_text_tokens(self, text: str) -> int:
+        key = hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+        if key not in self._token_counts:
+            self._token_counts[key] = len(self.encoding.encode(text, disallowed_special=()))
+        return self._token_counts[key]
+
+    def count_tokens(self, message: Dict[str, Any]) -> int:
+        # ~4 tokens of per-message overhead in the chat format
+        tokens = 4 + self.count_text_tokens(self._content_text(message))
+        for key in ("tool_calls", "function_call"):
+            if message.get(key):
+                tokens += self.count_text_tokens(json.dumps(message[key], default=str))
+        return tokens
+
+    def count_messages_tokens(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.count_tokens(message) for message in messages)
+
+    @staticmethod
+    def is_tool_result(message: Dict[str, Any]) -> bool:
+        if message.get("role") in ("tool", "function") or message.get("tool_responses"):
+            return True
+        content = message.get("content")
+        return isinstance(content, str) and content.lstrip().startswith("TOOL_RESULT")
+
+    def is_pinned(self, index: int, message: Dict[str, Any]) -> bool:
+        if index == 0 or message.get("role") == "system":
+            return True
+        content = message.get("content")
+        return isinstance(content, str) and any(marker in content for marker in self.pinned_markers)
+
+    def summarize(self, text: str) -> str:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= self.summary_tokens:
+            return text
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(self.encoding.decode(tokens[:self.summarizer_input_tokens])).strip()
+            except Exception as e:
+                print(f"Summarizer failed, digest is truncated: {e}")
+                summary = ""
+            summary_tokens = self.encoding.encode(summary, disallowed_special=())
+            if summary and len(summary_tokens) <= self.summary_tokens * 2:
+                return summary
+        return self.encoding.decode(tokens[:self.summary_tokens]) + " ..."
+
+    def digest(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Replace the message content with a summary, the original content stays only in the chat history.
+        """
+        text = self._content_text(message)
+        key = hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+        # Digests are recomputed on every turn, the summary of each content is made only once
+        if key not in self._summaries:
+            self._summaries[key] = self.summarize(text)
+        digested_content = DIGESTED_TEMPLATE.format(
+            kind="tool result" if self.is_tool_result(message) else "message",
+            tokens=self.count_text_tokens(text), summary=self._summaries[key]
+        )
+        digested = dict(message, content=digested_content)
+        if message.get("tool_responses"):
+            digested["tool_responses"] = [dict(response, content=digested_content)
+                                          for response in message["tool_responses"]]
+        return digested
+
+    def compact(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Return a copy of the messages that fits into the token budget.
+        """
+        if not messages:
+            return messages
+
+        tokens_before = self.count_messages_tokens(messages)
+        recent_start = max(len(messages) - self.keep_last, 0)
+        compacted = []
+        for index, message in enumerate(messages):
+            if (index < recent_start and not self.is_pinned(index, message)
+                    and self.is_tool_result(message) and self.count_tokens(message) > self.summary_tokens):
+                message = self.digest(message)
+            compacted.append(message)
+
+        # Still over budget: shorten the oldest unpinned messages
+        total = self.count_messages_tokens(compacted)
+        for index in range(recent_start):
+            if total <= self.max_tokens:
+                break
+            message = compacted[index]
+            if self.is_pinned(index, message) or self.count_tokens(message) <= self.summary_tokens + 50:
+                continue
+            digested = self.digest(message)
+            total -= self.count_tokens(message) - self.count_tokens(digested)
+            compacted[index] = digested
+
+        self.stats.append({"messages": len(messages), "tokens_before": tokens_before, "tokens_after": total})
+        if total != tokens_before:
+            print(f"Context compacted: {tokens_before} -> {total} tokens ({len(messages)} messages)")
+        return compacted
+
+    def add_to_agent(self, agent: Any) -> None:
+        agent.register_hook("process_all_messages_before_reply", self.compact)
+
+
+def create_context_manager(model: Optional[str] = None,
+                           summarizer: Optional[Callable[[str], str]] = None) -> ContextManager:
+    """
+    Create a context manager configured from environment variables.
+    """
+    return ContextManager(
+        model=model,
+        max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "60000")),
+        keep_last=int(os.getenv("CONTEXT_KEEP_LAST", "4")),
+        summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200")),
+        summarizer=summarizer,
+        summarizer_input_tokens=int(os.getenv("CONTEXT_SUMMARIZER_INPUT_TOKENS", "4000")),
+    )
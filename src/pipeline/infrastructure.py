@@ -0,0 +1,269 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterable, Optional
+
+# Marker of the infrastructure IR in the requirements document, followed by a JSON object
+IR_MARKER = "INFRASTRUCTURE_IR"
+
+# The marker at the start of a line with an optional fenced code block around the JSON object,
+# a mention of the marker inside a sentence is not a block
+IR_BLOCK_PATTERN = re.compile(rf"^[ \t]*{IR_MARKER}\b[ \t]*:?\s*(?:```(?:json)?\s*)?", re.MULTILINE)
+
+# Completion marker of the requirements document, kept when an unreadable IR block is cut out
+COMPLETION_LINE_PATTERN = re.compile(r"^[ \t]*ANALYSIS_COMPLETE\b", re.MULTILINE)
+
+COMPONENT_ID_PATTERN = re.compile(r"^[a-z][a-z0-9_-]*$")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _compact_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in data.items() if value not in (None, "", [], {})}
+
+
+class ScalingPolicy:
+    """
+    Autoscaling of a component: instance range and the target utilization of a metric.
+    """
+
+    def __init__(self, min_instances: int = 1, max_instances: int = 1, metric: Optional[str] = None,
+                 target: Optional[float] = None):
+        self.min_instances = min_instances
+        self.max_instances = max_instances
+        self.metric = metric
+        self.target = target
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ScalingPolicy":
+        return cls(int(data.get("min", 1)), int(data.get("max", data.get("min", 1))), data.get("metric"),
+                   float(data["target"]) if data.get("target") is not None else None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _compact_dict({"min": self.min_instances, "max": self.max_instances, "metric": self.metric,
+                              "target": self.target})
+
+
+class Component:
+    """
+    Infrastructure component: what it is (kind, e.g. compute_engine, cloud_sql, internal_load_balancer),
+    where it runs, how it scales and which requirements it comes from.
+    """
+
+    def __init__(self, id: str, kind: str, description: str = "", zones: Optional[list[str]] = None,
+                 requirements: Optional[list[str]] = None, scaling: Optional[ScalingPolicy] = None,
+                 properties: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.kind = kind
+        self.description = description
+        self.zones = zones or []
+        self.requirements = requirements or []
+        self.scaling = scaling
+        self.properties = properties or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Component":
+        return cls(
+            str(data.get("id", "")).strip().lower(),
+            str(data.get("kind", "")).strip().lower(),
+            str(data.get("description", "")),
+            [str(zone) for zone in data.get("zones", [])],
+            [str(req) for req in data.get("requirements", [])],
+            ScalingPolicy.from_dict(data["scaling"]) if isinstance(data.get("scaling"), dict) else None,
+            dict(data.get("properties") or {}),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _compact_dict({"id": self.id, "kind": self.kind, "description": self.description,
+                              "zones": self.zones, "requirements": self.requirements,
+                              "scaling": self.scaling.to_dict() if self.scaling else None,
+                              "properties": self.properties})
+
+
+class NetworkLink:
+    """
+    Traffic between two components, e.g. reads/writes from the load balancer to ProxySQL or replication.
+    """
+
+    def __init__(self, source: str, target: str, protocol: str = "", port: Optional[int] = None,
+                 description: str = ""):
+        self.source = source
+        self.target = target
+        self.protocol = protocol
+        self.port = port
+        self.description = description
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NetworkLink":
+        return cls(str(data.get("from", "")).strip().lower(), str(data.get("to", "")).strip().lower(),
+                   str(data.get("protocol", "")), int(data["port"]) if data.get("port") is not None else None,
+                   str(data.get("description", "")))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _compact_dict({"from": self.source, "to": self.target, "protocol": self.protocol,
+                              "port": self.port, "description": self.description})
+
+
+class InfrastructureIR:
+    """
+    Typed hand-off between the analyzer and the generator: components, zones, network links and scaling policies.
+
+    The analyzer writes it as JSON after the INFRASTRUCTURE_IR marker, it is validated locally and stored compactly
+    in the requirements document. Generation prompts carry only the slice of the components of one module.
+    """
+
+    def __init__(self, components: list[Component], links: Optional[list[NetworkLink]] = None,
+                 region: Optional[str] = None, zones: Optional[list[str]] = None):
+        self.components = components
+        self.links = links or []
+        self.region = region
+        self.zones = zones or []
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InfrastructureIR":
+        return cls(
+            [Component.from_dict(item) for item in data.get("components", []) if isinstance(item, dict)],
+            [NetworkLink.from_dict(item) for item in data.get("links", []) if isinstance(item, dict)],
+            data.get("region"),
+            [str(zone) for zone in data.get("zones", [])],
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _compact_dict({"region": self.region, "zones": self.zones,
+                              "components": [component.to_dict() for component in self.components],
+                              "links": [link.to_dict() for link in self.links]})
+
+    def component(self, component_id: str) -> Optional[Component]:
+        return next((component for component in self.components if component.id == component_id), None)
+
+    def validate(self, requirement_ids: Optional[Iterable[str]] = None) -> list[str]:
+        """
+        Problems of the IR: duplicate or invalid ids, unknown zones, link ends and requirements, bad scaling ranges.
+        """
+        if not self.components:
+            return ["no components"]
+        errors = []
+        requirement_ids = set(requirement_ids) if requirement_ids is not None else None
+        seen = set()
+        for component in self.components:
+            if not COMPONENT_ID_PATTERN.match(component.id):
+                errors.append(f"component '{component.id}': invalid id, use lowercase letters, digits, '-' and '_'")
+            if component.id in seen:
+                errors.append(f"component '{component.id}': duplicate id")
+            seen.add(component.id)
+            if not component.kind:
+                errors.append(f"component '{component.id}': missing kind")
+            unknown_zones = [zone for zone in component.zones if self.zones and zone not in self.zones]
+            if unknown_zones:
+                errors.append(f"component '{component.id}': unknown zones {', '.join(unknown_zones)}")
+            if requirement_ids is not None:
+                unknown = [req for req in component.requirements if req not in requirement_ids]
+                if unknown:
+                    errors.append(f"component '{component.id}': unknown requirements {', '.join(unknown)}")
+            scaling = component.scaling
+            if scaling and not 0 <= scaling.min_instances <= scaling.max_instances:
+                errors.append(f"component '{component.id}': invalid scaling range "
+                              f"{scaling.min_instances}..{scaling.max_instances}")
+            if scaling and scaling.target is not None and not 0 < scaling.target <= 1:
+                errors.append(f"component '{component.id}': scaling target must be a utilization in (0, 1]")
+        for link in self.links:
+            for end in (link.source, link.target):
+                if end not in seen:
+                    errors.append(f"link {link.source}->{link.target}: unknown component '{end}'")
+            if link.port is not None and not 0 < link.port < 65536:
+                errors.append(f"link {link.source}->{link.target}: invalid port {link.port}")
+        return errors
+
+    def slice(self, requirement_ids: Iterable[str]) -> "InfrastructureIR":
+        """
+        Components of the given requirements with their links; the other end of a link is included
+        only by id and kind, so a module knows what it connects to without its details.
+        """
+        requirement_ids = set(requirement_ids)
+        selected = [component for component in self.components
+                    if requirement_ids.intersection(component.requirements)]
+        selected_ids = {component.id for component in selected}
+        links = [link for link in self.links if link.source in selected_ids or link.target in selected_ids]
+        neighbors = []
+        for link in links:
+            for end in (link.source, link.target):
+                component = self.component(end)
+                if end not in selected_ids and component and component not in neighbors:
+                    neighbors.append(component)
+        components = selected + [Component(component.id, component.kind) for component in neighbors]
+        zones = [zone for zone in self.zones if any(zone in component.zones for component in selected)]
+        return InfrastructureIR(components, links, self.region, zones)
+
+    def to_compact(self) -> str:
+        """
+        Minified JSON with one component or link per line, empty fields are left out.
+        """
+        data = self.to_dict()
+        parts = [f'"{key}":{_dumps(value)}' for key, value in data.items() if key not in ("components", "links")]
+        for key in ("components", "links"):
+            if data.get(key):
+                parts.append(f'"{key}":[\n' + ",\n".join(_dumps(item) for item in data[key]) + "]")
+        return "{" + ",\n".join(parts) + "}"
+
+    def digest(self) -> str:
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _find_ir_block(text: str) -> Optional[tuple[int, int, Dict[str, Any]]]:
+    """
+    Start, end and parsed JSON object of the IR block in the text. Raises ValueError if the JSON is malformed.
+    """
+    match = IR_BLOCK_PATTERN.search(text)
+    if match is None:
+        return None
+    data, end = json.JSONDecoder().raw_decode(text, match.end())
+    if not isinstance(data, dict):
+        raise ValueError(f"{IR_MARKER} must be a JSON object")
+    closing = re.match(r"\s*```", text[end:])
+    return match.start(), end + (closing.end() if closing else 0), data
+
+
+def _unreadable_block_span(text: str) -> tuple[int, int]:
+    """
+    Start and end of an IR block whose JSON can't be parsed: it ends at its closing fence, otherwise at the
+    completion marker line or the end of the text.
+    """
+    match = IR_BLOCK_PATTERN.search(text)
+    if "```" in match.group(0):
+        closing = text.find("```", match.end())
+        if closing != -1:
+            return match.start(), closing + 3
+    completion = COMPLETION_LINE_PATTERN.search(text, match.end())
+    return match.start(), completion.start() if completion else len(text)
+
+
+def extract_infrastructure_ir(text: str) -> Optional[InfrastructureIR]:
+    """
+    Infrastructure IR of a requirements document, None if there is no readable one.
+    """
+    try:
+        block = _find_ir_block(text)
+        return InfrastructureIR.from_dict(block[2]) if block else None
+    except (TypeError, ValueError):
+        return None
+
+
+def compact_infrastructure_ir(document: str, requirement_ids: Optional[Iterable[str]] = None) -> tuple[str, list[str]]:
+    """
+    Validate the IR of a requirements document and replace it with its compact form.
+    An invalid IR is removed (the generator then works from the requirement lines) and its problems are returned.
+    """
+    try:
+        block = _find_ir_block(document)
+        if block is None:
+            return document, []
+        start, end, data = block
+        infrastructure = InfrastructureIR.from_dict(data)
+    except (TypeError, ValueError) as e:
+        start, end = _unreadable_block_span(document)
+        return f"{document[:start]}{document[end:]}".strip(), [f"unreadable {IR_MARKER}: {e}"]
+    errors = infrastructure.validate(requirement_ids)
+    replacement = "" if errors else f"{IR_MARKER}\n{infrastructure.to_compact()}"
+    return f"{document[:start]}{replacement}{document[end:]}".strip(), errors
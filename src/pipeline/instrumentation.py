@@ -0,0 +1,273 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_current_trace: contextvars.ContextVar[Optional["RunTrace"]] = contextvars.ContextVar("current_trace", default=None)
+
+SUMMARY_FIELDS = ("calls", "wall_time", "prompt_tokens", "completion_tokens", "retries", "cache_hits")
+
+
+class RunCancelledError(RuntimeError):
+    """
+    Raised at the next agent turn or tool call after a run was cancelled.
+    """
+
+
+class RunTrace:
+    """
+    Timing and token records of a single workflow run.
+
+    Spans are collected per agent turn, tool call and pipeline stage, and exported in Chrome trace event
+    format (loadable in chrome://tracing or Perfetto). Listeners receive progress events (agent messages,
+    tool calls) as they happen, and a run can be cancelled cooperatively through its trace.
+    """
+
+    def __init__(self, name: str = "terraform_generation", listener: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.name = name
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.spans: list[Dict[str, Any]] = []
+        self.listeners: list[Callable[[Dict[str, Any]], None]] = [listener] if listener is not None else []
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        self.listeners.append(listener)
+
+    def emit(self, event: str, **data: Any) -> None:
+        if not self.listeners:
+            return
+        record = {"event": event, "time": time.time(), **data}
+        for listener in self.listeners:
+            listener(record)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise RunCancelledError(f"Run '{self.name}' was cancelled")
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Record a span; attributes may be updated inside the block through the yielded dict.
+        """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except Exception as e:
+            attributes["error"] = str(e)
+            raise
+        finally:
+            record = {
+                "name": name,
+                "category": category,
+                "start": start - self._origin,
+                "duration": time.perf_counter() - start,
+                "thread": threading.get_ident(),
+                "attributes": attributes,
+            }
+            with self._lock:
+                self.spans.append(record)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        events = [
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": round(span["start"] * 1e6),
+                "dur": round(span["duration"] * 1e6),
+                "pid": os.getpid(),
+                "tid": span["thread"],
+                "args": span["attributes"],
+            }
+            for span in self.spans
+        ]
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"run": self.name, "started": self.started, "summary": self.summary()},
+        }
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(), file, indent=1, default=str)
+        return path
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate spans by category and name.
+        """
+        rows: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            attributes = span["attributes"]
+            row = rows.setdefault(f"{span['category']}:{span['name']}", dict.fromkeys(SUMMARY_FIELDS, 0))
+            row["calls"] += 1
+            row["wall_time"] += span["duration"]
+            row["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+            row["completion_tokens"] += attributes.get("completion_tokens", 0)
+            row["retries"] += attributes.get("retries", 0)
+            row["cache_hits"] += 1 if attributes.get("cache_hit") else 0
+        return rows
+
+    def format_summary_table(self) -> str:
+        rows = self.summary()
+        headers = ("stage",) + SUMMARY_FIELDS
+
+        def cells(key: str, row: Dict[str, Any]) -> list[str]:
+            return [key] + [f"{row[field]:.2f}" if field == "wall_time" else str(row[field]) for field in SUMMARY_FIELDS]
+
+        lines = [cells(key, row) for key, row in sorted(rows.items(), key=lambda item: -item[1]["wall_time"])]
+        totals = {field: sum(row[field] for row in rows.values()) for field in SUMMARY_FIELDS}
+        # Stage spans contain agent turns and tool calls, so the total wall time is the run duration
+        totals["wall_time"] = time.perf_counter() - self._origin
+        lines.append(cells("TOTAL", totals))
+
+        widths = [max(len(cell) for cell in column) for column in zip(headers, *lines)]
+        formatted = [" | ".join(cell.ljust(width) for cell, width in zip(headers, widths)),
+                     "-+-".join("-" * width for width in widths)]
+        formatted += [" | ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in lines]
+        return "\n".join(formatted)
+
+
+def get_current_trace() -> Optional[RunTrace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def use_trace(trace: RunTrace) -> Iterator[RunTrace]:
+    """
+    Make the trace current for the calling context (threads started with asyncio.to_thread inherit it).
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def trace_span(name: str, category: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Record a span in the current trace, no-op if no trace is active.
+    """
+    trace = get_current_trace()
+    if trace is None:
+        yield attributes
+        return
+    with trace.span(name, category, **attributes) as span_attributes:
+        yield span_attributes
+
+
+def response_usage(response: Any) -> Dict[str, int]:
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+    }
+
+
+def _usage_totals(agent: Any) -> tuple[int, int]:
+    usage = getattr(getattr(agent, "client", None), "total_usage_summary", None) or {}
+    prompt_tokens = completion_tokens = 0
+    for model_usage in usage.values():
+        if isinstance(model_usage, dict):
+            prompt_tokens += model_usage.get("prompt_tokens", 0)
+            completion_tokens += model_usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+def _reply_text(reply: Any) -> str:
+    if isinstance(reply, dict):
+        if reply.get("tool_calls"):
+            return "tool calls: " + ", ".join(call.get("function", {}).get("name", "?") for call in reply["tool_calls"])
+        return str(reply.get("content") or "")
+    return str(reply or "")
+
+
+def instrument_agent(agent: Any, category: str = "agent") -> None:
+    """
+    Wrap agent.generate_reply to record a span per agent turn with the token usage of the turn.
+    The span goes into the trace current at call time, so an agent is instrumented only once.
+    The agent_message event records the message as it is sent, after the process_message_before_send hooks
+    registered before (e.g. the infrastructure IR check).
+    """
+    if getattr(agent, "_instrumented", False):
+        return
+    generate_reply = agent.generate_reply
+
+    @functools.wraps(generate_reply)
+    def traced_generate_reply(*args: Any, **kwargs: Any) -> Any:
+        trace = get_current_trace()
+        if trace is None:
+            return generate_reply(*args, **kwargs)
+        trace.check_cancelled()
+        turn = 1 + sum(1 for span in trace.spans if span["name"] == agent.name and span["category"] == category)
+        prompt_before, completion_before = _usage_totals(agent)
+        with trace.span(agent.name, category, turn=turn) as attributes:
+            reply = generate_reply(*args, **kwargs)
+            prompt_after, completion_after = _usage_totals(agent)
+            attributes["prompt_tokens"] = prompt_after - prompt_before
+            attributes["completion_tokens"] = completion_after - completion_before
+            # Every executor turn after the first one is a retry after EXECUTION_ERROR
+            if category == "executor" and turn > 1:
+                attributes["retries"] = 1
+        return reply
+
+    def record_sent_message(sender=None, message=None, recipient=None, silent=False):
+        trace = get_current_trace()
+        if trace is not None:
+            exchange = {key: message[key] for key in ("tool_calls", "tool_responses")
+                        if isinstance(message, dict) and message.get(key)}
+            trace.emit("agent_message", agent=agent.name, category=category, content=_reply_text(message), **exchange)
+        return message
+
+    agent.generate_reply = traced_generate_reply
+    agent.register_hook("process_message_before_send", record_sent_message)
+    agent._instrumented = True
+
+
+# Tools writing files in the destination repository
+WRITE_TOOLS = ("write_file_content", "write_file_patch")
+
+
+def written_file_path(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Path of the file written by a tool_call event, None for other events.
+    """
+    if event["event"] != "tool_call" or event["tool"] not in WRITE_TOOLS:
+        return None
+    return event["arguments"].get("file_path") or event["arguments"].get("path") or \
+        (event["args"][0] if event["args"] else None)
+
+
+def instrument_tool(name: str, tool: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a tool function to record a span per call. The signature is kept for tool registration.
+    """
+    @functools.wraps(tool)
+    def traced_tool(*args: Any, **kwargs: Any) -> Any:
+        trace = get_current_trace()
+        if trace is None:
+            return tool(*args, **kwargs)
+        trace.check_cancelled()
+        trace.emit("tool_call", tool=name, arguments={key: str(value)[:200] for key, value in kwargs.items()},
+                   args=[str(arg)[:200] for arg in args])
+        with trace.span(name, "tool"):
+            return tool(*args, **kwargs)
+
+    return traced_tool
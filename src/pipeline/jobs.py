@@ -0,0 +1,150 @@
+import collections
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from src.pipeline.instrumentation import RunCancelledError, RunTrace, written_file_path
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    A single Terraform generation run submitted by a user, with its progress events.
+    """
+
+    def __init__(self, user: str, source_dir: str, dest_dir: str, max_events: int = 1000):
+        self.id = uuid.uuid4().hex[:8]
+        self.user = user
+        self.source_dir = source_dir
+        self.dest_dir = dest_dir
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.message = ""
+        self.events: collections.deque[Dict[str, Any]] = collections.deque(maxlen=max_events)
+        self.generated_files: list[str] = []
+        self.trace = RunTrace(os.path.basename(os.path.normpath(source_dir)) or "run", listener=self.on_event)
+        self.future: Optional[Future] = None
+
+    def on_event(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        file_path = written_file_path(event)
+        if file_path and file_path not in self.generated_files:
+            self.generated_files.append(file_path)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def duration(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def format_log(self, max_chars: int = 500) -> str:
+        lines = []
+        for event in list(self.events):
+            timestamp = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+            if event["event"] == "agent_message":
+                content = event["content"]
+                content = content if len(content) <= max_chars else content[:max_chars] + " ..."
+                lines.append(f"[{timestamp}] {event['agent']}: {content}")
+            elif event["event"] == "tool_call":
+                lines.append(f"[{timestamp}] tool {event['tool']} {event['arguments'] or event['args']}")
+            else:
+                lines.append(f"[{timestamp}] {event['event']}: {event.get('message', '')}")
+        return "\n".join(lines)
+
+    def summary(self) -> list[Any]:
+        return [self.id, self.status, self.source_dir, self.dest_dir, f"{self.duration():.0f}s",
+                len(self.generated_files)]
+
+
+class JobQueue:
+    """
+    Bounded queue running generation jobs on a thread pool with `max_workers` concurrent runs.
+    `run_job` returns whether the generation succeeded.
+    """
+
+    def __init__(self, run_job: Callable[[Job], bool], max_workers: int = 2, max_pending: int = 20,
+                 history_size: int = 50):
+        self.run_job = run_job
+        self.max_pending = max_pending
+        self.history_size = history_size
+        self.jobs: Dict[str, Job] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="terraform-job")
+        self._lock = threading.Lock()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if not job.done)
+
+    def submit(self, user: str, source_dir: str, dest_dir: str) -> Job:
+        job = Job(user, source_dir, dest_dir)
+        # Checked and inserted under one lock, concurrent submits can't exceed max_pending
+        with self._lock:
+            if sum(1 for pending in self.jobs.values() if not pending.done) >= self.max_pending:
+                raise RuntimeError(f"Too many pending jobs ({self.max_pending}), try again later")
+            self.jobs[job.id] = job
+            self._trim_history(user)
+        job.future = self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        if job.status == CANCELLED:
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            if self.run_job(job):
+                job.status = SUCCEEDED
+                job.message = "Terraform generation completed successfully!"
+            else:
+                job.status = FAILED
+                job.message = "Terraform generation did not complete: the generated scripts did not pass the checks"
+        except RunCancelledError:
+            job.status = CANCELLED
+            job.message = "Cancelled"
+        except Exception as e:
+            job.status = FAILED
+            job.message = f"Error: {str(e)}"
+        finally:
+            job.finished = time.time()
+            job.trace.emit("finished", message=job.message)
+
+    def cancel(self, job_id: str, user: Optional[str] = None) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.done or (user is not None and job.user != user):
+            return False
+        if job.future is not None and job.future.cancel():
+            job.status = CANCELLED
+            job.message = "Cancelled before start"
+            job.finished = time.time()
+        else:
+            # Running job stops at its next agent turn or tool call
+            job.trace.cancel()
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def jobs_for_user(self, user: str) -> list[Job]:
+        with self._lock:
+            return sorted((job for job in self.jobs.values() if job.user == user), key=lambda job: -job.created)
+
+    def _trim_history(self, user: str) -> None:
+        finished = sorted((job for job in self.jobs.values() if job.user == user and job.done),
+                          key=lambda job: job.created)
+        for job in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job.id]
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from src.cache.llm_cache import file_digest
+from src.pipeline.preanalysis import collect_relevant_files
+
+MANIFEST_FILE_NAME = ".terraform_generation_manifest.json"
+
+# Requirement lines produced by the analyzer: "- [R1] (sources: doc/a.txt, doc/b.png) requirement text"
+REQUIREMENT_PATTERN = re.compile(r"\[(R\d+)\]\s*\(sources?:\s*([^)]*)\)\s*(.*)")
+
+# Header comment written by the generator in each module main.tf: "# Requirements: R1, R2"
+MODULE_REQUIREMENTS_PATTERN = re.compile(r"^#\s*Requirements:\s*(.*)$", re.MULTILINE)
+
+
+def parse_requirements(requirements_document: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse tagged requirement lines of the requirements document into {id: {"text", "sources"}}.
+    """
+    requirements = {}
+    for match in REQUIREMENT_PATTERN.finditer(requirements_document):
+        req_id, sources, text = match.groups()
+        requirements[req_id] = {
+            "text": text.strip(),
+            "sources": [source.strip() for source in sources.split(",") if source.strip()],
+        }
+    return requirements
+
+
+def scan_terraform_modules(terraform_dir: str | Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Collect generated modules (root and modules/*) with the requirements they cover and a hash of their files.
+    """
+    terraform_dir = Path(terraform_dir)
+    module_dirs = [terraform_dir]
+    if (terraform_dir / "modules").is_dir():
+        module_dirs += sorted(path for path in (terraform_dir / "modules").iterdir() if path.is_dir())
+
+    modules = {}
+    for module_dir in module_dirs:
+        tf_files = sorted(module_dir.glob("*.tf"))
+        if not tf_files:
+            continue
+        requirements = []
+        main_tf = module_dir / "main.tf"
+        if main_tf.is_file():
+            for match in MODULE_REQUIREMENTS_PATTERN.finditer(main_tf.read_text(encoding="utf-8", errors="replace")):
+                requirements += [req.strip() for req in match.group(1).split(",") if req.strip()]
+        modules[module_dir.relative_to(terraform_dir.parent).as_posix()] = {
+            "requirements": requirements,
+            "files": {tf_file.name: file_digest(tf_file) for tf_file in tf_files},
+        }
+    return modules
+
+
+def compute_source_hashes(source_dir: str | Path) -> Dict[str, str]:
+    """
+    Hash all infrastructure relevant files of the source project, keyed by relative path.
+    """
+    files = collect_relevant_files(source_dir)
+    return {rel_path: file_digest(os.path.join(source_dir, rel_path))
+            for rel_path in sorted(files["text"] + files["image"])}
+
+
+def extract_requirements_document(result: Any, marker: str = "ANALYSIS_COMPLETE") -> Optional[str]:
+    """
+    Find the analyzer message with the complete requirements document in a workflow result.
+    """
+    messages = getattr(result, "chat_history", result)
+    if not isinstance(messages, list):
+        return None
+    for message in reversed(messages):
+        content = message.get("content") if isinstance(message, dict) else message
+        if isinstance(content, str) and marker in content:
+            return content.replace(marker, "").strip()
+    return None
+
+
+def message_digest(message: Optional[str]) -> str:
+    """
+    Hash of the custom message of a run, a different message means a different generation.
+    """
+    return hashlib.sha256((message or "").encode("utf-8")).hexdigest()
+
+
+class GenerationPlan:
+    """
+    What has to be redone on a rerun: changed/removed source files, generated modules edited or removed
+    since the last run, affected requirements and modules.
+    """
+
+    def __init__(self, changed_sources: list[str], removed_sources: list[str],
+                 affected_requirements: list[str], affected_modules: list[str], full_run: bool,
+                 changed_modules: Optional[list[str]] = None):
+        self.changed_sources = changed_sources
+        self.removed_sources = removed_sources
+        self.affected_requirements = affected_requirements
+        self.affected_modules = affected_modules
+        self.full_run = full_run
+        self.changed_modules = changed_modules or []
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.full_run and not self.changed_sources and not self.removed_sources \
+            and not self.changed_modules
+
+
+class GenerationManifest:
+    """
+    Manifest persisted in the destination repository. It maps each source file hash to the requirement
+    fragments it produced and each generated Terraform module to the requirements it covers.
+    """
+
+    def __init__(self, path: str | Path, data: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        data = data or {}
+        self.sources: Dict[str, Dict[str, Any]] = data.get("sources", {})
+        self.requirements: Dict[str, Dict[str, Any]] = data.get("requirements", {})
+        self.modules: Dict[str, Dict[str, Any]] = data.get("modules", {})
+        self.requirements_document: str = data.get("requirements_document", "")
+        self.message_hash: Optional[str] = data.get("message_hash")
+
+    @classmethod
+    def load(cls, dest_repo_dir: str | Path) -> "GenerationManifest":
+        path = Path(dest_repo_dir) / MANIFEST_FILE_NAME
+        if path.is_file():
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    return cls(path, json.load(file))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {path}: {e}")
+        return cls(path)
+
+    def save(self) -> None:
+        data = {
+            "version": 2,
+            "sources": self.sources,
+            "requirements": self.requirements,
+            "modules": self.modules,
+            "requirements_document": self.requirements_document,
+            "message_hash": self.message_hash,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def plan(self, source_hashes: Dict[str, str], terraform_dir: Optional[str | Path] = None,
+             message: Optional[str] = None) -> GenerationPlan:
+        """
+        Compare current source hashes, generated modules and the custom message with the manifest
+        and work out what needs regeneration. A different message or a missing terraform folder means a full run.
+        """
+        if not self.requirements_document or not self.modules or self.message_hash != message_digest(message):
+            return GenerationPlan(sorted(source_hashes), [], [], [], full_run=True)
+
+        changed_modules = []
+        if terraform_dir is not None:
+            current_modules = scan_terraform_modules(terraform_dir) if os.path.isdir(terraform_dir) else {}
+            if not current_modules:
+                return GenerationPlan(sorted(source_hashes), [], [], [], full_run=True)
+            # Modules edited or removed since the last run, and modules added outside of it
+            changed_modules = sorted(
+                module for module in set(self.modules) | set(current_modules)
+                if self.modules.get(module, {}).get("files") != current_modules.get(module, {}).get("files"))
+
+        changed = sorted(path for path, digest in source_hashes.items()
+                         if self.sources.get(path, {}).get("hash") != digest)
+        removed = sorted(path for path in self.sources if path not in source_hashes)
+
+        affected_requirements = set(self.requirements_for_sources(changed + removed))
+        for module in changed_modules:
+            affected_requirements.update(self.modules.get(module, {}).get("requirements", []))
+        affected_requirements = sorted(affected_requirements)
+        affected_modules = sorted(set(self.modules_for_requirements(affected_requirements)) | set(changed_modules))
+        return GenerationPlan(changed, removed, affected_requirements, affected_modules, full_run=False,
+                              changed_modules=changed_modules)
+
+    def requirements_for_sources(self, sources: Iterable[str]) -> list[str]:
+        requirement_ids = set()
+        for source in sources:
+            requirement_ids.update(self.sources.get(source, {}).get("requirements", []))
+        return sorted(requirement_ids)
+
+    def modules_for_requirements(self, requirement_ids: Iterable[str]) -> list[str]:
+        requirement_ids = set(requirement_ids)
+        return sorted(module for module, info in self.modules.items()
+                      if requirement_ids.intersection(info.get("requirements", [])))
+
+    def update(self, source_hashes: Dict[str, str], requirements_document: Optional[str],
+               terraform_dir: str | Path, message: Optional[str] = None) -> None:
+        """
+        Record the results of a (partial) run: source hashes, requirement fragments, generated modules
+        and the custom message.
+        """
+        self.message_hash = message_digest(message)
+        if requirements_document:
+            self.requirements_document = requirements_document
+            self.requirements = parse_requirements(requirements_document)
+
+        self.sources = {}
+        for path, digest in source_hashes.items():
+            produced = sorted(req_id for req_id, requirement in self.requirements.items()
+                              if path in requirement["sources"])
+            self.sources[path] = {"hash": digest, "requirements": produced}
+
+        if os.path.isdir(terraform_dir):
+            self.modules = scan_terraform_modules(terraform_dir)
@@ -0,0 +1,314 @@
+import contextvars
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
+
+from src.cache.llm_cache import LLMResponseCache
+from src.constants.constants import (
+    MODULE_GENERATOR_PROMPT,
+    MODULE_GENERATOR_SYSTEM_MESSAGE,
+    PLANNER_PROMPT,
+    PLANNER_SYSTEM_MESSAGE
+)
+from src.pipeline.infrastructure import extract_infrastructure_ir, InfrastructureIR, IR_MARKER
+from src.pipeline.instrumentation import get_current_trace, response_usage, RunCancelledError, trace_span
+from src.pipeline.manifest import parse_requirements
+from src.terraform.template_library import format_module_block, format_output_block, write_root_files
+from src.terraform.validator import TerraformModule
+
+if TYPE_CHECKING:
+    from autogen import OpenAIWrapper
+
+MODULE_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9-]*$")
+
+# "### main.tf" header followed by a fenced code block
+MODULE_FILE_PATTERN = re.compile(r"^#+\s*`?([\w.-]+\.tf)`?\s*\n+```[\w-]*\n(.*?)\n```", re.MULTILINE | re.DOTALL)
+
+MODULE_FILES = ("main.tf", "variables.tf", "outputs.tf")
+
+class ModuleSpec:
+    """
+    Planned Terraform module: the requirements it implements and its declared interface.
+    `inputs` maps module variables to outputs of other modules or root variables.
+    """
+
+    def __init__(self, name: str, description: str, requirements: list[str], variables: list[Dict[str, Any]],
+                 outputs: list[Dict[str, Any]], inputs: Dict[str, str]):
+        self.name = name
+        self.description = description
+        self.requirements = requirements
+        self.variables = variables
+        self.outputs = outputs
+        self.inputs = inputs
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModuleSpec":
+        name = str(data.get("name", "")).strip().lower().replace("_", "-")
+        if not MODULE_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid module name '{data.get('name')}'")
+        variables = [variable for variable in data.get("variables") or [] if isinstance(variable, dict)
+                     and variable.get("name")]
+        outputs = [output for output in data.get("outputs") or [] if isinstance(output, dict) and output.get("name")]
+        return cls(name, str(data.get("description", "")), [str(req) for req in data.get("requirements", [])],
+                   variables, outputs, {str(key): str(value) for key, value in (data.get("inputs") or {}).items()})
+
+    @property
+    def instance_name(self) -> str:
+        return self.name.replace("-", "_")
+
+    @property
+    def module_dir(self) -> str:
+        return f"modules/{self.name}"
+
+    def format_variables(self) -> str:
+        return "\n".join(
+            f"- {variable['name']} ({variable.get('type', 'string')}): {variable.get('description', '')}"
+            + (f", default {json.dumps(variable['default'])}" if "default" in variable else "")
+            for variable in self.variables
+        )
+
+    def format_outputs(self) -> str:
+        return "\n".join(f"- {output['name']}: {output.get('description', '')}" for output in self.outputs)
+
+
+def parse_module_specs(text: str) -> list[ModuleSpec]:
+    """
+    Parse the JSON list of module specs from the planner response, raises ValueError if it is malformed.
+    """
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        raise ValueError("Planner response does not contain a JSON list")
+    data = json.loads(text[start:end + 1])
+    specs = [ModuleSpec.from_dict(item) for item in data if isinstance(item, dict)]
+    if not specs:
+        raise ValueError("Planner returned no modules")
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Planner returned duplicate modules: {names}")
+    return specs
+
+
+def parse_module_files(text: str) -> Dict[str, str]:
+    files = {}
+    for match in MODULE_FILE_PATTERN.finditer(text):
+        if match.group(1) in MODULE_FILES:
+            files[match.group(1)] = match.group(2).strip() + "\n"
+    return files
+
+
+def _complete(llm_client: "OpenAIWrapper", system_message: str, prompt: str, span: Dict[str, Any]) -> str:
+    response = llm_client.create(messages=[
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt},
+    ])
+    for key, value in response_usage(response).items():
+        span[key] = span.get(key, 0) + value
+    from autogen import OpenAIWrapper
+    choices = OpenAIWrapper.extract_text_or_completion_object(response)
+    return str(choices[0]) if choices else ""
+
+
+def plan_modules(llm_client: "OpenAIWrapper", requirements_document: str, requirement_ids: list[str],
+                 existing_modules: str) -> list[ModuleSpec]:
+    """
+    Ask the LLM to split the given requirements into independent module specs with declared interfaces.
+    """
+    prompt = PLANNER_PROMPT.format(requirement_ids=", ".join(requirement_ids),
+                                   existing_modules=existing_modules or "none",
+                                   requirements_document=requirements_document)
+    with trace_span("planner", "planning") as span:
+        specs = parse_module_specs(_complete(llm_client, PLANNER_SYSTEM_MESSAGE, prompt, span))
+        span["modules"] = len(specs)
+    return specs
+
+
+def check_module_interface(spec: ModuleSpec, module_path: Path) -> list[str]:
+    """
+    Differences between the generated module and its planned interface.
+    """
+    module = TerraformModule(module_path)
+    errors = [f"variable '{variable['name']}' is not declared in variables.tf" for variable in spec.variables
+              if variable["name"] not in module.variables]
+    errors += [f"output '{output['name']}' is not declared in outputs.tf" for output in spec.outputs
+               if output["name"] not in module.outputs]
+    errors += [f"var.{name} is used but not declared in variables.tf" for name in
+               sorted({name for name, _, _ in module.var_refs if name not in module.variables})]
+    return errors
+
+
+def generate_module(llm_client: "OpenAIWrapper", spec: ModuleSpec, requirements: Dict[str, Dict[str, Any]],
+                    terraform_dir: Path, write_file: Callable[[str, str], Any], max_attempts: int = 2,
+                    infrastructure: Optional[InfrastructureIR] = None, cache: Optional[LLMResponseCache] = None,
+                    model: Optional[str] = None) -> list[str]:
+    """
+    Generate one module in its own small context and write its files. Returns the remaining interface errors.
+    With the infrastructure IR the prompt carries only the slice of the module components, modules generated
+    from an unchanged slice and interface are taken from the cache.
+    """
+    ir_slice = infrastructure.slice(spec.requirements) if infrastructure else None
+    prompt = MODULE_GENERATOR_PROMPT.format(
+        name=spec.name,
+        description=spec.description,
+        requirements="\n".join(f"- [{req_id}] {requirements[req_id]['text']}" for req_id in spec.requirements
+                               if req_id in requirements),
+        variables=spec.format_variables() or "none",
+        outputs=spec.format_outputs() or "none",
+        inputs=", ".join(f"{name} = {value}" for name, value in spec.inputs.items()) or "none",
+        infrastructure=ir_slice.to_compact() if ir_slice and ir_slice.components else "none",
+    )
+    cache_key = None
+    if ir_slice is not None and cache is not None and cache.enabled:
+        cache_key = LLMResponseCache.make_key(ir_slice.digest(), MODULE_GENERATOR_SYSTEM_MESSAGE + prompt, model)
+    errors = ["no files generated"]
+    with trace_span(spec.name, "module_generation", attempts=0) as span:
+        cached = cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            span["cache_hit"] = True
+            for file_name, content in cached.items():
+                write_file(f"{spec.module_dir}/{file_name}", content)
+            errors = check_module_interface(spec, terraform_dir / spec.module_dir)
+            if not errors:
+                return errors
+        for attempt in range(max_attempts):
+            span["attempts"] = attempt + 1
+            text = _complete(llm_client, MODULE_GENERATOR_SYSTEM_MESSAGE, prompt, span)
+            files = parse_module_files(text)
+            missing = [file_name for file_name in MODULE_FILES if file_name not in files]
+            if missing:
+                errors = [f"missing files: {', '.join(missing)}"]
+            else:
+                files["main.tf"] = f"# Requirements: {', '.join(spec.requirements)}\n{files['main.tf']}"
+                for file_name, content in files.items():
+                    write_file(f"{spec.module_dir}/{file_name}", content)
+                errors = check_module_interface(spec, terraform_dir / spec.module_dir)
+            if not errors:
+                if cache_key:
+                    cache.set(cache_key, files)
+                break
+            prompt = f"{prompt}\n\nYour previous answer had these problems, fix them:\n- " + "\n- ".join(errors)
+        span["errors"] = len(errors)
+    return errors
+
+
+def generate_modules(llm_client: "OpenAIWrapper", specs: list[ModuleSpec], requirements: Dict[str, Dict[str, Any]],
+                     terraform_dir: str | Path, write_file: Callable[[str, str], Any], max_workers: int = 6,
+                     infrastructure: Optional[InfrastructureIR] = None, cache: Optional[LLMResponseCache] = None,
+                     model: Optional[str] = None) -> Dict[str, list[str]]:
+    """
+    Generate all modules in parallel workers, returns interface errors by module name.
+    """
+    terraform_dir = Path(terraform_dir)
+    trace = get_current_trace()
+
+    def generate(spec: ModuleSpec) -> list[str]:
+        if trace is not None:
+            trace.check_cancelled()
+        try:
+            return generate_module(llm_client, spec, requirements, terraform_dir, write_file,
+                                   infrastructure=infrastructure, cache=cache, model=model)
+        except Exception as e:
+            return [f"generation failed: {e}"]
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="module-generation") as pool:
+        # Each worker runs in a copy of the caller context, so spans go into the current trace
+        futures = {spec.name: pool.submit(contextvars.copy_context().run, generate, spec) for spec in specs}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _default_value(variable: Dict[str, Any]) -> Any:
+    if "default" in variable and variable["default"] is not None:
+        return variable["default"]
+    variable_type = str(variable.get("type", "string"))
+    if variable_type.startswith(("list", "set")):
+        return []
+    return {"number": 0, "bool": False}.get(variable_type, "")
+
+
+def assemble_root(specs: list[ModuleSpec], terraform_dir: str | Path) -> list[str]:
+    """
+    Add module blocks of the planned modules to the root files, variables that are not wired
+    to other modules become root variables with their default values in terraform.tfvars.
+    """
+    module_blocks = {}
+    root_variables = {}
+    output_blocks = {}
+    requirements = []
+    for spec in specs:
+        arguments = {"source": json.dumps(f"./{spec.module_dir}")}
+        for variable in spec.variables:
+            name = variable["name"]
+            if name in spec.inputs:
+                arguments[name] = spec.inputs[name]
+            elif name in ("project_id", "region"):
+                arguments[name] = f"var.{name}"
+            else:
+                root_variable = f"{spec.instance_name}_{name}"
+                root_variables[root_variable] = (variable.get("description") or f"{name} of module {spec.name}",
+                                                 _default_value(variable))
+                arguments[name] = f"var.{root_variable}"
+        module_blocks[spec.instance_name] = format_module_block(spec.instance_name, arguments)
+        for output in spec.outputs:
+            name = f"{spec.instance_name}_{output['name']}"
+            output_blocks[name] = format_output_block(name, f"module.{spec.instance_name}.{output['name']}")
+        requirements += spec.requirements
+    return write_root_files(terraform_dir, module_blocks, root_variables, output_blocks, requirements)
+
+
+def format_module_specs(specs: list[ModuleSpec]) -> str:
+    return "\n".join(f"- module.{spec.instance_name} from {spec.module_dir} (requirements: "
+                     f"{', '.join(spec.requirements)}): {', '.join(output['name'] for output in spec.outputs)}"
+                     for spec in specs)
+
+
+def planner_document(requirements_document: str, requirement_ids: list[str]) -> str:
+    """
+    What the planner needs from the requirements document: with the infrastructure IR only the planned
+    requirements and the IR slice of their components, otherwise the whole document.
+    """
+    infrastructure = extract_infrastructure_ir(requirements_document)
+    if infrastructure is None:
+        return requirements_document
+    requirements = parse_requirements(requirements_document)
+    lines = [f"- [{req_id}] {requirements[req_id]['text']}" for req_id in requirement_ids if req_id in requirements]
+    return "\n".join(lines) + f"\n\n{IR_MARKER}\n{infrastructure.slice(requirement_ids).to_compact()}"
+
+
+def run_planned_generation(llm_client: "OpenAIWrapper", requirements_document: str, requirement_ids: list[str],
+                           existing_modules: str, terraform_dir: str | Path, write_file: Callable[[str, str], Any],
+                           max_workers: int = 6, reserved_names: tuple[str, ...] = (),
+                           cache: Optional[LLMResponseCache] = None,
+                           model: Optional[str] = None) -> tuple[list[ModuleSpec], list[str]]:
+    """
+    Planner stage: plan modules for the requirements, generate them in parallel and assemble the root files.
+    Returns the successfully generated module specs and the requirements left for the generator agent.
+    """
+    requirements = parse_requirements(requirements_document)
+    infrastructure = extract_infrastructure_ir(requirements_document)
+    try:
+        specs = plan_modules(llm_client, planner_document(requirements_document, requirement_ids),
+                             requirement_ids, existing_modules)
+    except RunCancelledError:
+        raise
+    except Exception as e:
+        # Malformed plans and API errors alike leave the requirements to the generator agent
+        print(f"Planner failed, modules are generated by the generator agent: {e}")
+        return [], requirement_ids
+
+    # Planned modules must not overwrite existing (template) modules
+    for spec in specs:
+        while spec.name in reserved_names:
+            spec.name = f"{spec.name}-extra"
+
+    errors = generate_modules(llm_client, specs, requirements, terraform_dir, write_file, max_workers=max_workers,
+                              infrastructure=infrastructure, cache=cache, model=model)
+    generated = [spec for spec in specs if not errors[spec.name]]
+    for name, module_errors in errors.items():
+        if module_errors:
+            print(f"Module {name} was not generated: {'; '.join(module_errors)}")
+    if generated:
+        assemble_root(generated, terraform_dir)
+
+    covered = {req_id for spec in generated for req_id in spec.requirements}
+    return generated, [req_id for req_id in requirement_ids if req_id not in covered]
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from src.tools.images import read_image_size
+from src.tools.tools import DEFAULT_EXCLUDES, iter_folder_files
+
+# Folders that never contain infrastructure documentation
+IGNORED_DIRS = DEFAULT_EXCLUDES + ("build", "dist", "target")
+
+TEXT_EXTENSIONS = {".md", ".txt", ".rst", ".adoc", ".tf", ".tfvars", ".hcl", ".yaml", ".yml", ".json", ".toml",
+                   ".ini", ".cfg", ".conf", ".properties", ".xml", ".sh", ".env"}
+
+TEXT_FILE_NAMES = {"dockerfile", "docker-compose.yml", "docker-compose.yaml", "makefile", "procfile", "jenkinsfile",
+                   "vagrantfile"}
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+# Generated dependency lockfiles, large and without infrastructure information
+LOCK_FILE_NAMES = {"package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "composer.lock",
+                   "pipfile.lock", "poetry.lock", "gemfile.lock", "cargo.lock", "go.sum", "packages.lock.json"}
+
+# JSON/XML files are mostly application data or build configs, only these paths count as infrastructure
+INFRA_DATA_PATH_PATTERN = re.compile(
+    r"docker|compose|k8s|kube|helm|chart|deploy|infra|terraform|cloudformation|task-?def|ecs|gcp|aws|azure|"
+    r"ops|manifest|cluster|network|architecture"
+)
+
+MAX_TEXT_FILE_BYTES = 200 * 1024
+
+# Size of the consolidated document sent in the first analyzer message (~4 bytes per token)
+DEFAULT_BUNDLE_BYTES = 120 * 1024
+
+DEFAULT_MAX_IMAGES = 5
+
+# Smaller images are icons, not diagrams
+MIN_DIAGRAM_SIDE = 256
+
+
+def classify_file(file_path: str | Path) -> Optional[str]:
+    """
+    Classify a file as infrastructure relevant 'text' or 'image', return None for irrelevant files.
+    """
+    name = os.path.basename(file_path).lower()
+    extension = os.path.splitext(name)[1]
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    if name in LOCK_FILE_NAMES:
+        return None
+    if extension in (".json", ".xml") and not INFRA_DATA_PATH_PATTERN.search(str(file_path).lower()):
+        return None
+    if extension in TEXT_EXTENSIONS or name in TEXT_FILE_NAMES or name.startswith("dockerfile"):
+        return "text"
+    return None
+
+
+def collect_relevant_files(root_dir: str | Path) -> Dict[str, list[str]]:
+    """
+    Walk the source tree and return infrastructure relevant files (relative paths) grouped by kind.
+    """
+    files: Dict[str, list[str]] = {"text": [], "image": []}
+    for file_path in iter_folder_files(str(root_dir), exclude=IGNORED_DIRS):
+        kind = classify_file(file_path)
+        if kind:
+            files[kind].append(os.path.relpath(file_path, root_dir))
+    return files
+
+
+def _read_text_file(file_path: str, max_bytes: int = MAX_TEXT_FILE_BYTES) -> str:
+    with open(file_path, "rb") as file:
+        data = file.read(max_bytes + 1)
+    text = data[:max_bytes].decode("utf-8", errors="replace")
+    if len(data) > max_bytes:
+        text += f"\n... [truncated, file is larger than {max_bytes} bytes]"
+    return text
+
+
+def load_text_files(root_dir: str | Path, rel_paths: list[str], max_workers: int = 8) -> Dict[str, str]:
+    """
+    Load text files concurrently in a thread pool. Returns a mapping of relative path to content.
+    """
+    def load(rel_path: str) -> str:
+        try:
+            return _read_text_file(os.path.join(root_dir, rel_path))
+        except OSError as e:
+            return f"[error reading file: {e}]"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(rel_paths, pool.map(load, rel_paths)))
+
+
+async def describe_images(
+        root_dir: str | Path,
+        rel_paths: list[str],
+        image_describer: Callable[..., Dict[str, Any]],
+        max_concurrency: int = 4,
+) -> Dict[str, str]:
+    """
+    Describe images concurrently with the given image describer (e.g. extract_infrastructure_from_image).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def describe(rel_path: str) -> str:
+        async with semaphore:
+            result = await asyncio.to_thread(image_describer, image_path=rel_path, work_dir=str(root_dir))
+        if "content" in result:
+            return str(result["content"])
+        return f"[error describing image: {result.get('message', 'unknown error')}]"
+
+    descriptions = await asyncio.gather(*(describe(rel_path) for rel_path in rel_paths))
+    return dict(zip(rel_paths, descriptions))
+
+
+def _run_async(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Called from inside a running event loop (e.g. UI worker), run in a separate thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
+
+def rank_relevant_files(root_dir: str | Path, files: Dict[str, list[str]],
+                        use_index: bool = True) -> Dict[str, list[str]]:
+    """
+    Order the files of each kind by relevance index ranking (best chunk score), then by the path prior.
+    Without use_index only the path prior is used and no index is built.
+    """
+    # Imported here, the relevance index itself uses this module
+    from src.pipeline.relevance_index import get_relevance_index, path_boost
+
+    scores: Dict[str, float] = {}
+    if use_index:
+        for result in get_relevance_index(root_dir).search(top_k=1000):
+            scores[result["path"]] = max(scores.get(result["path"], 0.0), result["score"])
+    return {kind: sorted(rel_paths, key=lambda rel_path: (-scores.get(rel_path, 0.0), -path_boost(rel_path), rel_path))
+            for kind, rel_paths in files.items()}
+
+
+def _is_diagram(file_path: str) -> bool:
+    try:
+        size = read_image_size(file_path)
+    except OSError:
+        return False
+    # Unknown formats (webp...) are kept
+    return size is None or max(size) >= MIN_DIAGRAM_SIDE
+
+
+def select_within_budget(root_dir: str | Path, rel_paths: list[str], max_bytes: int) -> tuple[list[str], list[str]]:
+    """
+    Split ranked text files into the ones that fit into max_bytes and the ones left out.
+    """
+    selected, skipped = [], []
+    remaining = max_bytes
+    for rel_path in rel_paths:
+        try:
+            size = min(os.path.getsize(os.path.join(root_dir, rel_path)), MAX_TEXT_FILE_BYTES)
+        except OSError:
+            continue
+        if size <= remaining:
+            selected.append(rel_path)
+            remaining -= size
+        else:
+            skipped.append(rel_path)
+    return selected, skipped
+
+
+def build_preanalysis_bundle(
+        root_dir: str | Path,
+        image_describer: Optional[Callable[..., Dict[str, Any]]] = None,
+        folder_structure: Optional[str] = None,
+        max_workers: int = 8,
+        max_image_concurrency: int = 4,
+        only: Optional[Iterable[str]] = None,
+        max_bytes: int = DEFAULT_BUNDLE_BYTES,
+        max_images: int = DEFAULT_MAX_IMAGES,
+        use_index: bool = True,
+) -> str:
+    """
+    Load the most infrastructure relevant files of the source project concurrently and return them
+    as a single consolidated document for the analyzer. Files are taken in relevance index order until
+    max_bytes is used up, at most max_images diagrams are described, the rest is only listed by name.
+    `only` limits loading to the given relative paths, without use_index files are ranked by their paths only.
+    """
+    files = collect_relevant_files(root_dir)
+    if only is not None:
+        only = set(only)
+        files = {kind: [rel_path for rel_path in rel_paths if rel_path in only] for kind, rel_paths in files.items()}
+    files = rank_relevant_files(root_dir, files, use_index=use_index)
+
+    text_files, skipped = select_within_budget(root_dir, files["text"], max_bytes)
+    images = [rel_path for rel_path in files["image"] if _is_diagram(os.path.join(root_dir, rel_path))]
+    skipped += images[max_images:]
+    images = images[:max_images]
+    print(f"Pre-analysis: {len(text_files)} text files, {len(images)} images in {root_dir}, "
+          f"{len(skipped)} files left out")
+
+    text_contents = load_text_files(root_dir, text_files, max_workers=max_workers)
+    image_descriptions = {}
+    if image_describer and images:
+        image_descriptions = _run_async(
+            describe_images(root_dir, images, image_describer, max_concurrency=max_image_concurrency)
+        )
+
+    sections = []
+    if folder_structure:
+        sections.append(f"## Folder structure\n{folder_structure}")
+    for rel_path, content in text_contents.items():
+        sections.append(f"## File: {rel_path}\n{content}")
+    for rel_path, description in image_descriptions.items():
+        sections.append(f"## Image: {rel_path}\n{description}")
+    if skipped:
+        sections.append("## Not included (read them with the tools if needed)\n"
+                        + "\n".join(f"- {rel_path}" for rel_path in skipped))
+    return "\n\n".join(sections)
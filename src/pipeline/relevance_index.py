@@ -0,0 +1,376 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.pipeline.preanalysis import IGNORED_DIRS, IMAGE_EXTENSIONS, MAX_TEXT_FILE_BYTES, classify_file
+from src.tools.tools import iter_folder_files
+
+DEFAULT_INDEX_DIR = os.path.join(Path.home(), ".cache", "infrastructure_to_terraform", "index")
+
+INDEX_FILE_NAME = "index.json"
+
+INDEX_VERSION = 1
+
+# Default query: what the analyzer is looking for in a source repository
+INFRA_QUERY = (
+    "infrastructure cloud deploy deployment docker container image kubernetes k8s helm service ingress "
+    "database mysql postgres redis cache queue kafka pubsub load balancer proxy network vpc subnet firewall "
+    "terraform region zone instance compute vm storage bucket dns cdn monitoring prometheus grafana "
+    "autoscaling replicas replica cluster gcp aws azure port env secret architecture diagram"
+)
+
+# Path based prior of infrastructure relevance, added to (1 + boost) multiplier of the lexical score
+PATH_BOOSTS = [
+    (re.compile(r"(^|/)dockerfile[^/]*$|docker-compose[^/]*\.ya?ml$"), 2.0),
+    (re.compile(r"\.(tf|tfvars|hcl)$"), 2.0),
+    (re.compile(r"(^|/)(k8s|kubernetes|helm|charts?|deploy\w*|infra\w*|ops|manifests?|\.github/workflows)/"), 1.5),
+    (re.compile(r"(^|/)(docs?|architecture)/|readme[^/]*$"), 1.0),
+    (re.compile(r"\.(md|txt|rst|adoc)$"), 0.5),
+    (re.compile(r"\.(ya?ml|toml|ini|conf|properties|env)$"), 0.5),
+]
+
+# Kubernetes manifests, compose files and similar configs
+CONTENT_BOOST_PATTERN = re.compile(r"^\s*(apiVersion|kind|services|image|replicas)\s*:", re.MULTILINE)
+CONTENT_BOOST = 1.0
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    # Split camelCase before lowercasing, so "LoadBalancer" matches "load balancer"
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def path_boost(rel_path: str) -> float:
+    rel_path = rel_path.replace(os.sep, "/").lower()
+    return sum(boost for pattern, boost in PATH_BOOSTS if pattern.search(rel_path))
+
+
+def _is_text(data: bytes) -> bool:
+    return b"\x00" not in data[:1024]
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> list[tuple[int, int]]:
+    """
+    Split text into chunks of about chunk_size characters, returns (start_line, end_line) pairs (1-based, inclusive).
+    Uses langchain-text-splitters when it is installed, otherwise splits on line boundaries.
+    """
+    lines = text.splitlines()
+    if not lines:
+        return []
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        RecursiveCharacterTextSplitter = None
+
+    if RecursiveCharacterTextSplitter is not None:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                  add_start_index=True)
+        chunks = []
+        for document in splitter.create_documents([text]):
+            start = document.metadata["start_index"]
+            start_line = text.count("\n", 0, start) + 1
+            chunks.append((start_line, start_line + document.page_content.count("\n")))
+        return chunks
+
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end = start
+        size = 0
+        while end < len(lines) and (size == 0 or size + len(lines[end]) + 1 <= chunk_size):
+            size += len(lines[end]) + 1
+            end += 1
+        chunks.append((start + 1, end))
+        if end >= len(lines):
+            break
+        # Next chunk repeats the last lines of this one, up to chunk_overlap characters
+        next_start = end
+        overlap = 0
+        while next_start - 1 > start and overlap + len(lines[next_start - 1]) + 1 <= chunk_overlap:
+            next_start -= 1
+            overlap += len(lines[next_start]) + 1
+        start = next_start
+    return chunks
+
+
+class RelevanceIndex:
+    """
+    Persistent index of the files of a source repository ranking chunks by infrastructure relevance.
+
+    Chunks are scored with BM25 against the query, multiplied by a path/content prior (Dockerfiles,
+    Kubernetes manifests, Terraform, docs). When an embedding model is configured, chunk embeddings from a local
+    sentence-transformers model are stored in chromadb and their similarity is added to the score.
+    Only files whose size or modification time changed are re-chunked on update.
+    """
+
+    def __init__(
+            self,
+            root_dir: str | Path,
+            index_dir: Optional[str | Path] = None,
+            chunk_size: int = 1500,
+            chunk_overlap: int = 150,
+            embedding_model: Optional[str] = None,
+            embedding_weight: float = 1.0,
+    ):
+        self.root_dir = os.path.abspath(str(root_dir))
+        root_key = hashlib.sha256(self.root_dir.encode("utf-8")).hexdigest()[:16]
+        self.index_dir = Path(index_dir or DEFAULT_INDEX_DIR) / root_key
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embedding_model = embedding_model
+        self.embedding_weight = embedding_weight
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.updated = 0.0
+        self._collection = None
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def index_path(self) -> Path:
+        return self.index_dir / INDEX_FILE_NAME
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("chunk_size") == self.chunk_size:
+            self.files = data.get("files", {})
+
+    def save(self) -> None:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": INDEX_VERSION, "root_dir": self.root_dir, "chunk_size": self.chunk_size,
+                       "files": self.files}, file)
+        os.replace(tmp_path, self.index_path)
+
+    def _index_file(self, rel_path: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        entry = {"mtime": stat.st_mtime, "size": stat.st_size, "kind": classify_file(rel_path) or "other"}
+        if os.path.splitext(rel_path)[1].lower() in IMAGE_EXTENSIONS:
+            # Images are ranked by their path only, their content is read with extract_infrastructure_from_image
+            entry["kind"] = "image"
+            entry["chunks"] = [{"lines": [0, 0], "tf": Counter(tokenize(rel_path) + ["diagram"]), "boost": 1.5}]
+            return entry
+        if stat.st_size > MAX_TEXT_FILE_BYTES:
+            return None
+        with open(os.path.join(self.root_dir, rel_path), "rb") as file:
+            data = file.read()
+        if not _is_text(data):
+            return None
+        text = data.decode("utf-8", errors="replace")
+        lines = text.splitlines()
+        path_tokens = tokenize(rel_path)
+        entry["chunks"] = []
+        for start_line, end_line in split_text(text, self.chunk_size, self.chunk_overlap):
+            chunk_text = "\n".join(lines[start_line - 1:end_line])
+            entry["chunks"].append({
+                "lines": [start_line, end_line],
+                "tf": Counter(tokenize(chunk_text) + path_tokens),
+                "boost": CONTENT_BOOST if CONTENT_BOOST_PATTERN.search(chunk_text) else 0.0,
+            })
+        return entry
+
+    def update(self) -> Dict[str, int]:
+        """
+        Bring the index in line with the repository: index new and changed files, drop removed ones.
+        """
+        with self._lock:
+            changed = []
+            seen = set()
+            for file_path in iter_folder_files(self.root_dir, exclude=IGNORED_DIRS):
+                rel_path = os.path.relpath(file_path, self.root_dir)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                seen.add(rel_path)
+                entry = self.files.get(rel_path)
+                if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                    continue
+                try:
+                    entry = self._index_file(rel_path, stat)
+                except OSError:
+                    entry = None
+                if entry is None:
+                    self.files.pop(rel_path, None)
+                else:
+                    self.files[rel_path] = entry
+                    changed.append(rel_path)
+
+            removed = [rel_path for rel_path in self.files if rel_path not in seen]
+            for rel_path in removed:
+                del self.files[rel_path]
+
+            if changed or removed:
+                self._update_embeddings(changed, removed)
+                self.save()
+            self.updated = time.time()
+            return {"files": len(self.files), "changed": len(changed), "removed": len(removed)}
+
+    def _embedding_collection(self):
+        if not self.embedding_model:
+            return None
+        if self._collection is None:
+            try:
+                import chromadb
+                from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+            except ImportError:
+                print("chromadb is not installed, relevance index uses lexical scoring only")
+                self.embedding_model = None
+                return None
+            client = chromadb.PersistentClient(path=str(self.index_dir / "chroma"))
+            self._collection = client.get_or_create_collection(
+                "chunks",
+                embedding_function=SentenceTransformerEmbeddingFunction(model_name=self.embedding_model),
+                metadata={"hnsw:space": "cosine"},
+            )
+        return self._collection
+
+    def _update_embeddings(self, changed: list[str], removed: list[str]) -> None:
+        collection = self._embedding_collection()
+        if collection is None:
+            return
+        for rel_path in changed + removed:
+            collection.delete(where={"path": rel_path})
+        ids, documents, metadatas = [], [], []
+        for rel_path in changed:
+            entry = self.files[rel_path]
+            for index, chunk in enumerate(entry["chunks"]):
+                ids.append(f"{rel_path}::{index}")
+                documents.append(self.read_chunk(rel_path, chunk) or rel_path)
+                metadatas.append({"path": rel_path, "chunk": index})
+        for start in range(0, len(ids), 256):
+            collection.upsert(ids=ids[start:start + 256], documents=documents[start:start + 256],
+                              metadatas=metadatas[start:start + 256])
+
+    def read_chunk(self, rel_path: str, chunk: Dict[str, Any]) -> str:
+        start_line, end_line = chunk["lines"]
+        if not end_line:
+            return ""
+        lines = []
+        with open(os.path.join(self.root_dir, rel_path), "r", encoding="utf-8", errors="replace") as file:
+            for number, line in enumerate(file, start=1):
+                if number > end_line:
+                    break
+                if number >= start_line:
+                    lines.append(line.rstrip("\n"))
+        return "\n".join(lines)
+
+    def search(self, query: Optional[str] = None, top_k: int = 10) -> list[Dict[str, Any]]:
+        """
+        Return the top_k chunks for the query (INFRA_QUERY by default), best first.
+        """
+        query_terms = set(tokenize(query or INFRA_QUERY))
+        # update() replaces entries but never changes them in place, a shallow copy is a consistent snapshot
+        with self._lock:
+            files = dict(self.files)
+        chunks = [(rel_path, index, chunk) for rel_path, entry in files.items()
+                  for index, chunk in enumerate(entry["chunks"])]
+        if not chunks or not query_terms:
+            return []
+
+        document_frequency = Counter()
+        total_length = 0
+        for _, _, chunk in chunks:
+            total_length += sum(chunk["tf"].values())
+            document_frequency.update(term for term in query_terms if term in chunk["tf"])
+        average_length = total_length / len(chunks) or 1.0
+
+        scores = {}
+        for rel_path, index, chunk in chunks:
+            length = sum(chunk["tf"].values())
+            score = 0.0
+            for term in query_terms:
+                frequency = chunk["tf"].get(term, 0)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * frequency * (BM25_K1 + 1) / (
+                        frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+            scores[(rel_path, index)] = score * (1 + path_boost(rel_path) + chunk["boost"])
+
+        collection = self._embedding_collection()
+        if collection is not None and scores:
+            maximum = max(scores.values()) or 1.0
+            result = collection.query(query_texts=[query or INFRA_QUERY], n_results=min(len(chunks), top_k * 5))
+            for metadata, distance in zip(result["metadatas"][0], result["distances"][0]):
+                key = (metadata["path"], metadata["chunk"])
+                if key in scores:
+                    # Cosine distance to similarity, scaled to the lexical score range
+                    scores[key] += self.embedding_weight * maximum * max(0.0, 1 - distance)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        results = []
+        for (rel_path, index), score in ranked:
+            if score <= 0:
+                break
+            entry = files[rel_path]
+            results.append({
+                "path": rel_path,
+                "kind": entry["kind"],
+                "lines": entry["chunks"][index]["lines"],
+                "score": round(score, 3),
+            })
+        return results
+
+    def format_results(self, results: list[Dict[str, Any]], max_chars: int = 20000) -> str:
+        sections = []
+        used = 0
+        for position, result in enumerate(results):
+            start_line, end_line = result["lines"]
+            if result["kind"] == "image":
+                section = f"## Image: {result['path']} (score {result['score']}), " \
+                          f"use extract_infrastructure_from_image to read it"
+            else:
+                try:
+                    chunk = self.read_chunk(result["path"], {"lines": result["lines"]})
+                except OSError:
+                    # Removed or unreadable since it was indexed
+                    continue
+                section = f"## File: {result['path']} lines {start_line}-{end_line} (score {result['score']})\n{chunk}"
+            if used + len(section) > max_chars and sections:
+                sections.append(f"... {len(results) - position} more results omitted, narrow the query")
+                break
+            sections.append(section)
+            used += len(section)
+        return "\n\n".join(sections)
+
+
+_indexes: Dict[str, RelevanceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_relevance_index(root_dir: str | Path, max_staleness: float = 30.0) -> RelevanceIndex:
+    """
+    Return the process wide index of the repository configured from environment variables,
+    updated if the last update is older than max_staleness seconds.
+    """
+    root_dir = os.path.abspath(str(root_dir))
+    with _indexes_lock:
+        index = _indexes.get(root_dir)
+        if index is None:
+            index = _indexes[root_dir] = RelevanceIndex(
+                root_dir,
+                index_dir=os.path.expanduser(os.getenv("RELEVANCE_INDEX_DIR", "")) or None,
+                chunk_size=int(os.getenv("RELEVANCE_CHUNK_SIZE", "1500")),
+                embedding_model=os.getenv("RELEVANCE_EMBEDDING_MODEL") or None,
+            )
+    if time.time() - index.updated > max_staleness:
+        stats = index.update()
+        print(f"Relevance index of {root_dir}: {stats}")
+    return index
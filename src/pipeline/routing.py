@@ -0,0 +1,160 @@
+import inspect
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+from src.pipeline.instrumentation import RunCancelledError
+
+# Message statuses used by the workflow transitions
+TOOL_CALL = "NEED_TOOL"
+TOOL_RESULT = "TOOL_RESULT"
+ANALYSIS_COMPLETE = "ANALYSIS_COMPLETE"
+SCRIPTS_GENERATED = "SCRIPTS_GENERATED"
+EXECUTION_ERROR = "EXECUTION_ERROR"
+INFRASTRUCTURE_IR_ERROR = "INFRASTRUCTURE_IR_ERROR"
+
+# Markers that are only recognized at the beginning of a message
+LEADING_MARKERS = (TOOL_CALL, TOOL_RESULT, EXECUTION_ERROR, INFRASTRUCTURE_IR_ERROR)
+
+# Completion markers may be anywhere in the agent's own text, but not inside code blocks
+COMPLETION_MARKER_PATTERN = re.compile(rf"\b({ANALYSIS_COMPLETE}|{SCRIPTS_GENERATED})\b")
+CODE_BLOCK_PATTERN = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+
+# "NEED_TOOL" text request: tool name line followed by JSON arguments
+TOOL_REQUEST_PATTERN = re.compile(r"NEED_TOOL\s*\n\s*Tool:?\s*\{?(\w+)\}?[ \t]*\n")
+
+# Argument names used in prompts/by models for the same parameter
+ARGUMENT_ALIASES = {
+    "path": ("file_path", "image_path"),
+    "file_path": ("path", "image_path"),
+    "image_path": ("path", "file_path"),
+}
+
+
+def _text_content(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content if isinstance(content, str) else ""
+
+
+def message_status(message: Any) -> Optional[str]:
+    """
+    Routing status of an agent message.
+
+    Only structured fields are inspected for tool traffic (a "status" field, tool_calls/function_call,
+    tool_responses or tool role), the message text is checked for a leading marker and for completion markers
+    outside code blocks. Tool arguments and tool results are never scanned, so markers inside file content
+    don't trigger transitions.
+    """
+    if isinstance(message, str):
+        message = {"content": message}
+    if not isinstance(message, dict):
+        return None
+    if message.get("status"):
+        return message["status"]
+    if message.get("tool_calls") or message.get("function_call"):
+        return TOOL_CALL
+    if message.get("tool_responses") or message.get("role") in ("tool", "function"):
+        return TOOL_RESULT
+
+    text = _text_content(message).lstrip()
+    for marker in LEADING_MARKERS:
+        if text.startswith(marker):
+            return marker
+    match = COMPLETION_MARKER_PATTERN.search(CODE_BLOCK_PATTERN.sub("", text))
+    return match.group(1) if match else None
+
+
+def has_status(*statuses: str) -> Callable[[Any], bool]:
+    """
+    Transition condition matching messages with one of the given statuses.
+    """
+    return lambda message: message_status(message) in statuses
+
+
+def generation_succeeded(result: Any) -> bool:
+    """
+    Whether a workflow result (or its message list) ends with checked scripts: the last SCRIPTS_GENERATED message
+    was answered by the executor without EXECUTION_ERROR. Runs stopped by max_round or out of execution retries
+    are not successful.
+    """
+    messages = getattr(result, "chat_history", result)
+    if not isinstance(messages, list):
+        return False
+    statuses = [message_status(message) for message in messages]
+    if SCRIPTS_GENERATED not in statuses:
+        return False
+    after = statuses[len(statuses) - statuses[::-1].index(SCRIPTS_GENERATED):]
+    return bool(after) and EXECUTION_ERROR not in after and after[-1] not in (TOOL_CALL, TOOL_RESULT)
+
+
+def parse_tool_requests(text: str) -> list[tuple[str, Any]]:
+    """
+    Tool requests of a "NEED_TOOL" message as (tool name, arguments) pairs,
+    arguments are the parsed JSON object or the error message if the JSON is malformed.
+    """
+    decoder = json.JSONDecoder()
+    requests = []
+    for match in TOOL_REQUEST_PATTERN.finditer(text):
+        position = match.end()
+        while position < len(text) and text[position].isspace():
+            position += 1
+        try:
+            arguments, _ = decoder.raw_decode(text, position)
+        except ValueError as e:
+            arguments = f"invalid JSON arguments: {e}"
+        requests.append((match.group(1), arguments))
+    return requests
+
+
+def _adapt_arguments(function: Callable[..., Any], arguments: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        parameters = inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return arguments
+    if any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters.values()):
+        return arguments
+    adapted = {}
+    for name, value in arguments.items():
+        if name not in parameters:
+            name = next((alias for alias in ARGUMENT_ALIASES.get(name, ())
+                         if alias in parameters and alias not in arguments), name)
+        adapted[name] = value
+    return adapted
+
+
+def execute_tool_requests(requests: list[tuple[str, Any]], function_map: Dict[str, Callable[..., Any]]) -> str:
+    """
+    Execute text tool requests directly and format the results the way the agents expect them.
+    """
+    results = []
+    for name, arguments in requests:
+        function = function_map.get(name)
+        if function is None:
+            result = f"Error: unknown tool '{name}', available tools: {', '.join(sorted(function_map))}"
+        elif not isinstance(arguments, dict):
+            result = f"Error: {arguments}"
+        else:
+            try:
+                result = function(**_adapt_arguments(function, arguments))
+            except RunCancelledError:
+                raise
+            except Exception as e:
+                result = f"Error: {e}"
+        results.append(f"{TOOL_RESULT}\nTool: {name}\nResult: {result}")
+    return "\n\n".join(results)
+
+
+def tool_request_reply(recipient, messages=None, sender=None, config=None):
+    """
+    Reply function of the tool executor: "NEED_TOOL" text requests are parsed and executed without an LLM call.
+    Structured tool_calls are left to the built-in tool call reply.
+    """
+    message = (messages or [{}])[-1]
+    if message.get("tool_calls") or message.get("function_call"):
+        return False, None
+    requests = parse_tool_requests(_text_content(message))
+    if not requests:
+        return True, f"{TOOL_RESULT}\nResult: no tool request found, call a tool or use the NEED_TOOL format"
+    return True, execute_tool_requests(requests, recipient.function_map)
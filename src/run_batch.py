@@ -0,0 +1,102 @@
+import argparse
+import csv
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Optional
+
+from src.generate_terraform import create_agents, generate_terraform_infrastructure, get_llm_config, load_environment
+from src.llm.config import LLM_HOSTS
+from src.llm.http import RateLimiter, SharedHttpClient, tokens_per_minute_limiter, with_http_client
+from src.pipeline.instrumentation import RunTrace
+
+
+def load_repo_pairs(pairs_file: str) -> list[Dict[str, str]]:
+    """
+    Load source/destination pairs from a JSON file ([{"source": ..., "dest": ...}]) or a CSV file (source,dest).
+    """
+    with open(pairs_file, "r", encoding="utf-8") as file:
+        if pairs_file.endswith(".json"):
+            return [{"source": pair["source"], "dest": pair["dest"]} for pair in json.load(file)]
+        return [{"source": row[0].strip(), "dest": row[1].strip()}
+                for row in csv.reader(file) if len(row) >= 2 and not row[0].startswith("#")]
+
+
+def _count_terraform_files(dest_dir: str) -> int:
+    terraform_dir = os.path.join(dest_dir, "terraform")
+    return sum(len([f for f in files if f.endswith((".tf", ".tfvars"))]) for _, _, files in os.walk(terraform_dir))
+
+
+def run_batch(pairs: list[Dict[str, str]], workers: int = 4, max_connections: int = 20,
+              requests_per_second: float = 2.0, llm_host: Optional[str] = None,
+              tokens_per_minute: float = 0.0) -> list[Dict[str, Any]]:
+    """
+    Generate Terraform for many source repositories concurrently.
+
+    All workflows share one pooled HTTP client and rate limiter, each workflow gets its own agents.
+    Identical in-flight LLM requests are sent once, 429 responses pause all workflows until the limit resets.
+    """
+    from autogen import OpenAIWrapper
+
+    http_client = SharedHttpClient(
+        max_connections=max_connections,
+        rate_limiter=RateLimiter(requests_per_second),
+        token_limiter=tokens_per_minute_limiter(tokens_per_minute),
+    )
+    shared_config = with_http_client(get_llm_config(llm_host), http_client)
+    llm_client = OpenAIWrapper(**shared_config)
+
+    def run_one(pair: Dict[str, str]) -> Dict[str, Any]:
+        started = time.monotonic()
+        summary: Dict[str, Any] = {"source": pair["source"], "dest": pair["dest"]}
+        trace = RunTrace(os.path.basename(os.path.normpath(pair["source"])))
+        try:
+            agents = create_agents(shared_config, pair["dest"])
+            result = generate_terraform_infrastructure(pair["source"], pair["dest"], agents=agents,
+                                                       llm_client=llm_client, trace=trace, llm_host=llm_host)
+            summary["status"] = "skipped" if result is None else "success"
+        except Exception as e:
+            summary["status"] = "error"
+            summary["error"] = str(e)
+            summary["traceback"] = traceback.format_exc()
+        summary["duration_seconds"] = round(time.monotonic() - started, 2)
+        summary["terraform_files"] = _count_terraform_files(pair["dest"])
+        summary["stages"] = trace.summary()
+        print(f"[{summary['status']}] {pair['source']} -> {pair['dest']} in {summary['duration_seconds']}s")
+        return summary
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_one, pair) for pair in pairs]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        print(f"LLM requests: {http_client.stats()}")
+        http_client.close()
+    return results
+
+
+if __name__ == "__main__":
+    load_environment()
+    parser = argparse.ArgumentParser(description="Generate Terraform for many source repositories concurrently.")
+    parser.add_argument("pairs_file", help="JSON ([{\"source\": ..., \"dest\": ...}]) or CSV (source,dest) file")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "4")))
+    parser.add_argument("--max-connections", type=int, default=int(os.getenv("BATCH_MAX_CONNECTIONS", "20")))
+    parser.add_argument("--requests-per-second", type=float, default=float(os.getenv("BATCH_REQUESTS_PER_SECOND", "2")))
+    parser.add_argument("--summary", default="batch_summary.json", help="Path of the per-repo result summary")
+    parser.add_argument("--tokens-per-minute", type=float, default=float(os.getenv("BATCH_TOKENS_PER_MINUTE", "0")),
+                        help="Prompt token budget per minute of the provider, 0 disables it")
+    parser.add_argument("--llm-host", choices=LLM_HOSTS, help="LLM host (defaults to LLM_HOST env variable)")
+    args = parser.parse_args()
+
+    batch_results = run_batch(load_repo_pairs(args.pairs_file), workers=args.workers,
+                              max_connections=args.max_connections, requests_per_second=args.requests_per_second,
+                              llm_host=args.llm_host, tokens_per_minute=args.tokens_per_minute)
+    with open(args.summary, "w", encoding="utf-8") as summary_file:
+        json.dump(batch_results, summary_file, indent=2)
+
+    succeeded = sum(1 for result in batch_results if result["status"] != "error")
+    print(f"Batch complete: {succeeded}/{len(batch_results)} repositories succeeded, summary in {args.summary}")
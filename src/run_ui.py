@@ -1,12 +1,104 @@
+import os
+import time
+from functools import cache
+from typing import Any, Dict
+
 import gradio as gr
-from src.generate_terraform import generate_terraform_infrastructure
 
-def run_terraform(source_dir, dest_dir):
+from src.generate_terraform import create_agents, generate_terraform_infrastructure, get_llm_config, load_environment
+from src.llm.http import RateLimiter, SharedHttpClient, tokens_per_minute_limiter, with_http_client
+from src.pipeline.jobs import Job, JobQueue
+from src.pipeline.routing import generation_succeeded
+
+HISTORY_HEADERS = ["Job", "Status", "Source", "Destination", "Duration", "Files"]
+
+load_environment()
+
+# All UI jobs share one pooled HTTP client and rate limiter, each job gets its own agents
+http_client = SharedHttpClient(
+    max_connections=int(os.getenv("UI_MAX_CONNECTIONS", "20")),
+    rate_limiter=RateLimiter(float(os.getenv("UI_REQUESTS_PER_SECOND", "2"))),
+    token_limiter=tokens_per_minute_limiter(float(os.getenv("UI_TOKENS_PER_MINUTE", "0"))),
+)
+
+
+@cache
+def shared_llm() -> tuple[Dict[str, Any], Any]:
+    """
+    LLM config and client using the shared HTTP client, built when the first job starts (not at UI startup).
+    """
+    from autogen import OpenAIWrapper
+
+    shared_llm_config = with_http_client(get_llm_config(), http_client)
+    return shared_llm_config, OpenAIWrapper(**shared_llm_config)
+
+
+def run_job(job: Job) -> bool:
+    shared_llm_config, shared_llm_client = shared_llm()
+    agents = create_agents(shared_llm_config, job.dest_dir)
+    result = generate_terraform_infrastructure(job.source_dir, job.dest_dir, agents=agents,
+                                               llm_client=shared_llm_client, trace=job.trace)
+    # No result: the sources did not change since the last successful generation
+    return result is None or generation_succeeded(result)
+
+
+job_queue = JobQueue(
+    run_job,
+    max_workers=int(os.getenv("UI_MAX_CONCURRENT_JOBS", "2")),
+    max_pending=int(os.getenv("UI_MAX_PENDING_JOBS", "20")),
+)
+
+
+def _user(request: gr.Request) -> str:
+    return (request.username or request.session_hash or "anonymous") if request else "anonymous"
+
+
+def _history(user):
+    return [job.summary() for job in job_queue.jobs_for_user(user)]
+
+
+def _job_view(job: Job, user):
+    status = f"{job.status} ({job.duration():.0f}s)"
+    if job.done:
+        status = f"{status}: {job.message}"
+        if job.trace.spans:
+            status = f"{status}\n\n{job.trace.format_summary_table()}"
+    return job.id, status, job.format_log(), "\n".join(job.generated_files), _history(user)
+
+
+def run_terraform(source_dir, dest_dir, request: gr.Request):
+    user = _user(request)
     try:
-        generate_terraform_infrastructure(source_dir, dest_dir)
-        return "Terraform generation completed successfully!"
-    except Exception as e:
-        return f"Error: {str(e)}"
+        job = job_queue.submit(user, source_dir, dest_dir)
+    except RuntimeError as e:
+        yield None, f"Error: {str(e)}", "", "", _history(user)
+        return
+
+    # Stream progress until the job is finished
+    while not job.done:
+        yield _job_view(job, user)
+        time.sleep(1)
+    yield _job_view(job, user)
+
+
+def cancel_job(job_id, request: gr.Request):
+    user = _user(request)
+    if job_id and job_queue.cancel(job_id, user=user):
+        return f"Cancelling job {job_id}...", _history(user)
+    return "No running job to cancel", _history(user)
+
+
+def refresh_history(request: gr.Request):
+    return _history(_user(request))
+
+
+def show_job(job_id, request: gr.Request):
+    user = _user(request)
+    job = job_queue.get(job_id) if job_id else None
+    if job is None or job.user != user:
+        return job_id, "Job not found", "", "", _history(user)
+    return _job_view(job, user)
+
 
 # Create the Gradio interface
 with gr.Blocks() as demo:
@@ -22,11 +114,27 @@ with gr.Blocks() as demo:
             placeholder="Enter the destination repository directory path"
         )
 
-    generate_button = gr.Button("Generate Terraform scripts")
+    with gr.Row():
+        generate_button = gr.Button("Generate Terraform scripts", variant="primary")
+        cancel_button = gr.Button("Cancel", variant="stop")
+
+    job_id = gr.Textbox(label="Job ID")
     output = gr.Textbox(label="Output", lines=10, interactive=False)
+    with gr.Row():
+        log = gr.Textbox(label="Agent messages", lines=20, interactive=False, autoscroll=True)
+        files = gr.Textbox(label="Generated files", lines=20, interactive=False)
+
+    gr.Markdown("## My jobs")
+    history = gr.Dataframe(headers=HISTORY_HEADERS, interactive=False)
+    with gr.Row():
+        refresh_button = gr.Button("Refresh")
+        show_button = gr.Button("Show job")
 
-    generate_button.click(run_terraform, inputs=[source_dir, dest_dir], outputs=output)
+    generate_button.click(run_terraform, inputs=[source_dir, dest_dir], outputs=[job_id, output, log, files, history])
+    cancel_button.click(cancel_job, inputs=job_id, outputs=[output, history])
+    show_button.click(show_job, inputs=job_id, outputs=[job_id, output, log, files, history])
+    refresh_button.click(refresh_history, inputs=None, outputs=history)
 
 # Launch the Gradio app
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    demo.queue(default_concurrency_limit=None).launch()
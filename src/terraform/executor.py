@@ -0,0 +1,446 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.terraform.validator import format_issues, Issue, TerraformModule
+
+DEFAULT_PLUGIN_CACHE_DIR = "~/.cache/infrastructure_to_terraform/terraform-plugins"
+DEFAULT_WORK_ROOT = "~/.cache/infrastructure_to_terraform/terraform-runs"
+
+# Run directories not used for this long are removed (runs kept for retries, failed or interrupted runs)
+DEFAULT_RUN_MAX_AGE_HOURS = 24
+
+# Lines that change what `terraform init` installs: providers, module sources/versions, backend
+INIT_INPUT_PATTERN = re.compile(r"^\s*(source|version|required_version|backend|required_providers)\b.*$", re.MULTILINE)
+
+# Files and folders that are not copied into the run directory
+SKIPPED_NAMES = {".terraform", ".git", "terraform.tfstate", "terraform.tfstate.backup"}
+
+INIT_FINGERPRINT_FILE = ".init_fingerprint"
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+
+def get_terraform_pool() -> ThreadPoolExecutor:
+    """
+    Process-wide pool bounding the number of concurrent terraform processes (TERRAFORM_MAX_WORKERS).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=int(os.getenv("TERRAFORM_MAX_WORKERS", "4")),
+                                       thread_name_prefix="terraform")
+        return _pool
+
+
+class StepResult:
+    """
+    Structured result of one terraform command: exit code, duration and parsed diagnostics.
+    """
+
+    def __init__(self, step: str, module: str, returncode: Optional[int], duration: float,
+                 diagnostics: list[Dict[str, Any]], output: str = "", skipped: bool = False):
+        self.step = step
+        self.module = module
+        self.returncode = returncode
+        self.duration = duration
+        self.diagnostics = diagnostics
+        self.output = output
+        self.skipped = skipped
+        # Resource changes of a plan: {"add": ..., "change": ..., "remove": ...}
+        self.changes: Optional[Dict[str, int]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.errors
+
+    @property
+    def errors(self) -> list[Dict[str, Any]]:
+        return [diagnostic for diagnostic in self.diagnostics if diagnostic["severity"] == "error"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"step": self.step, "module": self.module, "returncode": self.returncode,
+                "duration": round(self.duration, 3), "skipped": self.skipped, "changes": self.changes,
+                "diagnostics": self.diagnostics}
+
+
+class TerraformRunResult:
+    def __init__(self, steps: list[StepResult]):
+        self.steps = steps
+
+    @property
+    def ok(self) -> bool:
+        return all(step.ok for step in self.steps)
+
+    def issues(self) -> list[Issue]:
+        issues = []
+        seen = set()
+        for step in self.steps:
+            for diagnostic in step.errors:
+                file = diagnostic.get("file") or step.module
+                # A module reached from several callers reports the same problem once per caller
+                key = (file, diagnostic.get("line"), diagnostic["summary"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                issues.append(Issue(file, diagnostic.get("line") or 0, f"terraform {step.step}: {diagnostic['summary']}"
+                                    + (f" ({diagnostic['detail']})" if diagnostic.get("detail") else "")))
+        return issues
+
+    def summary(self) -> str:
+        lines = []
+        for step in self.steps:
+            status = "skipped (up to date)" if step.skipped else ("ok" if step.ok else "failed")
+            line = f"{step.module or '.'}: {step.step} {status} in {step.duration:.1f}s"
+            if step.changes:
+                line += f", plan: {step.changes.get('add', 0)} to add, {step.changes.get('change', 0)} to change, " \
+                        f"{step.changes.get('remove', 0)} to destroy"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ok": self.ok, "steps": [step.to_dict() for step in self.steps]}
+
+
+def _diagnostic(severity: str, summary: str, detail: str = "", file: Optional[str] = None,
+                line: Optional[int] = None) -> Dict[str, Any]:
+    return {"severity": severity, "summary": summary, "detail": detail, "file": file, "line": line}
+
+
+def parse_diagnostics(items: list[Dict[str, Any]], module: str) -> list[Dict[str, Any]]:
+    """
+    Diagnostics of terraform -json output, file paths relative to the terraform folder.
+    """
+    diagnostics = []
+    for item in items:
+        diagnostic_range = item.get("range") or {}
+        file_name = diagnostic_range.get("filename")
+        diagnostics.append(_diagnostic(
+            item.get("severity", "error"), item.get("summary", ""), item.get("detail", ""),
+            os.path.normpath(os.path.join(module, file_name)) if file_name else None,
+            (diagnostic_range.get("start") or {}).get("line"),
+        ))
+    return diagnostics
+
+
+def init_fingerprint(module_dir: Path) -> str:
+    """
+    Hash of everything `terraform init` depends on, an unchanged fingerprint means the warm .terraform is reused.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(module_dir.rglob("*.tf")):
+        if ".terraform" in path.parts:
+            continue
+        content = path.read_text(encoding="utf-8", errors="replace")
+        digest.update(f"{path.relative_to(module_dir)}\n".encode("utf-8"))
+        for match in INIT_INPUT_PATTERN.finditer(content):
+            digest.update(f"{match.group(0).strip()}\n".encode("utf-8"))
+    lock_file = module_dir / ".terraform.lock.hcl"
+    if lock_file.is_file():
+        digest.update(lock_file.read_bytes())
+    return digest.hexdigest()
+
+
+def sync_tree(source: Path, target: Path) -> int:
+    """
+    Mirror the terraform sources into the run directory, keeping .terraform folders and lock files of
+    earlier runs. Returns the number of copied files.
+    """
+    copied = 0
+    expected = set()
+    for root, dir_names, file_names in os.walk(source):
+        dir_names[:] = [name for name in dir_names if name not in SKIPPED_NAMES]
+        relative = Path(root).relative_to(source)
+        (target / relative).mkdir(parents=True, exist_ok=True)
+        for file_name in file_names:
+            if file_name in SKIPPED_NAMES:
+                continue
+            source_file, target_file = Path(root) / file_name, target / relative / file_name
+            expected.add(relative / file_name)
+            source_stat = source_file.stat()
+            if target_file.is_file():
+                target_stat = target_file.stat()
+                if target_stat.st_size == source_stat.st_size and target_stat.st_mtime >= source_stat.st_mtime:
+                    continue
+            shutil.copy2(source_file, target_file)
+            copied += 1
+
+    for root, dir_names, file_names in os.walk(target):
+        dir_names[:] = [name for name in dir_names if name != ".terraform"]
+        relative = Path(root).relative_to(target)
+        for file_name in file_names:
+            if relative / file_name not in expected and file_name != ".terraform.lock.hcl":
+                (Path(root) / file_name).unlink()
+    return copied
+
+
+def called_modules(terraform_dir: Path) -> set[str]:
+    """
+    Local modules (relative to the terraform folder) called from the root directly or through other modules.
+    """
+    terraform_dir = terraform_dir.resolve()
+    called = set()
+    pending = [terraform_dir]
+    while pending:
+        module_dir = pending.pop()
+        for module_info in TerraformModule(module_dir).modules.values():
+            source = module_info["source"]
+            if not source or not source.startswith((".", "/")):
+                continue
+            child = (module_dir / source).resolve()
+            if not child.is_dir() or child == terraform_dir:
+                continue
+            relative = os.path.relpath(child, terraform_dir).replace(os.sep, "/")
+            if relative not in called:
+                called.add(relative)
+                pending.append(child)
+    return called
+
+
+def sweep_run_dirs(work_root: Path, max_age_hours: float) -> int:
+    """
+    Remove run directories not used for max_age_hours. Returns the number of removed directories.
+    """
+    if max_age_hours <= 0 or not work_root.is_dir():
+        return 0
+    deadline = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(work_root):
+        try:
+            if entry.is_dir(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < deadline:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class _PluginCacheLock:
+    """
+    Terraform's plugin cache is not safe for concurrent `init`: inits are serialized between threads and,
+    with a file lock, between processes.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.path = cache_dir / ".lock"
+        self._file = None
+
+    def __enter__(self):
+        _cache_lock.acquire()
+        try:
+            import fcntl
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except (ImportError, OSError):
+            self._file = None
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            self._file.close()
+        _cache_lock.release()
+
+
+class TerraformRunner:
+    """
+    Runs terraform for the generated code in an isolated run directory.
+
+    The sources are synced into <work_root>/<run id>/terraform, so concurrent runs for the same destination
+    don't share a working directory, and retries of one run reuse the warm .terraform folders: init is skipped
+    if providers/modules didn't change. Providers come from the shared plugin cache, or only from a local
+    filesystem mirror in offline mode. Validating the root covers the modules it calls, modules it doesn't call
+    are initialized and validated in parallel next to it. The root plan (optional, needs cloud credentials) runs
+    after a successful validate. Run directories unused for max_age_hours are swept at the start of a run.
+    """
+
+    def __init__(self, terraform_dir: str | Path, work_root: Optional[str | Path] = None,
+                 plugin_cache_dir: Optional[str | Path] = None, mirror_dir: Optional[str | Path] = None,
+                 offline: bool = False, timeout: int = 120, plan: bool = False,
+                 terraform_bin: Optional[str] = None, max_age_hours: float = DEFAULT_RUN_MAX_AGE_HOURS):
+        self.terraform_dir = Path(terraform_dir)
+        self.work_root = Path(os.path.expanduser(str(work_root or DEFAULT_WORK_ROOT)))
+        self.run_dir = self.work_root / uuid.uuid4().hex[:12]
+        self.plugin_cache_dir = Path(os.path.expanduser(str(plugin_cache_dir or DEFAULT_PLUGIN_CACHE_DIR)))
+        self.mirror_dir = Path(os.path.expanduser(str(mirror_dir))) if mirror_dir else None
+        self.offline = offline
+        self.timeout = timeout
+        self.plan = plan
+        self.terraform_bin = terraform_bin or shutil.which("terraform")
+        self.max_age_hours = max_age_hours
+
+    @classmethod
+    def from_env(cls, terraform_dir: str | Path) -> "TerraformRunner":
+        return cls(
+            terraform_dir,
+            work_root=os.getenv("TERRAFORM_WORK_ROOT"),
+            plugin_cache_dir=os.getenv("TERRAFORM_PLUGIN_CACHE_DIR"),
+            mirror_dir=os.getenv("TERRAFORM_PROVIDER_MIRROR"),
+            offline=os.getenv("TERRAFORM_OFFLINE", "false").lower() in ("1", "true", "yes"),
+            timeout=int(os.getenv("TERRAFORM_TIMEOUT", "120")),
+            plan=os.getenv("TERRAFORM_PLAN_ENABLED", "false").lower() in ("1", "true", "yes"),
+            max_age_hours=float(os.getenv("TERRAFORM_RUN_MAX_AGE_HOURS", str(DEFAULT_RUN_MAX_AGE_HOURS))),
+        )
+
+    @property
+    def available(self) -> bool:
+        return bool(self.terraform_bin)
+
+    @property
+    def work_dir(self) -> Path:
+        return self.run_dir / "terraform"
+
+    def _cli_config(self) -> Optional[Path]:
+        if self.mirror_dir is None:
+            return None
+        direct = "" if self.offline else "\n  direct {}"
+        config = self.run_dir / "terraform.rc"
+        config.write_text(
+            f'provider_installation {{\n  filesystem_mirror {{\n    path = "{self.mirror_dir.as_posix()}"\n  }}{direct}\n}}\n',
+            encoding="utf-8",
+        )
+        return config
+
+    def _environment(self) -> Dict[str, str]:
+        env = dict(os.environ, TF_IN_AUTOMATION="1", TF_INPUT="0", CHECKPOINT_DISABLE="1",
+                   TF_PLUGIN_CACHE_DIR=str(self.plugin_cache_dir),
+                   TF_PLUGIN_CACHE_MAY_BREAK_DEPENDENCY_LOCK_FILE="true")
+        cli_config = self._cli_config()
+        if cli_config is not None:
+            env["TF_CLI_CONFIG_FILE"] = str(cli_config)
+        return env
+
+    def _command(self, step: str, module: str, args: list[str], env: Dict[str, str]) -> tuple[StepResult, str]:
+        started = time.monotonic()
+        try:
+            completed = subprocess.run([self.terraform_bin, *args], cwd=self.work_dir / module, env=env,
+                                       capture_output=True, text=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            return StepResult(step, module, None, time.monotonic() - started,
+                              [_diagnostic("error", f"timed out after {self.timeout}s")]), ""
+        diagnostics = []
+        if completed.returncode != 0 and step == "init":
+            # init has no machine readable output in older terraform versions
+            message = "\n".join(completed.stderr.strip().splitlines()[-15:])
+            diagnostics.append(_diagnostic("error", "init failed", message))
+        return StepResult(step, module, completed.returncode, time.monotonic() - started, diagnostics,
+                          completed.stderr), completed.stdout
+
+    def init(self, module: str, env: Dict[str, str]) -> StepResult:
+        module_dir = self.work_dir / module
+        fingerprint = init_fingerprint(module_dir)
+        fingerprint_file = module_dir / ".terraform" / INIT_FINGERPRINT_FILE
+        if fingerprint_file.is_file() and fingerprint_file.read_text(encoding="utf-8") == fingerprint:
+            return StepResult("init", module, 0, 0.0, [], skipped=True)
+        # The backend is only needed to plan the root
+        backend = "-backend=true" if self.plan and not module else "-backend=false"
+        with _PluginCacheLock(self.plugin_cache_dir):
+            result, _ = self._command("init", module, ["init", backend, "-no-color"], env)
+        if result.ok:
+            fingerprint_file.parent.mkdir(parents=True, exist_ok=True)
+            fingerprint_file.write_text(fingerprint, encoding="utf-8")
+        return result
+
+    def validate(self, module: str, env: Dict[str, str]) -> StepResult:
+        result, stdout = self._command("validate", module, ["validate", "-json", "-no-color"], env)
+        try:
+            result.diagnostics += parse_diagnostics(json.loads(stdout).get("diagnostics", []), module)
+        except ValueError:
+            if result.returncode:
+                result.diagnostics.append(_diagnostic("error", "validate failed", result.output.strip()[-2000:]))
+        return result
+
+    def plan_root(self, env: Dict[str, str]) -> StepResult:
+        result, stdout = self._command("plan", "", ["plan", "-json", "-no-color", "-lock=false", "-input=false"], env)
+        for line in stdout.splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("type") == "diagnostic":
+                result.diagnostics += parse_diagnostics([event["diagnostic"]], "")
+            elif event.get("type") == "change_summary":
+                result.changes = event.get("changes")
+        if result.returncode and not result.errors:
+            result.diagnostics.append(_diagnostic("error", "plan failed", result.output.strip()[-2000:]))
+        return result
+
+    def _check_module(self, module: str, env: Dict[str, str], plan: bool) -> list[StepResult]:
+        steps = [self.init(module, env)]
+        if steps[-1].ok:
+            steps.append(self.validate(module, env))
+        if plan and steps[-1].ok:
+            steps.append(self.plan_root(env))
+        return steps
+
+    def run(self) -> TerraformRunResult:
+        """
+        Sync the sources and check the root and the modules it doesn't call in parallel on the shared terraform pool.
+        """
+        if not self.available:
+            raise FileNotFoundError("terraform executable not found")
+        swept = sweep_run_dirs(self.work_root, self.max_age_hours)
+        if swept:
+            print(f"Removed {swept} terraform run directories unused for {self.max_age_hours}h")
+        self.plugin_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        # The age of a run directory is the time of its last run
+        os.utime(self.run_dir)
+        sync_tree(self.terraform_dir, self.work_dir)
+        env = self._environment()
+
+        modules_dir = self.work_dir / "modules"
+        called = called_modules(self.work_dir)
+        modules = sorted(f"modules/{path.name}" for path in modules_dir.iterdir()
+                         if path.is_dir() and any(path.glob("*.tf")) and f"modules/{path.name}" not in called) \
+            if modules_dir.is_dir() else []
+        pool = get_terraform_pool()
+        # The root is submitted first, so it doesn't wait behind all modules in a small pool
+        futures: list[Future] = [pool.submit(self._check_module, "", env, self.plan)]
+        futures += [pool.submit(self._check_module, module, env, False) for module in modules]
+        return TerraformRunResult([step for future in futures for step in future.result()])
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+def populate_mirror(terraform_dir: str | Path, mirror_dir: str | Path) -> int:
+    """
+    Download the providers of the terraform code into a local filesystem mirror for offline runs.
+    """
+    terraform_bin = shutil.which("terraform")
+    if not terraform_bin:
+        raise FileNotFoundError("terraform executable not found")
+    return subprocess.run([terraform_bin, "providers", "mirror", str(Path(mirror_dir).expanduser())],
+                          cwd=terraform_dir).returncode
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check generated Terraform code in an isolated run directory.")
+    parser.add_argument("terraform_dir")
+    parser.add_argument("--mirror", metavar="MIRROR_DIR",
+                        help="Populate a local provider mirror for offline runs instead of checking the code")
+    args = parser.parse_args()
+
+    if args.mirror:
+        raise SystemExit(populate_mirror(args.terraform_dir, args.mirror))
+    runner = TerraformRunner.from_env(args.terraform_dir)
+    try:
+        run_result = runner.run()
+    finally:
+        runner.cleanup()
+    print(run_result.summary())
+    if not run_result.ok:
+        print(format_issues(run_result.issues()))
+    raise SystemExit(0 if run_result.ok else 1)
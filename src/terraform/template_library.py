@@ -0,0 +1,406 @@
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.tools.patching import atomic_write, replace_block
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+TEMPLATE_FILES = ("main.tf", "variables.tf", "outputs.tf")
+
+# Order of module blocks in the root main.tf
+ROOT_MODULE_ORDER = ("network", "firewall", "database", "compute-nodes", "monitoring")
+
+# Requirement that only switches autoscaling on for all instance groups, e.g. "Autoscale: both ProxySQL and ..."
+AUTOSCALING_PATTERN = re.compile(r"^\s*autoscal", re.IGNORECASE)
+
+# "zones (A and C)", "Zone B", "zones A, B"
+ZONES_PATTERN = re.compile(r"\b(?i:zones?)\s*\(?\s*([A-F](?:\s*(?:,|and|&)\s*[A-F])*)\b")
+
+STOP_WORDS = {"a", "an", "the", "on", "of", "for", "in", "with", "and", "to", "deploy", "deployed", "create",
+              "compute", "engine", "instance", "instances", "vm", "vms", "group", "server", "servers"}
+
+
+def _zones(text: str, default: list[str]) -> list[str]:
+    zones = []
+    for match in ZONES_PATTERN.finditer(text):
+        zones += [zone.lower() for zone in re.findall(r"[A-F]", match.group(1)) if zone.lower() not in zones]
+    return zones or default
+
+
+def _database_parameters(texts: list[str]) -> Dict[str, Any]:
+    text = " ".join(texts).lower()
+    if "postgres" in text:
+        version = "POSTGRES_15"
+    elif "sql server" in text or "sqlserver" in text:
+        version = "SQLSERVER_2019_STANDARD"
+    else:
+        version = "MYSQL_8_0"
+    return {
+        "database_version": version,
+        "availability_type": "REGIONAL" if re.search(r"high availab|failover|regional", text) else "ZONAL",
+        "binary_log_enabled": version.startswith("MYSQL"),
+    }
+
+
+def _compute_parameters(texts: list[str]) -> Dict[str, Any]:
+    text = " ".join(texts)
+    zones = _zones(text, ["a"])
+    return {
+        "zones": zones,
+        "instance_count": len(zones),
+        "enable_autoscaling": "autoscal" in text.lower(),
+    }
+
+
+def _monitoring_parameters(texts: list[str]) -> Dict[str, Any]:
+    return {"zone": _zones(" ".join(texts), ["a"])[0]}
+
+
+class ModuleTemplate:
+    """
+    Terraform module template from the templates folder: the requirements it covers (pattern),
+    how it is wired in the root module (inputs) and which parameters are derived from requirement texts.
+    """
+
+    def __init__(self, name: str, pattern: str, inputs: Dict[str, str], outputs: list[str],
+                 parameters: Optional[Callable[[list[str]], Dict[str, Any]]] = None,
+                 multiple: bool = False, depends_on: tuple[str, ...] = (), wait_for: tuple[str, ...] = ()):
+        self.name = name
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.inputs = inputs
+        self.outputs = outputs
+        self.parameters = parameters or (lambda texts: {})
+        # A separate module instance is created for every matching requirement
+        self.multiple = multiple
+        self.depends_on = depends_on
+        # Modules that must be created first although no output of them is used (depends_on in the root module)
+        self.wait_for = wait_for
+
+    @property
+    def path(self) -> Path:
+        return TEMPLATES_DIR / self.name
+
+    def matches(self, text: str) -> bool:
+        return bool(self.pattern.search(text))
+
+
+# Order matters: a requirement is covered by the first matching template
+MODULE_TEMPLATES = [
+    ModuleTemplate(
+        "monitoring",
+        r"prometheus|grafana|\bmonitoring\b",
+        inputs={
+            "project_id": "var.project_id",
+            "region": "var.region",
+            "network_self_link": "module.network.network_self_link",
+            "subnetwork_self_link": "module.network.subnet_self_link",
+            "allowed_ranges": "[module.network.subnet_cidr]",
+        },
+        outputs=["internal_ip", "prometheus_url", "grafana_url"],
+        parameters=_monitoring_parameters,
+        depends_on=("network",),
+    ),
+    ModuleTemplate(
+        "database",
+        r"cloud\s*sql",
+        inputs={
+            "project_id": "var.project_id",
+            "region": "var.region",
+            "network_self_link": "module.network.network_self_link",
+        },
+        outputs=["connection_name", "private_ip_address"],
+        parameters=_database_parameters,
+        depends_on=("network",),
+        wait_for=("network",),
+    ),
+    ModuleTemplate(
+        "firewall",
+        r"firewall|ingress rule|allow(?:ed)? (?:traffic|ingress)",
+        inputs={
+            "project_id": "var.project_id",
+            "network_name": "module.network.network_name",
+            "network_self_link": "module.network.network_self_link",
+            "internal_ranges": "[module.network.subnet_cidr]",
+        },
+        outputs=["firewall_rules"],
+        depends_on=("network",),
+    ),
+    ModuleTemplate(
+        "network",
+        r"\bvpc\b|\bnetwork\b|subnet",
+        inputs={
+            "project_id": "var.project_id",
+            "region": "var.region",
+        },
+        outputs=["network_name", "subnet_self_link"],
+    ),
+    ModuleTemplate(
+        "compute-nodes",
+        r"compute engine|\bvms?\b|virtual machine|instance group",
+        inputs={
+            "project_id": "var.project_id",
+            "region": "var.region",
+            "subnetwork_self_link": "module.network.subnet_self_link",
+        },
+        outputs=["instance_group"],
+        parameters=_compute_parameters,
+        multiple=True,
+        depends_on=("network", "firewall"),
+    ),
+]
+
+TEMPLATES_BY_NAME = {template.name: template for template in MODULE_TEMPLATES}
+
+
+def _instance_name(text: str, fallback: str) -> str:
+    words = [word.lower() for word in re.findall(r"[A-Za-z][A-Za-z0-9]*", text.split(":")[0].split("(")[0])]
+    words = [word for word in words if word not in STOP_WORDS][:2]
+    return "_".join(words) or fallback
+
+
+class TemplateInstance:
+    """
+    One module block in the root module created from a template.
+    """
+
+    def __init__(self, template: ModuleTemplate, name: str, requirements: list[str], texts: list[str]):
+        self.template = template
+        self.name = name
+        self.requirements = requirements
+        self.texts = texts
+
+    @property
+    def module_dir(self) -> str:
+        # Templates instantiated many times share one module folder
+        return f"modules/{self.template.name}"
+
+    def parameters(self) -> Dict[str, Any]:
+        parameters = self.template.parameters(self.texts)
+        if self.template.multiple:
+            parameters = {"name": self.name.replace("_", "-"), **parameters}
+        return parameters
+
+
+class TemplatePlan:
+    """
+    Template instances for a requirements document and the requirements no template covers.
+    """
+
+    def __init__(self, instances: list[TemplateInstance], uncovered: list[str]):
+        self.instances = instances
+        self.uncovered = uncovered
+
+    @property
+    def covered(self) -> list[str]:
+        covered = []
+        for instance in self.instances:
+            covered += [req_id for req_id in instance.requirements if req_id not in covered]
+        return covered
+
+    @property
+    def module_dirs(self) -> list[str]:
+        return sorted({instance.module_dir for instance in self.instances})
+
+
+def match_requirements(requirements: Dict[str, Dict[str, Any]]) -> TemplatePlan:
+    """
+    Map parsed requirements ({id: {"text", "sources"}}) to template instances. Matching is keyword based,
+    requirements that no template recognizes are left for the LLM.
+    """
+    instances: Dict[str, TemplateInstance] = {}
+    uncovered = []
+    autoscaling = []
+    for req_id, requirement in requirements.items():
+        text = requirement["text"]
+        if AUTOSCALING_PATTERN.match(text):
+            autoscaling.append(req_id)
+            continue
+        template = next((template for template in MODULE_TEMPLATES if template.matches(text)), None)
+        if template is None:
+            uncovered.append(req_id)
+            continue
+        name = template.name.replace("-", "_")
+        if template.multiple:
+            name = _instance_name(text, req_id.lower())
+            while name in instances:
+                name = f"{name}_{req_id.lower()}"
+        instance = instances.setdefault(name, TemplateInstance(template, name, [], []))
+        instance.requirements.append(req_id)
+        instance.texts.append(text)
+
+    # Autoscaling requirements apply to all instance groups, without groups they are left for the LLM
+    groups = [instance for instance in instances.values() if instance.template.multiple]
+    for req_id in autoscaling:
+        if not groups:
+            uncovered.append(req_id)
+        for instance in groups:
+            instance.requirements.append(req_id)
+            instance.texts.append(requirements[req_id]["text"])
+
+    # Add modules the matched templates are wired to (e.g. network)
+    for instance in list(instances.values()):
+        for dependency in instance.template.depends_on:
+            name = dependency.replace("-", "_")
+            if name not in instances:
+                instances[name] = TemplateInstance(TEMPLATES_BY_NAME[dependency], name, [], [])
+
+    return TemplatePlan(sorted(instances.values(),
+                               key=lambda item: (ROOT_MODULE_ORDER.index(item.template.name), item.name)),
+                        uncovered)
+
+
+def _hcl_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(_hcl_value(item) for item in value) + "]"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value)
+
+
+def _hcl_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (list, tuple)):
+        return "list(string)"
+    if isinstance(value, (int, float)):
+        return "number"
+    return "string"
+
+
+def _with_requirements_header(text: str, requirements: list[str]) -> str:
+    lines = text.split("\n", 1)
+    if lines[0].startswith("# Requirements:"):
+        existing = [req.strip() for req in lines[0].split(":", 1)[1].split(",") if req.strip()]
+        requirements = existing + [req for req in requirements if req not in existing]
+        text = lines[1] if len(lines) > 1 else ""
+    return f"# Requirements: {', '.join(requirements)}\n{text}"
+
+
+def _set_tfvars_value(text: str, name: str, value: str, overwrite: bool = True) -> str:
+    pattern = re.compile(rf"^{re.escape(name)}[ \t]*=.*$", re.MULTILINE)
+    if pattern.search(text):
+        return pattern.sub(lambda match: f"{name} = {value}", text, count=1) if overwrite else text
+    if text and not text.endswith("\n"):
+        text += "\n"
+    return f"{text}{name} = {value}\n"
+
+
+def _read(path: Path) -> str:
+    return path.read_text(encoding="utf-8") if path.is_file() else ""
+
+
+def _writer(terraform_dir: Path, written: list[str]) -> Callable[[Path, str], None]:
+    def write(path: Path, content: str) -> None:
+        if atomic_write(str(path), content):
+            written.append(path.relative_to(terraform_dir.parent).as_posix())
+
+    return write
+
+
+def format_module_block(name: str, arguments: Dict[str, str]) -> str:
+    width = max(len(argument) for argument in arguments)
+    body = "\n".join(f"  {argument.ljust(width)} = {value}" for argument, value in arguments.items())
+    return f'module "{name}" {{\n{body}\n}}'
+
+
+def format_output_block(name: str, value: str) -> str:
+    return f'output "{name}" {{\n  value = {value}\n}}'
+
+
+def write_root_files(terraform_dir: str | Path, module_blocks: Dict[str, str], root_variables: Dict[str, tuple[str, Any]],
+                     output_blocks: Dict[str, str], requirements: list[str], project_id: str = "my-gcp-project",
+                     region: str = "us-central1") -> list[str]:
+    """
+    Add module blocks ({module name: block}), root variables ({name: (description, value)}) with their tfvars values
+    and outputs ({output name: block}) to the root files, together with the provider configuration.
+    Other blocks of the root files are kept. Returns the written files.
+    """
+    terraform_dir = Path(terraform_dir)
+    written: list[str] = []
+    write = _writer(terraform_dir, written)
+
+    root_variables = {"project_id": ("GCP project id", project_id), "region": ("Default region", region),
+                      **root_variables}
+    main_blocks = [
+        ("terraform", 'terraform {\n  required_version = ">= 1.3"\n\n  required_providers {\n'
+                      '    google = {\n      source  = "hashicorp/google"\n      version = ">= 5.0"\n    }\n'
+                      '    random = {\n      source  = "hashicorp/random"\n      version = ">= 3.0"\n    }\n  }\n}'),
+        ('provider "google"', 'provider "google" {\n  project = var.project_id\n  region  = var.region\n}'),
+    ]
+    main_blocks += [(f'module "{name}"', block) for name, block in module_blocks.items()]
+
+    main_tf = _read(terraform_dir / "main.tf")
+    for header, block in main_blocks:
+        main_tf = replace_block(main_tf, header, block)
+    write(terraform_dir / "main.tf", _with_requirements_header(main_tf, requirements))
+
+    variables_tf = _read(terraform_dir / "variables.tf")
+    tfvars = _read(terraform_dir / "terraform.tfvars")
+    for name, (description, value) in root_variables.items():
+        block = (f'variable "{name}" {{\n  description = {json.dumps(description)}\n'
+                 f'  type        = {_hcl_type(value)}\n}}')
+        variables_tf = replace_block(variables_tf, f'variable "{name}"', block)
+        # Values of the project and region set by the user are kept, the rest comes from the requirements
+        tfvars = _set_tfvars_value(tfvars, name, _hcl_value(value), overwrite=name not in ("project_id", "region"))
+    write(terraform_dir / "variables.tf", variables_tf)
+    write(terraform_dir / "terraform.tfvars", tfvars)
+
+    outputs_tf = _read(terraform_dir / "outputs.tf")
+    for name, block in output_blocks.items():
+        outputs_tf = replace_block(outputs_tf, f'output "{name}"', block)
+    write(terraform_dir / "outputs.tf", outputs_tf)
+
+    return written
+
+
+def render_template_plan(plan: TemplatePlan, terraform_dir: str | Path) -> list[str]:
+    """
+    Write template modules and add their module blocks, variables, outputs and tfvars values to the root files.
+    Blocks of the root files that were not created from templates are kept. Returns the written files.
+    """
+    terraform_dir = Path(terraform_dir)
+    written: list[str] = []
+    write = _writer(terraform_dir, written)
+
+    for module_dir in plan.module_dirs:
+        template = TEMPLATES_BY_NAME[module_dir.split("/", 1)[1]]
+        requirements = [req for instance in plan.instances if instance.template is template
+                        for req in instance.requirements]
+        for file_name in TEMPLATE_FILES:
+            content = (template.path / file_name).read_text(encoding="utf-8")
+            if file_name == "main.tf":
+                content = f"# Requirements: {', '.join(requirements)}\n{content}"
+            write(terraform_dir / module_dir / file_name, content)
+
+    module_blocks = {}
+    root_variables = {}
+    output_blocks = {}
+    for instance in plan.instances:
+        arguments = {"source": json.dumps(f"./{instance.module_dir}"), **instance.template.inputs}
+        for parameter, value in instance.parameters().items():
+            variable = f"{instance.name}_{parameter}"
+            root_variables[variable] = (f"{parameter} of module {instance.name}", value)
+            arguments[parameter] = f"var.{variable}"
+        if instance.template.wait_for:
+            arguments["depends_on"] = "[" + ", ".join(f"module.{name.replace('-', '_')}"
+                                                      for name in instance.template.wait_for) + "]"
+        module_blocks[instance.name] = format_module_block(instance.name, arguments)
+        for output in instance.template.outputs:
+            output_blocks[f"{instance.name}_{output}"] = format_output_block(f"{instance.name}_{output}",
+                                                                             f"module.{instance.name}.{output}")
+
+    return written + write_root_files(terraform_dir, module_blocks, root_variables, output_blocks, plan.covered)
+
+
+def format_template_outputs(plan: TemplatePlan) -> str:
+    lines = []
+    for instance in plan.instances:
+        outputs = [line.split('"')[1] for line in _read(instance.template.path / "outputs.tf").splitlines()
+                   if line.startswith("output ")]
+        requirements = f" (requirements: {', '.join(instance.requirements)})" if instance.requirements else ""
+        lines.append(f"- module.{instance.name} from {instance.module_dir}{requirements}: {', '.join(outputs)}")
+    return "\n".join(lines)
@@ -0,0 +1,77 @@
+resource "google_compute_instance_template" "main" {
+  project      = var.project_id
+  name_prefix  = "${var.name}-"
+  machine_type = var.machine_type
+  tags         = concat([var.name], var.tags)
+
+  disk {
+    source_image = var.source_image
+    disk_size_gb = var.disk_size_gb
+    auto_delete  = true
+    boot         = true
+  }
+
+  network_interface {
+    subnetwork = var.subnetwork_self_link
+  }
+
+  metadata_startup_script = var.startup_script
+
+  service_account {
+    scopes = ["cloud-platform"]
+  }
+
+  lifecycle {
+    create_before_destroy = true
+  }
+}
+
+resource "google_compute_health_check" "main" {
+  project = var.project_id
+  name    = "${var.name}-health-check"
+
+  tcp_health_check {
+    port = var.health_check_port
+  }
+}
+
+resource "google_compute_region_instance_group_manager" "main" {
+  project                   = var.project_id
+  name                      = "${var.name}-group"
+  region                    = var.region
+  base_instance_name        = var.name
+  distribution_policy_zones = [for zone in var.zones : "${var.region}-${zone}"]
+  target_size               = var.enable_autoscaling ? null : var.instance_count
+
+  version {
+    instance_template = google_compute_instance_template.main.id
+  }
+
+  named_port {
+    name = var.name
+    port = var.service_port
+  }
+
+  auto_healing_policies {
+    health_check      = google_compute_health_check.main.id
+    initial_delay_sec = 300
+  }
+}
+
+resource "google_compute_region_autoscaler" "main" {
+  count   = var.enable_autoscaling ? 1 : 0
+  project = var.project_id
+  name    = "${var.name}-autoscaler"
+  region  = var.region
+  target  = google_compute_region_instance_group_manager.main.id
+
+  autoscaling_policy {
+    min_replicas    = var.instance_count
+    max_replicas    = var.max_instances
+    cooldown_period = 60
+
+    cpu_utilization {
+      target = var.cpu_target
+    }
+  }
+}
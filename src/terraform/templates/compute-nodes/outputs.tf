@@ -0,0 +1,15 @@
+output "instance_group" {
+  value = google_compute_region_instance_group_manager.main.instance_group
+}
+
+output "instance_group_manager_id" {
+  value = google_compute_region_instance_group_manager.main.id
+}
+
+output "health_check_id" {
+  value = google_compute_health_check.main.id
+}
+
+output "network_tag" {
+  value = var.name
+}
@@ -0,0 +1,91 @@
+variable "project_id" {
+  description = "GCP project id"
+  type        = string
+}
+
+variable "region" {
+  description = "Region of the instance group"
+  type        = string
+}
+
+variable "subnetwork_self_link" {
+  description = "Subnetwork of the instances"
+  type        = string
+}
+
+variable "name" {
+  description = "Name of the instance group, used as prefix of resource names and network tag"
+  type        = string
+}
+
+variable "zones" {
+  description = "Zone suffixes (a, b, c...) the instances are distributed across"
+  type        = list(string)
+  default     = ["a"]
+}
+
+variable "machine_type" {
+  description = "Machine type of the instances"
+  type        = string
+  default     = "e2-medium"
+}
+
+variable "source_image" {
+  description = "Boot disk image"
+  type        = string
+  default     = "debian-cloud/debian-12"
+}
+
+variable "disk_size_gb" {
+  description = "Boot disk size"
+  type        = number
+  default     = 20
+}
+
+variable "tags" {
+  description = "Additional network tags"
+  type        = list(string)
+  default     = []
+}
+
+variable "startup_script" {
+  description = "Startup script of the instances"
+  type        = string
+  default     = ""
+}
+
+variable "service_port" {
+  description = "Port of the service running on the instances"
+  type        = number
+  default     = 80
+}
+
+variable "health_check_port" {
+  description = "TCP port checked by the auto-healing health check"
+  type        = number
+  default     = 22
+}
+
+variable "instance_count" {
+  description = "Number of instances, minimum number when autoscaling is enabled"
+  type        = number
+  default     = 1
+}
+
+variable "enable_autoscaling" {
+  description = "Scale the group on CPU utilization"
+  type        = bool
+  default     = false
+}
+
+variable "max_instances" {
+  description = "Maximum number of instances when autoscaling is enabled"
+  type        = number
+  default     = 3
+}
+
+variable "cpu_target" {
+  description = "Target CPU utilization of the autoscaler"
+  type        = number
+  default     = 0.6
+}
@@ -0,0 +1,41 @@
+resource "google_sql_database_instance" "main" {
+  project             = var.project_id
+  name                = var.instance_name
+  region              = var.region
+  database_version    = var.database_version
+  deletion_protection = var.deletion_protection
+
+  settings {
+    tier              = var.tier
+    availability_type = var.availability_type
+    disk_autoresize   = true
+
+    ip_configuration {
+      ipv4_enabled    = false
+      private_network = var.network_self_link
+    }
+
+    backup_configuration {
+      enabled            = true
+      binary_log_enabled = var.binary_log_enabled
+    }
+  }
+}
+
+resource "google_sql_database" "main" {
+  project  = var.project_id
+  name     = var.database_name
+  instance = google_sql_database_instance.main.name
+}
+
+resource "random_password" "user" {
+  length  = 24
+  special = false
+}
+
+resource "google_sql_user" "main" {
+  project  = var.project_id
+  name     = var.user_name
+  instance = google_sql_database_instance.main.name
+  password = random_password.user.result
+}
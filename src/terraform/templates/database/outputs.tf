@@ -0,0 +1,24 @@
+output "instance_name" {
+  value = google_sql_database_instance.main.name
+}
+
+output "connection_name" {
+  value = google_sql_database_instance.main.connection_name
+}
+
+output "private_ip_address" {
+  value = google_sql_database_instance.main.private_ip_address
+}
+
+output "database_name" {
+  value = google_sql_database.main.name
+}
+
+output "user_name" {
+  value = google_sql_user.main.name
+}
+
+output "user_password" {
+  value     = random_password.user.result
+  sensitive = true
+}
@@ -0,0 +1,62 @@
+variable "project_id" {
+  description = "GCP project id"
+  type        = string
+}
+
+variable "region" {
+  description = "Region of the Cloud SQL instance"
+  type        = string
+}
+
+variable "network_self_link" {
+  description = "VPC network with private services access"
+  type        = string
+}
+
+variable "instance_name" {
+  description = "Name of the Cloud SQL instance"
+  type        = string
+  default     = "main-db"
+}
+
+variable "database_version" {
+  description = "Cloud SQL database version"
+  type        = string
+  default     = "MYSQL_8_0"
+}
+
+variable "tier" {
+  description = "Machine tier of the Cloud SQL instance"
+  type        = string
+  default     = "db-n1-standard-1"
+}
+
+variable "availability_type" {
+  description = "ZONAL or REGIONAL (high availability)"
+  type        = string
+  default     = "ZONAL"
+}
+
+variable "binary_log_enabled" {
+  description = "Enable binary log (MySQL only)"
+  type        = bool
+  default     = true
+}
+
+variable "database_name" {
+  description = "Name of the database"
+  type        = string
+  default     = "app"
+}
+
+variable "user_name" {
+  description = "Name of the database user"
+  type        = string
+  default     = "app"
+}
+
+variable "deletion_protection" {
+  description = "Protect the instance from deletion"
+  type        = bool
+  default     = true
+}
@@ -0,0 +1,41 @@
+resource "google_compute_firewall" "allow_internal" {
+  project       = var.project_id
+  name          = "${var.network_name}-allow-internal"
+  network       = var.network_self_link
+  source_ranges = var.internal_ranges
+
+  allow {
+    protocol = "tcp"
+  }
+  allow {
+    protocol = "udp"
+  }
+  allow {
+    protocol = "icmp"
+  }
+}
+
+# SSH through Identity-Aware Proxy
+resource "google_compute_firewall" "allow_iap_ssh" {
+  project       = var.project_id
+  name          = "${var.network_name}-allow-iap-ssh"
+  network       = var.network_self_link
+  source_ranges = ["35.235.240.0/20"]
+
+  allow {
+    protocol = "tcp"
+    ports    = ["22"]
+  }
+}
+
+# Google Cloud health checks and load balancer proxies
+resource "google_compute_firewall" "allow_health_checks" {
+  project       = var.project_id
+  name          = "${var.network_name}-allow-health-checks"
+  network       = var.network_self_link
+  source_ranges = ["35.191.0.0/16", "130.211.0.0/22"]
+
+  allow {
+    protocol = "tcp"
+  }
+}
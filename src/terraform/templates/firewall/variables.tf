@@ -0,0 +1,20 @@
+variable "project_id" {
+  description = "GCP project id"
+  type        = string
+}
+
+variable "network_name" {
+  description = "Name of the VPC network, used as prefix of rule names"
+  type        = string
+}
+
+variable "network_self_link" {
+  description = "Self link of the VPC network"
+  type        = string
+}
+
+variable "internal_ranges" {
+  description = "IP ranges allowed to reach all instances"
+  type        = list(string)
+  default     = ["10.10.0.0/24"]
+}
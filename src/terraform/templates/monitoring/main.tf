@@ -0,0 +1,47 @@
+resource "google_compute_instance" "main" {
+  project      = var.project_id
+  name         = var.name
+  zone         = "${var.region}-${var.zone}"
+  machine_type = var.machine_type
+  tags         = [var.name]
+
+  boot_disk {
+    initialize_params {
+      image = var.source_image
+      size  = var.disk_size_gb
+    }
+  }
+
+  network_interface {
+    subnetwork = var.subnetwork_self_link
+  }
+
+  metadata_startup_script = <<-EOT
+    #!/bin/bash
+    set -e
+    apt-get update
+    apt-get install -y prometheus apt-transport-https software-properties-common wget
+    wget -q -O /usr/share/keyrings/grafana.key https://apt.grafana.com/gpg.key
+    echo "deb [signed-by=/usr/share/keyrings/grafana.key] https://apt.grafana.com stable main" > /etc/apt/sources.list.d/grafana.list
+    apt-get update
+    apt-get install -y grafana
+    systemctl enable --now prometheus grafana-server
+  EOT
+
+  service_account {
+    scopes = ["cloud-platform"]
+  }
+}
+
+resource "google_compute_firewall" "monitoring" {
+  project       = var.project_id
+  name          = "${var.name}-allow-ui"
+  network       = var.network_self_link
+  source_ranges = var.allowed_ranges
+  target_tags   = [var.name]
+
+  allow {
+    protocol = "tcp"
+    ports    = ["3000", "9090"]
+  }
+}
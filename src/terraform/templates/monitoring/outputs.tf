@@ -0,0 +1,15 @@
+output "instance_name" {
+  value = google_compute_instance.main.name
+}
+
+output "internal_ip" {
+  value = google_compute_instance.main.network_interface[0].network_ip
+}
+
+output "prometheus_url" {
+  value = "http://${google_compute_instance.main.network_interface[0].network_ip}:9090"
+}
+
+output "grafana_url" {
+  value = "http://${google_compute_instance.main.network_interface[0].network_ip}:3000"
+}
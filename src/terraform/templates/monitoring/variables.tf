@@ -0,0 +1,55 @@
+variable "project_id" {
+  description = "GCP project id"
+  type        = string
+}
+
+variable "region" {
+  description = "Region of the monitoring instance"
+  type        = string
+}
+
+variable "network_self_link" {
+  description = "VPC network of the monitoring instance"
+  type        = string
+}
+
+variable "subnetwork_self_link" {
+  description = "Subnetwork of the monitoring instance"
+  type        = string
+}
+
+variable "name" {
+  description = "Name of the monitoring instance"
+  type        = string
+  default     = "monitoring"
+}
+
+variable "zone" {
+  description = "Zone suffix (a, b, c...) of the monitoring instance"
+  type        = string
+  default     = "a"
+}
+
+variable "machine_type" {
+  description = "Machine type of the monitoring instance"
+  type        = string
+  default     = "e2-medium"
+}
+
+variable "source_image" {
+  description = "Boot disk image"
+  type        = string
+  default     = "debian-cloud/debian-12"
+}
+
+variable "disk_size_gb" {
+  description = "Boot disk size"
+  type        = number
+  default     = 50
+}
+
+variable "allowed_ranges" {
+  description = "IP ranges allowed to open Prometheus and Grafana"
+  type        = list(string)
+  default     = ["10.10.0.0/24"]
+}
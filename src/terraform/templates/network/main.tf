@@ -0,0 +1,47 @@
+resource "google_compute_network" "main" {
+  project                 = var.project_id
+  name                    = var.network_name
+  auto_create_subnetworks = false
+}
+
+resource "google_compute_subnetwork" "main" {
+  project                  = var.project_id
+  name                     = "${var.network_name}-subnet"
+  region                   = var.region
+  network                  = google_compute_network.main.id
+  ip_cidr_range            = var.subnet_cidr
+  private_ip_google_access = true
+}
+
+# Outbound internet access for instances without external IPs
+resource "google_compute_router" "main" {
+  project = var.project_id
+  name    = "${var.network_name}-router"
+  region  = var.region
+  network = google_compute_network.main.id
+}
+
+resource "google_compute_router_nat" "main" {
+  project                            = var.project_id
+  name                               = "${var.network_name}-nat"
+  router                             = google_compute_router.main.name
+  region                             = var.region
+  nat_ip_allocate_option             = "AUTO_ONLY"
+  source_subnetwork_ip_ranges_to_nat = "ALL_SUBNETWORKS_ALL_IP_RANGES"
+}
+
+# Private services access, used by Cloud SQL private IP
+resource "google_compute_global_address" "private_services" {
+  project       = var.project_id
+  name          = "${var.network_name}-private-services"
+  purpose       = "VPC_PEERING"
+  address_type  = "INTERNAL"
+  prefix_length = 16
+  network       = google_compute_network.main.id
+}
+
+resource "google_service_networking_connection" "private_services" {
+  network                 = google_compute_network.main.id
+  service                 = "servicenetworking.googleapis.com"
+  reserved_peering_ranges = [google_compute_global_address.private_services.name]
+}
@@ -0,0 +1,23 @@
+output "network_id" {
+  value = google_compute_network.main.id
+}
+
+output "network_name" {
+  value = google_compute_network.main.name
+}
+
+output "network_self_link" {
+  value = google_compute_network.main.self_link
+}
+
+output "subnet_self_link" {
+  value = google_compute_subnetwork.main.self_link
+}
+
+output "subnet_cidr" {
+  value = google_compute_subnetwork.main.ip_cidr_range
+}
+
+output "private_services_connection" {
+  value = google_service_networking_connection.private_services.id
+}
@@ -0,0 +1,21 @@
+variable "project_id" {
+  description = "GCP project id"
+  type        = string
+}
+
+variable "region" {
+  description = "Region of the subnetwork"
+  type        = string
+}
+
+variable "network_name" {
+  description = "Name of the VPC network"
+  type        = string
+  default     = "main-network"
+}
+
+variable "subnet_cidr" {
+  description = "IP range of the subnetwork"
+  type        = string
+  default     = "10.10.0.0/24"
+}
@@ -0,0 +1,388 @@
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+IDENTIFIER = r"[A-Za-z_][\w-]*"
+
+BLOCK_HEADER_PATTERN = re.compile(rf'^[ \t]*({IDENTIFIER})((?:[ \t]+"[^"\n]*")*)[ \t]*\{{', re.MULTILINE)
+ATTRIBUTE_PATTERN = re.compile(rf"^[ \t]*({IDENTIFIER})[ \t]*=(?!=)", re.MULTILINE)
+VAR_REF_PATTERN = re.compile(rf"\bvar\.({IDENTIFIER})")
+MODULE_REF_PATTERN = re.compile(rf"\bmodule\.({IDENTIFIER})\.({IDENTIFIER})")
+HEREDOC_PATTERN = re.compile(r"<<-?([A-Za-z_]\w*)[^\n]*\n")
+
+# Module block arguments that are not input variables
+MODULE_META_ARGUMENTS = {"source", "version", "count", "for_each", "providers", "depends_on"}
+
+REQUIRED_FILES = ("main.tf", "variables.tf", "outputs.tf")
+
+NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?([eE][+-]?\d+)?$")
+
+
+def strip_comments(text: str) -> str:
+    """
+    Blank out comments and heredoc contents keeping offsets and line numbers unchanged,
+    so braces and references in them are not matched. Strings are skipped while looking for comments.
+    """
+    result = list(text)
+    index = 0
+    length = len(text)
+
+    def blank(start: int, end: int) -> None:
+        for position in range(start, end):
+            if result[position] != "\n":
+                result[position] = " "
+
+    while index < length:
+        char = text[index]
+        if char == "#" or text.startswith("//", index):
+            end = text.find("\n", index)
+            end = length if end == -1 else end
+            blank(index, end)
+            index = end
+        elif text.startswith("/*", index):
+            end = text.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            blank(index, end)
+            index = end
+        elif char == '"':
+            # Keep interpolations (${...}) visible, they may contain references
+            end = index + 1
+            while end < length and text[end] != '"' and text[end] != "\n":
+                if text[end] == "\\":
+                    end += 1
+                elif text.startswith("${", end):
+                    depth = 0
+                    while end < length:
+                        if text[end] == "{":
+                            depth += 1
+                        elif text[end] == "}":
+                            depth -= 1
+                            if depth == 0:
+                                break
+                        end += 1
+                end += 1
+            index = end + 1
+        elif char == "<" and HEREDOC_PATTERN.match(text, index):
+            match = HEREDOC_PATTERN.match(text, index)
+            terminator = re.compile(rf"^[ \t]*{match.group(1)}[ \t]*$", re.MULTILINE)
+            end_match = terminator.search(text, match.end())
+            end = end_match.start() if end_match else length
+            blank(match.end(), end)
+            index = end_match.end() if end_match else length
+        else:
+            index += 1
+    return "".join(result)
+
+
+def _line_number(text: str, offset: int) -> int:
+    return text.count("\n", 0, offset) + 1
+
+
+def _block_end(code: str, open_index: int) -> int:
+    depth = 0
+    for index in range(open_index, len(code)):
+        if code[index] == "{":
+            depth += 1
+        elif code[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+    return len(code)
+
+
+def find_block(text: str, block_header: str) -> Optional[tuple[int, int]]:
+    """
+    Find the block with the given header (block type and labels, e.g. 'module "network"') and return
+    the (start, end) offsets of the whole block, end is exclusive.
+    """
+    words = re.findall(r'"[^"]*"|[^\s"{]+', block_header)
+    if not words:
+        return None
+    header_pattern = re.compile(r"^[ \t]*" + r"[ \t]+".join(re.escape(word) for word in words) + r"[ \t]*\{",
+                                re.MULTILINE)
+    code = strip_comments(text)
+    match = header_pattern.search(code)
+    if match is None:
+        return None
+    start = code.rfind("\n", 0, match.start()) + 1
+    return start, _block_end(code, match.end() - 1) + 1
+
+
+def _top_level_attributes(code: str, start: int, end: int) -> Dict[str, int]:
+    """
+    Attribute names assigned directly in the block body code[start:end] with their offsets.
+    """
+    attributes = {}
+    depth = 0
+    line_start = start
+    for index in range(start, end + 1):
+        char = code[index] if index < end else "\n"
+        if char == "\n":
+            if depth == 0:
+                match = ATTRIBUTE_PATTERN.match(code, line_start, index)
+                if match:
+                    attributes[match.group(1)] = line_start
+            line_start = index + 1
+        elif char in "{[(":
+            depth += 1
+        elif char in "}])":
+            depth -= 1
+    return attributes
+
+
+def _expression_text(text: str, start: int) -> str:
+    """
+    Source text of the expression starting at offset start (up to end of line or the closing bracket).
+    """
+    while start < len(text) and text[start] in " \t":
+        start += 1
+    if start < len(text) and text[start] in "{[":
+        depth = 0
+        for index in range(start, len(text)):
+            if text[index] in "{[":
+                depth += 1
+            elif text[index] in "}]":
+                depth -= 1
+                if depth == 0:
+                    return text[start:index + 1]
+    end = text.find("\n", start)
+    return text[start:len(text) if end == -1 else end].strip()
+
+
+def infer_type(expression: Optional[str]) -> str:
+    """
+    Type constraint of a variable from a literal value, 'any' for collections and references.
+    """
+    expression = (expression or "").strip()
+    if expression.startswith(('"', "<<")):
+        return "string"
+    if NUMBER_PATTERN.match(expression):
+        return "number"
+    if expression in ("true", "false"):
+        return "bool"
+    return "any"
+
+
+class TerraformModule:
+    """
+    Declarations and references of all .tf files in one module directory.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.variables: Dict[str, Dict[str, Any]] = {}
+        self.outputs: Dict[str, Dict[str, Any]] = {}
+        self.modules: Dict[str, Dict[str, Any]] = {}
+        self.var_refs: list[tuple[str, Path, int]] = []
+        self.module_refs: list[tuple[str, str, Path, int]] = []
+        for tf_file in sorted(path.glob("*.tf")):
+            self._parse(tf_file)
+
+    def _parse(self, tf_file: Path) -> None:
+        text = tf_file.read_text(encoding="utf-8", errors="replace")
+        code = strip_comments(text)
+
+        for match in BLOCK_HEADER_PATTERN.finditer(code):
+            block_type = match.group(1)
+            labels = re.findall(r'"([^"]*)"', text[match.start(2):match.end(2)])
+            if block_type not in ("variable", "output", "module") or not labels:
+                continue
+            name = labels[0]
+            open_index = match.end() - 1
+            close_index = _block_end(code, open_index)
+            attributes = _top_level_attributes(code, open_index + 1, close_index)
+            info = {"file": tf_file, "line": _line_number(text, match.start())}
+
+            if block_type == "variable":
+                if "default" in attributes:
+                    value_start = text.index("=", attributes["default"]) + 1
+                    info["default"] = _expression_text(text, value_start)
+                self.variables[name] = info
+            elif block_type == "output":
+                self.outputs[name] = info
+            else:
+                source = re.search(r'^[ \t]*source[ \t]*=[ \t]*"([^"]*)"', text[open_index:close_index], re.MULTILINE)
+                info["source"] = source.group(1) if source else None
+                info["arguments"] = {
+                    argument: _line_number(text, offset) for argument, offset in attributes.items()
+                    if argument not in MODULE_META_ARGUMENTS
+                }
+                info["values"] = {
+                    argument: _expression_text(text, text.index("=", attributes[argument]) + 1)
+                    for argument in info["arguments"]
+                }
+                self.modules[name] = info
+
+        for match in VAR_REF_PATTERN.finditer(code):
+            self.var_refs.append((match.group(1), tf_file, _line_number(text, match.start())))
+        for match in MODULE_REF_PATTERN.finditer(code):
+            self.module_refs.append((match.group(1), match.group(2), tf_file, _line_number(text, match.start())))
+
+
+class Issue:
+    def __init__(self, file: Path | str, line: int, message: str, fixed: bool = False, warning: bool = False):
+        self.file = file
+        self.line = line
+        self.message = message
+        self.fixed = fixed
+        self.warning = warning
+
+    def __str__(self) -> str:
+        prefix = "fixed" if self.fixed else "warning" if self.warning else "error"
+        return f"{prefix}: {self.file}:{self.line}: {self.message}"
+
+
+def parse_tfvars(path: Path) -> Dict[str, int]:
+    if not path.is_file():
+        return {}
+    text = path.read_text(encoding="utf-8", errors="replace")
+    code = strip_comments(text)
+    return {name: _line_number(text, offset) for name, offset in _top_level_attributes(code, 0, len(code)).items()}
+
+
+class TerraformValidator:
+    """
+    Static cross-check of generated Terraform code, without running terraform:
+      - every var.* used in a module is declared in the module variables
+      - every module.<name>.<output> reference points to a declared module and output
+      - module block arguments match the child module variables, required variables are passed
+      - every root variable has a value in terraform.tfvars
+    Trivial problems are fixed in place when autofix is enabled. Problems terraform accepts (missing conventional
+    files, tfvars values of undeclared variables) are reported as warnings.
+    """
+
+    def __init__(self, terraform_dir: str | Path, autofix: bool = True):
+        self.terraform_dir = Path(terraform_dir)
+        self.autofix = autofix
+        self.issues: list[Issue] = []
+        self.modules: Dict[Path, TerraformModule] = {}
+
+    def _relative(self, path: Path) -> str:
+        return os.path.relpath(path, self.terraform_dir.parent)
+
+    def _add(self, file: Path, line: int, message: str, fixed: bool = False, warning: bool = False) -> None:
+        self.issues.append(Issue(self._relative(file), line, message, fixed, warning))
+
+    def _load(self, path: Path) -> TerraformModule:
+        path = path.resolve()
+        if path not in self.modules:
+            self.modules[path] = TerraformModule(path)
+            for module_info in self.modules[path].modules.values():
+                source = module_info["source"]
+                if source and source.startswith((".", "/")) and (path / source).is_dir():
+                    self._load(path / source)
+        return self.modules[path]
+
+    def validate(self) -> list[Issue]:
+        self.issues = []
+        self.modules = {}
+        if not self.terraform_dir.is_dir():
+            self._add(self.terraform_dir, 0, "terraform folder does not exist")
+            return self.issues
+
+        root = self._load(self.terraform_dir)
+        for module in list(self.modules.values()):
+            self._check_required_files(module)
+            self._check_module_calls(module)
+            self._check_var_refs(module)
+            self._check_module_refs(module)
+        self._check_tfvars(root)
+        return self.issues
+
+    def _check_required_files(self, module: TerraformModule) -> None:
+        for file_name in REQUIRED_FILES:
+            file_path = module.path / file_name
+            if not file_path.exists():
+                self._add(file_path, 0, f"missing conventional file {file_name}", warning=True)
+
+    def _child(self, module: TerraformModule, module_info: Dict[str, Any]) -> Optional[TerraformModule]:
+        source = module_info["source"]
+        if not source or not source.startswith((".", "/")):
+            return None
+        return self.modules.get((module.path / source).resolve())
+
+    def _check_module_calls(self, module: TerraformModule) -> None:
+        for name, module_info in module.modules.items():
+            child = self._child(module, module_info)
+            if child is None:
+                source = module_info["source"]
+                if source and source.startswith((".", "/")):
+                    self._add(module_info["file"], module_info["line"], f"module '{name}' source '{source}' not found")
+                continue
+            for argument, line in module_info["arguments"].items():
+                if argument in child.variables:
+                    continue
+                child_uses_it = any(ref == argument for ref, _, _ in child.var_refs)
+                if self.autofix and child_uses_it:
+                    self._declare_variable(child, argument, infer_type(module_info["values"].get(argument)))
+                    self._add(module_info["file"], line,
+                              f"argument '{argument}' of module '{name}' declared as variable in "
+                              f"{self._relative(child.path / 'variables.tf')}", fixed=True)
+                else:
+                    self._add(module_info["file"], line,
+                              f"module '{name}' has no variable '{argument}' "
+                              f"(declare it in {self._relative(child.path / 'variables.tf')} or remove the argument)")
+            for variable, info in child.variables.items():
+                if "default" not in info and variable not in module_info["arguments"]:
+                    self._add(module_info["file"], module_info["line"],
+                              f"module '{name}' requires variable '{variable}' which is not passed")
+
+    def _check_var_refs(self, module: TerraformModule) -> None:
+        reported = set()
+        for name, file, line in module.var_refs:
+            if name in module.variables or name in reported:
+                continue
+            reported.add(name)
+            self._add(file, line, f"var.{name} is not declared in {self._relative(module.path / 'variables.tf')}")
+
+    def _check_module_refs(self, module: TerraformModule) -> None:
+        for module_name, output, file, line in module.module_refs:
+            module_info = module.modules.get(module_name)
+            if module_info is None:
+                self._add(file, line, f"module.{module_name} is not declared")
+                continue
+            child = self._child(module, module_info)
+            if child is not None and output not in child.outputs:
+                self._add(file, line, f"module.{module_name}.{output}: output '{output}' is not declared in "
+                                      f"{self._relative(child.path / 'outputs.tf')}")
+
+    def _check_tfvars(self, root: TerraformModule) -> None:
+        tfvars_path = self.terraform_dir / "terraform.tfvars"
+        values = parse_tfvars(tfvars_path)
+        missing_with_default = []
+        for name, info in root.variables.items():
+            if name in values:
+                continue
+            if "default" in info and self.autofix:
+                missing_with_default.append((name, info["default"]))
+                self._add(tfvars_path, 0, f"added value for root variable '{name}' from its default", fixed=True)
+            else:
+                self._add(tfvars_path, 0, f"root variable '{name}' has no value in terraform.tfvars")
+        for name, line in values.items():
+            if name not in root.variables:
+                # Terraform only warns about values of undeclared variables
+                self._add(tfvars_path, line, f"'{name}' is not declared in "
+                                             f"{self._relative(self.terraform_dir / 'variables.tf')}", warning=True)
+
+        if missing_with_default:
+            with open(tfvars_path, "a", encoding="utf-8") as file:
+                file.write("\n" + "".join(f"{name} = {default}\n" for name, default in missing_with_default))
+
+    @staticmethod
+    def _declare_variable(module: TerraformModule, name: str, type_constraint: str = "any") -> None:
+        with open(module.path / "variables.tf", "a", encoding="utf-8") as file:
+            file.write(f'\nvariable "{name}" {{\n  description = "{name}"\n  type        = {type_constraint}\n}}\n')
+        module.variables[name] = {"file": module.path / "variables.tf", "line": 0}
+
+    @property
+    def errors(self) -> list[Issue]:
+        return [issue for issue in self.issues if not issue.fixed and not issue.warning]
+
+    @property
+    def warnings(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.warning]
+
+
+def format_issues(issues: list[Issue]) -> str:
+    return "\n".join(str(issue) for issue in issues)
@@ -0,0 +1,209 @@
+import mimetypes
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Bytes read to detect the file type
+SNIFF_BYTES = 8192
+
+# Files larger than this are memory mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Content returned by one read, larger files are paginated
+DEFAULT_PAGE_BYTES = 32 * 1024
+
+# Block size used to count lines of large files, bounds the memory of a scan
+SCAN_CHUNK_SIZE = 1024 * 1024
+
+# Magic numbers of common binary formats found in repositories
+BINARY_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"GIF8", "GIF image"),
+    (b"%PDF", "PDF document"),
+    (b"PK\x03\x04", "zip archive (jar, docx, xlsx...)"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"BZh", "bzip2 archive"),
+    (b"\xfd7zXZ\x00", "xz archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7z archive"),
+    (b"\x7fELF", "ELF executable"),
+    (b"MZ", "Windows executable"),
+    (b"\xca\xfe\xba\xbe", "Java class / Mach-O binary"),
+    (b"SQLite format 3\x00", "SQLite database"),
+    (b"PAR1", "Parquet file"),
+)
+
+
+def format_size(size: int) -> str:
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+    return str(size)
+
+
+class FileInfo:
+    """
+    Type of a file detected from its name and first bytes: 'text', 'image', 'binary' or 'empty'.
+    """
+
+    def __init__(self, path: str, size: int, kind: str, mime_type: Optional[str] = None,
+                 description: Optional[str] = None):
+        self.path = path
+        self.size = size
+        self.kind = kind
+        self.mime_type = mime_type
+        self.description = description
+
+    def summary(self) -> str:
+        details = ", ".join(value for value in (self.description, self.mime_type, format_size(self.size)) if value)
+        return f"{self.kind} file {self.path} ({details})"
+
+
+def _looks_binary(sample: bytes) -> bool:
+    if b"\x00" in sample:
+        return True
+    # A multibyte character may be cut at the end of the sample
+    try:
+        sample.decode("utf-8")
+        return False
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3:
+            return False
+    # Not UTF-8: text in a legacy encoding still has few control characters
+    control = sum(1 for byte in sample if byte < 32 and byte not in (9, 10, 12, 13))
+    return control > len(sample) * 0.1
+
+
+def sniff_file(path: str) -> FileInfo:
+    """
+    Detect the type of a file from its size, name and first SNIFF_BYTES bytes, without reading the whole file.
+    """
+    size = os.path.getsize(path)
+    mime_type, _ = mimetypes.guess_type(path)
+    with open(path, "rb") as file:
+        sample = file.read(SNIFF_BYTES)
+    if not sample:
+        return FileInfo(path, size, "empty", mime_type)
+    description = next((name for signature, name in BINARY_SIGNATURES if sample.startswith(signature)), None)
+    if (mime_type and mime_type.startswith("image/") and mime_type != "image/svg+xml") \
+            or (description and description.endswith("image")):
+        return FileInfo(path, size, "image", mime_type, description)
+    if description or _looks_binary(sample):
+        return FileInfo(path, size, "binary", mime_type, description)
+    return FileInfo(path, size, "text", mime_type)
+
+
+@contextmanager
+def open_buffer(path: str) -> Iterator[bytes | mmap.mmap]:
+    """
+    File content as a bytes-like buffer, large files are memory mapped instead of read into memory.
+    """
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield file.read()
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def count_lines(buffer: bytes | mmap.mmap, end: int) -> int:
+    """
+    Number of line breaks before the byte offset, counted in SCAN_CHUNK_SIZE blocks.
+    """
+    return sum(buffer[start:min(start + SCAN_CHUNK_SIZE, end)].count(b"\n")
+               for start in range(0, end, SCAN_CHUNK_SIZE))
+
+
+def line_offset(buffer: bytes | mmap.mmap, line: int) -> int:
+    """
+    Byte offset of the start of a line (1-based), the buffer size if the file has fewer lines.
+    """
+    remaining = line - 1
+    size = len(buffer)
+    for start in range(0, size, SCAN_CHUNK_SIZE):
+        end = min(start + SCAN_CHUNK_SIZE, size)
+        count = buffer[start:end].count(b"\n")
+        if count < remaining:
+            remaining -= count
+            continue
+        position = start
+        for _ in range(remaining):
+            position = buffer.find(b"\n", position, end) + 1
+        return position
+    return size if remaining else 0
+
+
+class FilePage:
+    """
+    One page of a text file: the content of bytes [start, end) and the offset of the next page (None at the end).
+    """
+
+    def __init__(self, info: FileInfo, content: str, start: int, end: int, start_line: int, end_line: int):
+        self.info = info
+        self.content = content
+        self.start = start
+        self.end = end
+        self.start_line = start_line
+        self.end_line = end_line
+
+    @property
+    def next_offset(self) -> Optional[int]:
+        return self.end if self.end < self.info.size else None
+
+    def format(self) -> str:
+        if self.start == 0 and self.next_offset is None:
+            return self.content
+        size = format_size(self.info.size)
+        if self.start >= self.info.size:
+            return f"[{self.info.path}: {size}, {self.start_line - 1} lines, nothing after byte {self.start}]"
+        header = f"[{self.info.path}: {size}, lines {self.start_line}-{self.end_line}, bytes {self.start}-{self.end}]"
+        footer = f"[more content: continue with offset={self.next_offset}]" if self.next_offset is not None \
+            else "[end of file]"
+        content = self.content[:-1] if self.content.endswith("\n") else self.content
+        return f"{header}\n{content}\n{footer}"
+
+
+def read_page(path: str, offset: int = 0, start_line: Optional[int] = None, max_lines: Optional[int] = None,
+              page_bytes: int = DEFAULT_PAGE_BYTES, info: Optional[FileInfo] = None) -> FilePage:
+    """
+    Read at most page_bytes of a text file, starting at a byte offset or at start_line (1-based).
+    Pages end on a line break unless a single line is longer than the page, memory stays within one page
+    plus a scan block whatever the file size.
+    """
+    info = info or sniff_file(path)
+    with open_buffer(path) as buffer:
+        size = len(buffer)
+        start = line_offset(buffer, start_line) if start_line else min(max(offset, 0), size)
+        # Don't start in the middle of a UTF-8 character (at most 3 continuation bytes)
+        for _ in range(3):
+            if start >= size or not 0x80 <= buffer[start] < 0xC0:
+                break
+            start += 1
+        end = min(start + page_bytes, size)
+        if max_lines:
+            position = start
+            for _ in range(max_lines):
+                position = buffer.find(b"\n", position, end)
+                if position == -1:
+                    break
+                position += 1
+            else:
+                end = position
+        if end < size:
+            line_end = buffer.rfind(b"\n", start, end)
+            if line_end != -1:
+                end = line_end + 1
+            else:
+                # Line longer than the page: end before a UTF-8 character cut by the page, the next page starts on it
+                boundary = end
+                while boundary > start and end - boundary < 3 and 0x80 <= buffer[boundary] < 0xC0:
+                    boundary -= 1
+                if boundary > start:
+                    end = boundary
+        data = buffer[start:end]
+        first_line = count_lines(buffer, start) + 1
+    last_line = first_line + data.count(b"\n") - (1 if data.endswith(b"\n") else 0)
+    return FilePage(info, data.decode("utf-8", errors="replace"), start, end, first_line, max(last_line, first_line))
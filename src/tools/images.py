@@ -0,0 +1,193 @@
+import binascii
+import io
+import math
+import mimetypes
+import mmap
+import os
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+# Files larger than this are memory mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+
+# Base64 encoding chunk, must be a multiple of 3 to produce contiguous output
+ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+# Vision token pricing model used by OpenAI: 85 base tokens + 170 per 512px tile for 'high' detail
+LOW_DETAIL_TOKENS = 85
+HIGH_DETAIL_TILE_TOKENS = 170
+LOW_DETAIL_MAX_SIDE = 512
+
+
+def read_image_size(file_path: str) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from the PNG/GIF/JPEG header without decoding the image.
+    """
+    with open(file_path, "rb") as file:
+        header = file.read(26)
+        # Truncated headers give None like unknown formats
+        if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24]) if len(header) >= 24 else None
+        if header[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", header[6:10]) if len(header) >= 10 else None
+        if header[:2] != b"\xff\xd8":
+            return None
+
+        # JPEG: walk segments until a start-of-frame marker
+        file.seek(2)
+        while True:
+            marker = file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue
+            length_bytes = file.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack(">H", length_bytes)[0]
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                frame = file.read(5)
+                if len(frame) < 5:
+                    return None
+                height, width = struct.unpack(">xHH", frame)
+                return width, height
+            file.seek(length - 2, os.SEEK_CUR)
+
+
+def estimate_image_tokens(width: int, height: int, detail: str) -> int:
+    """
+    Estimate vision tokens for an image of the given size and detail level.
+    """
+    if detail == "low":
+        return LOW_DETAIL_TOKENS
+    # 'high': fit into 2048x2048, then scale the shortest side down to 768, count 512px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return LOW_DETAIL_TOKENS + HIGH_DETAIL_TILE_TOKENS * tiles
+
+
+def choose_detail(width: int, height: int) -> str:
+    """
+    Small images gain nothing from 'high' detail, larger diagrams need it to keep labels readable.
+    """
+    return "low" if max(width, height) <= LOW_DETAIL_MAX_SIDE else "high"
+
+
+def encode_data_url(data: bytes | memoryview | mmap.mmap, mime_type: str) -> str:
+    """
+    Base64 encode the data into a data URL, chunk by chunk into a single preallocated buffer.
+    Input chunks are memoryview slices, the encoded chunks and the returned string are copies.
+    """
+    prefix = f"data:{mime_type};base64,".encode("ascii")
+    size = len(data)
+    buffer = bytearray(len(prefix) + 4 * math.ceil(size / 3))
+    buffer[:len(prefix)] = prefix
+    position = len(prefix)
+    view = memoryview(data)
+    try:
+        for offset in range(0, size, ENCODE_CHUNK_SIZE):
+            encoded = binascii.b2a_base64(view[offset:offset + ENCODE_CHUNK_SIZE], newline=False)
+            buffer[position:position + len(encoded)] = encoded
+            position += len(encoded)
+    finally:
+        view.release()
+    return buffer.decode("ascii")
+
+
+def encode_file_data_url(file_path: str, mime_type: str) -> str:
+    """
+    Encode a file into a data URL, memory mapping large files instead of reading them.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file:
+        if size < MMAP_THRESHOLD:
+            return encode_data_url(file.read(), mime_type)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return encode_data_url(mapped, mime_type)
+
+
+def _downscale(file_path: str, max_dimension: int) -> Optional[Tuple[bytes, str, Tuple[int, int]]]:
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow is not installed, images are sent without downscaling")
+        return None
+
+    with Image.open(file_path) as image:
+        image.thumbnail((max_dimension, max_dimension))
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, format="PNG", optimize=True)
+            mime_type = "image/png"
+        else:
+            image.convert("RGB").save(output, format="JPEG", quality=90)
+            mime_type = "image/jpeg"
+        return output.getvalue(), mime_type, image.size
+
+
+def prepare_image(
+        file_path: str,
+        mime_type: str,
+        max_dimension: Optional[int] = 2048,
+        detail: Optional[str] = None,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Build the image_url payload for a file. Images larger than max_dimension are downscaled (requires Pillow),
+    the detail level is chosen from the image size unless given explicitly.
+
+    Returns the payload and a report with original/sent bytes and estimated tokens saved.
+    """
+    original_bytes = os.path.getsize(file_path)
+    size = read_image_size(file_path)
+    report: Dict[str, Any] = {"file": file_path, "original_bytes": original_bytes, "sent_bytes": original_bytes}
+
+    url = None
+    if size and max_dimension and max(size) > max_dimension:
+        downscaled = _downscale(file_path, max_dimension)
+        if downscaled:
+            data, mime_type, new_size = downscaled
+            url = encode_data_url(data, mime_type)
+            report["sent_bytes"] = len(data)
+            report["downscaled_from"], size = size, new_size
+    if url is None:
+        url = encode_file_data_url(file_path, mime_type)
+
+    if size:
+        detail = detail or choose_detail(*size)
+        original_size = report.get("downscaled_from", size)
+        report["estimated_tokens"] = estimate_image_tokens(*size, detail)
+        # Baseline is the previous behaviour: original image with 'auto' detail (treated as 'high')
+        report["estimated_tokens_saved"] = estimate_image_tokens(*original_size, "high") - report["estimated_tokens"]
+    report["bytes_saved"] = original_bytes - report["sent_bytes"]
+    report["detail"] = detail or "auto"
+
+    return {"url": url, "detail": report["detail"]}, report
+
+
+def tile_image(file_path: str, tile_size: int = 1024) -> list[Dict[str, str]]:
+    """
+    Split a large image into tile_size x tile_size tiles (requires Pillow), each as an image_url payload.
+    Without Pillow the image is returned un-tiled as a single payload.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("Pillow is not installed, images are sent without tiling")
+        mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        return [prepare_image(file_path, mime_type)[0]]
+
+    tiles = []
+    with Image.open(file_path) as image:
+        image = image.convert("RGB")
+        width, height = image.size
+        for top in range(0, height, tile_size):
+            for left in range(0, width, tile_size):
+                tile = image.crop((left, top, min(left + tile_size, width), min(top + tile_size, height)))
+                output = io.BytesIO()
+                tile.save(output, format="JPEG", quality=90)
+                tiles.append({"url": encode_data_url(output.getvalue(), "image/jpeg"),
+                              "detail": choose_detail(*tile.size)})
+    return tiles
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import re
+import stat
+import tempfile
+from typing import Optional
+
+from src.terraform.validator import find_block
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+# Process umask, read once at import: os.umask can only be read by setting it, which is not thread safe
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# How far (in lines) a hunk may have moved from the position given in its header
+HUNK_SEARCH_RADIUS = 200
+
+
+def content_hash(content: str | bytes) -> str:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_hash(file_path: str) -> Optional[str]:
+    try:
+        with open(file_path, "rb") as file:
+            return content_hash(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def _file_mode(file_path: str) -> int:
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def atomic_write(file_path: str, content: str) -> bool:
+    """
+    Write content through a temp file and rename, skipping the write if the file already has this content.
+    The file keeps its permissions, new files get the default ones (0666 without the umask).
+    Returns True if the file was written.
+    """
+    if file_hash(file_path) == content_hash(content):
+        return False
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(file_path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            file.write(content)
+        # mkstemp creates the file with mode 0600
+        os.chmod(tmp_path, _file_mode(file_path))
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+def _parse_hunks(diff: str) -> list[tuple[int, list[str], list[str]]]:
+    hunks = []
+    current = None
+    for line in diff.split("\n"):
+        header = HUNK_HEADER_PATTERN.match(line)
+        if header:
+            current = (int(header.group(1)), [], [])
+            hunks.append(current)
+        elif current is None or line.startswith(("---", "+++")) and not current[1] and not current[2]:
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        elif line.startswith("-"):
+            current[1].append(line[1:])
+        elif line.startswith("+"):
+            current[2].append(line[1:])
+        else:
+            # Context line, an empty line in the diff means an empty context line
+            current[1].append(line[1:])
+            current[2].append(line[1:])
+    # Trailing empty context produced by the final newline of the diff
+    for _, old, new in hunks:
+        while old and new and old[-1] == "" and new[-1] == "":
+            old.pop()
+            new.pop()
+    return hunks
+
+
+def _find_lines(lines: list[str], target: list[str], hint: int, start: int) -> int:
+    if not target:
+        return max(hint, start)
+    candidates = sorted(range(start, len(lines) - len(target) + 1), key=lambda index: abs(index - hint))
+    for index in candidates:
+        if abs(index - hint) > HUNK_SEARCH_RADIUS:
+            break
+        if [line.rstrip() for line in lines[index:index + len(target)]] == [line.rstrip() for line in target]:
+            return index
+    raise ValueError(f"Hunk does not apply near line {hint + 1}: {target[0] if target else ''!r}")
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    Apply a unified diff to the original text. Hunks are located by their context, so small line
+    number offsets are tolerated; a hunk whose context does not match raises ValueError.
+    """
+    hunks = _parse_hunks(diff)
+    if not hunks:
+        raise ValueError("No hunks found in diff")
+
+    lines = original.split("\n")
+    result: list[str] = []
+    position = 0
+    for old_start, old, new in hunks:
+        index = _find_lines(lines, old, max(old_start - 1, 0), position)
+        result.extend(lines[position:index])
+        result.extend(new)
+        position = index + len(old)
+    result.extend(lines[position:])
+    return "\n".join(result)
+
+
+def replace_block(original: str, block_header: str, new_block: str) -> str:
+    """
+    Replace the HCL block with the given header (e.g. 'resource "google_compute_network" "main"') by new_block,
+    the block is appended if the file does not contain it. An empty new_block removes the block.
+    """
+    span = find_block(original, block_header)
+    new_block = new_block.strip("\n")
+    if span is None:
+        if not new_block:
+            return original
+        separator = "" if not original or original.endswith("\n\n") else ("\n" if original.endswith("\n") else "\n\n")
+        return f"{original}{separator}{new_block}\n"
+    start, end = span
+    return original[:start] + new_block + original[end:]
@@ -1,87 +1,256 @@
-import base64
+import fnmatch
+import itertools
 import mimetypes
 import os
 from pathlib import Path
-from typing import Optional, Callable, Annotated
+from typing import Optional, Callable, Annotated, Iterator, Sequence
+
+from src.tools.file_access import DEFAULT_PAGE_BYTES, read_page, sniff_file
+from src.tools.images import prepare_image, read_image_size, tile_image
+from src.tools.patching import apply_unified_diff, atomic_write, replace_block
+
+# Folders that are skipped by default when walking project trees
+DEFAULT_EXCLUDES = (".git", ".hg", ".svn", ".idea", ".vscode", "node_modules", "__pycache__", ".venv", "venv",
+                    ".terraform", ".gradle", ".mvn", ".pytest_cache", ".mypy_cache", ".tox")
+
+
+def _default_work_dir() -> str:
+    # agentic_framework is imported on first use to keep module import fast
+    from agentic_framework.settings import settings
+    return settings.WORK_DIR
+
+
+class GitIgnore:
+    """
+    Minimal .gitignore matcher. Rules of nested .gitignore files are appended while walking down the tree,
+    the last matching rule wins.
+    """
+
+    def __init__(self, rules: Optional[list[tuple[str, str, bool, bool]]] = None):
+        self.rules = rules or []
+
+    def child(self, dir_path: str) -> "GitIgnore":
+        gitignore_path = os.path.join(dir_path, ".gitignore")
+        if not os.path.isfile(gitignore_path):
+            return self
+        rules = list(self.rules)
+        with open(gitignore_path, "r", encoding="utf-8", errors="replace") as file:
+            for line in file:
+                line = line.rstrip("\n").rstrip()
+                if not line or line.startswith("#"):
+                    continue
+                negate = line.startswith("!")
+                if negate:
+                    line = line[1:]
+                dir_only = line.endswith("/")
+                rules.append((dir_path, line.rstrip("/"), negate, dir_only))
+        return GitIgnore(rules)
+
+    def ignored(self, path: str, is_dir: bool) -> bool:
+        result = False
+        name = os.path.basename(path)
+        for base, pattern, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if "/" in pattern:
+                rel_path = os.path.relpath(path, base).replace(os.sep, "/")
+                matched = fnmatch.fnmatch(rel_path, pattern.lstrip("/").replace("**/", "*"))
+            else:
+                matched = fnmatch.fnmatch(name, pattern)
+            if matched:
+                result = not negate
+        return result
+
+
+def _list_dir(
+        dir_path: str,
+        gitignore: Optional[GitIgnore],
+        include: Optional[Sequence[str]],
+        exclude: Sequence[str],
+) -> list[os.DirEntry]:
+    try:
+        with os.scandir(dir_path) as iterator:
+            entries = list(iterator)
+    except OSError:
+        return []
+
+    result = []
+    for entry in entries:
+        is_dir = entry.is_dir()
+        if any(fnmatch.fnmatch(entry.name, pattern) for pattern in exclude):
+            continue
+        if gitignore and gitignore.ignored(entry.path, is_dir):
+            continue
+        if include and not is_dir and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in include):
+            continue
+        result.append(entry)
+    return sorted(result, key=lambda entry: entry.name)
+
+
+def iter_folder_files(
+        root: str,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Sequence[str] = DEFAULT_EXCLUDES,
+        respect_gitignore: bool = True,
+) -> Iterator[str]:
+    """
+    Yield file paths under root (depth first, sorted) applying the same filters as read_folder_structure.
+    """
+    def walk(dir_path: str, depth: int, gitignore: Optional[GitIgnore]) -> Iterator[str]:
+        if respect_gitignore:
+            gitignore = gitignore.child(dir_path)
+        for entry in _list_dir(dir_path, gitignore, include, exclude):
+            if entry.is_dir():
+                if max_depth is None or depth < max_depth:
+                    yield from walk(entry.path, depth + 1, gitignore)
+            else:
+                yield entry.path
+
+    yield from walk(root, 1, GitIgnore() if respect_gitignore else None)
+
+
+def iter_folder_tree(
+        root: str,
+        max_depth: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        exclude: Sequence[str] = DEFAULT_EXCLUDES,
+        respect_gitignore: bool = True,
+        summary_threshold: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield lines of the folder tree. Directories deeper than max_depth or (in summary mode) with more than
+    summary_threshold entries are collapsed to entry counts.
+    """
+    def count_entries(entries: list[os.DirEntry]) -> str:
+        dirs = sum(1 for entry in entries if entry.is_dir())
+        return f"[{len(entries) - dirs} files, {dirs} dirs]"
+
+    def walk(dir_path: str, prefix: str, depth: int, gitignore: Optional[GitIgnore],
+             entries: Optional[list[os.DirEntry]] = None) -> Iterator[str]:
+        # Entries (and .gitignore rules) of the folder scanned by the parent in summary mode are reused
+        if entries is None:
+            if respect_gitignore:
+                gitignore = gitignore.child(dir_path)
+            entries = _list_dir(dir_path, gitignore, include, exclude)
+        for index, entry in enumerate(entries):
+            is_last = index == len(entries) - 1
+            connector = "└── " if is_last else "├── "
+            if not entry.is_dir():
+                yield f"{prefix}{connector}{entry.name}"
+                continue
+
+            new_prefix = f"{prefix}    " if is_last else f"{prefix}│   "
+            if max_depth is not None and depth >= max_depth:
+                children = _list_dir(entry.path, gitignore, include, exclude)
+                yield f"{prefix}{connector}{entry.name}/ {count_entries(children)}" if children else f"{prefix}{connector}{entry.name}/"
+                continue
+            child_gitignore, children = gitignore, None
+            if summary_threshold is not None:
+                if respect_gitignore:
+                    child_gitignore = gitignore.child(entry.path)
+                children = _list_dir(entry.path, child_gitignore, include, exclude)
+                if len(children) > summary_threshold:
+                    yield f"{prefix}{connector}{entry.name}/ {count_entries(children)}"
+                    continue
+            yield f"{prefix}{connector}{entry.name}/"
+            yield from walk(entry.path, new_prefix, depth + 1, child_gitignore, children)
+
+    yield f"{os.path.basename(os.path.normpath(root))}/"
+    yield from walk(root, "", 1, GitIgnore() if respect_gitignore else None)
 
-from agentic_framework.settings import settings
 
 def read_folder_structure_tool(
         work_dir: Optional[str | Path],
-) -> Callable[[str], str]:
+        max_depth: Optional[int] = None,
+        max_entries: Optional[int] = 2000,
+        include: Optional[Sequence[str]] = None,
+        exclude: Sequence[str] = DEFAULT_EXCLUDES,
+        respect_gitignore: bool = True,
+        summary_threshold: Optional[int] = 50,
+) -> Callable[..., str]:
 
-    work_dir = str(work_dir) if work_dir else settings.WORK_DIR
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
 
-    def read_folder_structure(path: str) -> str:
+    def read_folder_structure(
+            path: Annotated[str, "path"],
+            summary: Annotated[bool, "collapse large folders to entry counts"] = False,
+    ) -> str:
         path = os.path.normpath(path)
-        tree_structure = ""
         if work_dir and not path.startswith(work_dir):
             path = os.path.join(work_dir, path)
 
-        def build_tree(dir_path: str, prefix: str = "") -> str:
-            entries = sorted(os.listdir(dir_path))
-            tree = ""
-            for index, entry in enumerate(entries):
-                entry_path = os.path.join(dir_path, entry)
-                connector = "└── " if index == len(entries) - 1 else "├── "
-                tree += f"{prefix}{connector}{entry}/\n" if os.path.isdir(entry_path) else f"{prefix}{connector}{entry}\n"
-                if os.path.isdir(entry_path):
-                    new_prefix = f"{prefix}    " if index == len(entries) - 1 else f"{prefix}│   "
-                    tree += build_tree(entry_path, new_prefix)
-            return tree
-
-        tree_structure = f"{os.path.basename(path)}/\n" + build_tree(path)
-        return tree_structure
+        lines = iter_folder_tree(
+            path,
+            max_depth=max_depth,
+            include=include,
+            exclude=exclude,
+            respect_gitignore=respect_gitignore,
+            summary_threshold=summary_threshold if summary else None,
+        )
+        if max_entries is not None:
+            # +1 for the root line
+            limited = list(itertools.islice(lines, max_entries + 1))
+            if next(lines, None) is not None:
+                limited.append(f"... (truncated after {max_entries} entries, use summary mode or a subfolder path)")
+            lines = limited
+        return "\n".join(lines) + "\n"
 
     return read_folder_structure
 
-# def get_file_content_tool(
-#         work_dir: Optional[str | Path],
-# ) -> Callable[[str], str]:
-#
-#     work_dir = str(work_dir) if work_dir else settings.WORK_DIR
-#
-#     def get_file_content(file_path: Annotated[str, "file_path"]) -> list[dict[str, str | dict[str, str]]] | str:
-#
-#         file_path = os.path.normpath(file_path)
-#         if work_dir and not file_path.startswith(work_dir):
-#             file_path = os.path.join(work_dir, file_path)
-#
-#         if not os.path.isfile(file_path):
-#             raise FileNotFoundError(f"The file '{file_path}' does not exist.")
-#
-#         # Check if the file is an image
-#         mime_type, _ = mimetypes.guess_type(file_path)
-#         if mime_type and mime_type.startswith("image"):
-#             # Read and encode the image file as base64
-#             with open(file_path, "rb") as image_file:
-#                 base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-#             return [
-#                 {
-#                     "type": "image_url",
-#                     "image_url": {
-#                         "url": f"data:{mime_type};base64,{base64_image}",
-#                         "detail": "auto"
-#                     }
-#                 }
-#             ]
-#         else:
-#             # Handle non-image files
-#             with open(file_path, "r", encoding="utf-8") as file:
-#                 return [{"type": "text", "content": file.read()}]
-#
-#     # Return the function to be used as a tool
-#
-#     return get_file_content
+def get_file_content_tool(
+        work_dir: Optional[str | Path],
+        page_bytes: Optional[int] = None,
+) -> Callable[..., str]:
+    """
+    Tool to read a file without loading it into memory: the type is sniffed first, binaries are summarized
+    instead of read, images are left to extract_infrastructure_from_image and text is returned in pages of
+    page_bytes (FILE_PAGE_BYTES env variable, 32 KB by default) with the offset of the next page.
+    """
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+    if page_bytes is None:
+        page_bytes = int(os.getenv("FILE_PAGE_BYTES", str(DEFAULT_PAGE_BYTES)))
+
+    def get_file_content(
+            file_path: Annotated[str, "file_path"],
+            offset: Annotated[int, "byte offset to continue from, given at the end of the previous page"] = 0,
+            start_line: Annotated[Optional[int], "first line to read (1-based), instead of offset"] = None,
+            max_lines: Annotated[Optional[int], "maximum number of lines to read"] = None,
+    ) -> str:
+        file_path = os.path.normpath(file_path)
+        if work_dir and not file_path.startswith(work_dir):
+            file_path = os.path.join(work_dir, file_path)
+
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"The file '{file_path}' does not exist.")
+
+        info = sniff_file(file_path)
+        if info.kind == "empty":
+            return f"The file '{file_path}' is empty."
+        if info.kind == "image":
+            return f"{info.summary()}: use extract_infrastructure_from_image to read it."
+        if info.kind == "binary":
+            return f"{info.summary()}: binary content is not shown."
+        return read_page(file_path, offset=offset, start_line=start_line, max_lines=max_lines,
+                         page_bytes=page_bytes, info=info).format()
+
+    return get_file_content
 
 
 def get_image_file_content_tool(
         work_dir: Optional[str | Path],
+        max_dimension: Optional[int] = None,
+        detail: Optional[str] = None,
 ) -> Callable[[str], dict[str, str]]:
     """
     Tool to get the image content as a dictionary containing the image URL.
+
+    Images larger than max_dimension (IMAGE_MAX_DIMENSION env variable, 2048 by default) are downscaled,
+    the detail level is chosen from the image size unless given explicitly.
     """
-    work_dir = str(work_dir) if work_dir else settings.WORK_DIR
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+    if max_dimension is None:
+        max_dimension = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
 
     def get_image_file_content(file_path: Annotated[str, "file_path"]) -> dict[str, str]:
         file_path = os.path.normpath(file_path)
@@ -94,17 +263,121 @@ def get_image_file_content_tool(
         # Check if the file is an image
         mime_type, _ = mimetypes.guess_type(file_path)
         if mime_type and mime_type.startswith("image"):
-            # Read and encode the image file as base64
-            with open(file_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-            return {
-                "url": f"data:{mime_type};base64,{base64_image}",
-                "detail": "auto"
-            }
+            image_url, report = prepare_image(file_path, mime_type, max_dimension=max_dimension or None, detail=detail)
+            print(f"Image {file_path}: sent {report['sent_bytes']} of {report['original_bytes']} bytes, "
+                  f"detail '{report['detail']}', ~{report.get('estimated_tokens', '?')} tokens "
+                  f"(saved ~{report.get('estimated_tokens_saved', 0)} tokens, {report['bytes_saved']} bytes)")
+            return image_url
         else:
             raise ValueError(f"The file '{file_path}' is not a valid image.")
 
     return get_image_file_content
 
 
+def get_image_tiles_tool(
+        work_dir: Optional[str | Path],
+        tile_size: int = 1024,
+) -> Callable[[str], list[dict[str, str]]]:
+    """
+    Tool to split a large image into tiles, returns a list of image URL dictionaries.
+    Images that fit into a single tile are returned as one (possibly downscaled) image.
+    """
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+    get_image_file_content = get_image_file_content_tool(work_dir)
+
+    def get_image_tiles(file_path: Annotated[str, "file_path"]) -> list[dict[str, str]]:
+        full_path = os.path.normpath(file_path)
+        if work_dir and not full_path.startswith(work_dir):
+            full_path = os.path.join(work_dir, full_path)
+
+        size = read_image_size(full_path) if os.path.isfile(full_path) else None
+        if size and max(size) > tile_size:
+            return tile_image(full_path, tile_size)
+        return [get_image_file_content(file_path)]
+
+    return get_image_tiles
+
+
+def search_relevant_content_tool(work_dir: Optional[str | Path], max_chars: int = 20000) -> Callable[..., str]:
+    """
+    Tool to get the most infrastructure relevant chunks of the source repository files from the relevance index,
+    instead of reading every file.
+    """
+    # Imported here, the index itself walks the tree with the functions of this module
+    from src.pipeline.relevance_index import get_relevance_index
+
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+
+    def search_relevant_content(
+            query: Annotated[Optional[str], "what to look for, infrastructure related content by default"] = None,
+            top_k: Annotated[int, "number of chunks to return"] = 10,
+    ) -> str:
+        index = get_relevance_index(work_dir)
+        results = index.search(query, top_k=top_k)
+        if not results:
+            return "No relevant content found"
+        return index.format_results(results, max_chars=max_chars)
+
+    return search_relevant_content
+
+
+def _dest_path(file_path: str, work_dir: Optional[str]) -> str:
+    file_path = os.path.normpath(file_path)
+    if work_dir and not file_path.startswith(work_dir):
+        file_path = os.path.join(work_dir, file_path.lstrip(os.sep))
+    return file_path
+
+
+def write_file_content_tool(work_dir: Optional[str | Path]) -> Callable[[str, str], str]:
+    """
+    Tool to write content to a file. The file is written atomically and left untouched when
+    its content is already identical, so unchanged files keep their timestamps.
+    """
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+
+    def write_file_content(
+            file_path: Annotated[str, "file_path"],
+            content: Annotated[str, "content"],
+    ) -> str:
+        file_path = _dest_path(file_path, work_dir)
+        if not atomic_write(file_path, content):
+            return f"File {file_path} is unchanged"
+        return f"File {file_path} written successfully"
+
+    return write_file_content
+
+
+def write_file_patch_tool(work_dir: Optional[str | Path]) -> Callable[..., str]:
+    """
+    Tool to change an existing file without resending its whole content: either a unified diff,
+    or a replacement of a single HCL block identified by its header (e.g. 'variable "region"').
+    """
+    work_dir = str(work_dir) if work_dir else _default_work_dir()
+
+    def write_file_patch(
+            file_path: Annotated[str, "file_path"],
+            diff: Annotated[Optional[str], "unified diff to apply to the file"] = None,
+            block: Annotated[Optional[str], "header of the block to replace, e.g. 'resource \"aws_vpc\" \"main\"'"] = None,
+            content: Annotated[Optional[str], "new content of the block, empty to remove it"] = None,
+    ) -> str:
+        file_path = _dest_path(file_path, work_dir)
+        original = ""
+        if os.path.isfile(file_path):
+            with open(file_path, "r", encoding="utf-8") as file:
+                original = file.read()
+
+        try:
+            if diff:
+                updated = apply_unified_diff(original, diff)
+            elif block:
+                updated = replace_block(original, block, content or "")
+            else:
+                return "Error: either diff or block with content must be provided"
+        except ValueError as e:
+            return f"Error: patch not applied to {file_path}: {str(e)}. Resend the whole file with write_file_content."
+
+        if not atomic_write(file_path, updated):
+            return f"File {file_path} is unchanged"
+        return f"File {file_path} patched successfully"
 
+    return write_file_patch
@@ -0,0 +1,80 @@
+import json
+
+from src.pipeline.checkpoint import CHECKPOINT_FILE_NAME, COMPLETED, FAILED, WorkflowCheckpoint
+
+TOOL_CALL = {"id": "call_1", "type": "function",
+             "function": {"name": "read_file_content", "arguments": '{"file_path": "Dockerfile"}'}}
+
+
+def _message(agent, content, category="analysis", **data):
+    return {"event": "agent_message", "time": 0, "agent": agent, "category": category, "content": content, **data}
+
+
+def _run(dest):
+    checkpoint = WorkflowCheckpoint.start("/src", dest, "initial task " * 1000)
+    checkpoint.on_event(_message("analyzer", "tool calls: read_file_content", tool_calls=[TOOL_CALL]))
+    checkpoint.on_event(_message("tool_executor", "FROM python", category="tool",
+                                 tool_responses=[{"tool_call_id": "call_1", "role": "tool", "content": "FROM python"}]))
+    checkpoint.on_event(_message("analyzer", "[R1] (sources: Dockerfile) web app\nANALYSIS_COMPLETE"))
+    checkpoint.on_event({"event": "tool_call", "time": 0, "tool": "write_file_content",
+                         "arguments": {"file_path": "terraform/main.tf"}, "args": []})
+    checkpoint.on_event(_message("generator", "tool calls: write_file_patch", category="generation",
+                                 tool_calls=[dict(TOOL_CALL, function={"name": "write_file_patch", "arguments": "{}"})]))
+    return checkpoint
+
+
+def test_log_is_appended_and_message_stored_once(tmp_path):
+    checkpoint = _run(tmp_path)
+    checkpoint.finish(error="rate limited")
+    lines = (tmp_path / CHECKPOINT_FILE_NAME).read_text().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["type"] for record in records] == ["start", "message", "message", "message", "file", "message",
+                                                      "status"]
+    assert sum(1 for line in lines if "initial task" in line) == 1
+
+
+def test_load_restores_state_with_tool_exchange(tmp_path):
+    _run(tmp_path).finish(error="rate limited")
+    checkpoint = WorkflowCheckpoint.load(tmp_path)
+    assert checkpoint.status == FAILED and checkpoint.error == "rate limited" and checkpoint.resumable
+    assert checkpoint.stage == "generation"
+    assert checkpoint.requirements_document == "[R1] (sources: Dockerfile) web app"
+    assert checkpoint.files_written == ["terraform/main.tf"]
+    assert checkpoint.current_agent == "generator"
+    analysis = checkpoint.stage_messages("analysis")
+    assert analysis[0]["tool_calls"] == [TOOL_CALL]
+    assert analysis[1]["tool_responses"][0]["tool_call_id"] == "call_1"
+    assert checkpoint.stage_messages("generation")[-1]["tool_calls"][0]["function"]["name"] == "write_file_patch"
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    checkpoint = _run(tmp_path)
+    with open(checkpoint.path, "a", encoding="utf-8") as file:
+        file.write('{"type": "message", "agent": "gen')
+    loaded = WorkflowCheckpoint.load(tmp_path)
+    assert len(loaded.messages) == 4
+
+
+def test_resume_and_complete(tmp_path):
+    _run(tmp_path).finish(error="boom")
+    checkpoint = WorkflowCheckpoint.load(tmp_path)
+    checkpoint.status = "running"
+    checkpoint.resumed += 1
+    checkpoint.save()
+    checkpoint.finish()
+    loaded = WorkflowCheckpoint.load(tmp_path)
+    assert loaded.status == COMPLETED and loaded.resumed == 1 and not loaded.resumable
+    assert WorkflowCheckpoint.start("/src", tmp_path, "new run").messages == []
+    assert WorkflowCheckpoint.load(tmp_path).messages == []
+
+
+def test_only_routed_requirements_documents_end_the_analysis(tmp_path):
+    checkpoint = WorkflowCheckpoint.start("/src", tmp_path, "task")
+    checkpoint.on_event(_message("analyzer", "The document will end with:\n```\nANALYSIS_COMPLETE\n```"))
+    checkpoint.on_event(_message("analyzer", "INFRASTRUCTURE_IR_ERROR\n- unknown requirement R9\n\n[R1] web app"))
+    checkpoint.on_event(_message("tool_executor", "TOOL_RESULT\nfix the IR", category="tool"))
+    assert checkpoint.stage == "analysis"
+    checkpoint.on_event(_message("analyzer", "[R1] web app\nANALYSIS_COMPLETE"))
+    loaded = WorkflowCheckpoint.load(tmp_path)
+    assert loaded.stage == "generation" and loaded.requirements_document == "[R1] web app"
+    assert len(loaded.stage_messages("analysis")) == 3
@@ -0,0 +1,86 @@
+import pytest
+
+from src.pipeline.context import ContextManager
+
+
+class WordEncoding:
+    """
+    Offline stand-in for a tiktoken encoding: one token per whitespace separated word.
+    """
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def word_encoding(monkeypatch):
+    import tiktoken
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model: WordEncoding())
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: WordEncoding())
+
+
+def _conversation(tool_result_words=500):
+    return [
+        {"role": "user", "content": "task " * 50},
+        {"role": "assistant", "content": "calling a tool"},
+        {"role": "tool", "content": "TOOL_RESULT " + "line " * tool_result_words},
+        {"role": "assistant", "content": "ANALYSIS_COMPLETE " + "requirement " * 300},
+        {"role": "assistant", "content": "next"},
+        {"role": "user", "content": "continue"},
+    ]
+
+
+def test_answered_tool_results_are_digested():
+    manager = ContextManager(max_tokens=100000, keep_last=2, summary_tokens=20)
+    messages = _conversation()
+    compacted = manager.compact(messages)
+    assert compacted[2]["content"].startswith("[digested tool result, 501 tokens] TOOL_RESULT line")
+    # The chat history is not modified and pinned messages are kept
+    assert messages[2]["content"].startswith("TOOL_RESULT")
+    assert compacted[0] == messages[0] and compacted[3] == messages[3]
+
+
+def test_recent_and_small_messages_are_kept():
+    manager = ContextManager(max_tokens=100000, keep_last=4, summary_tokens=20)
+    messages = _conversation()
+    assert manager.compact(messages) == messages
+    small = _conversation(tool_result_words=5)
+    assert ContextManager(keep_last=2, summary_tokens=20).compact(small) == small
+
+
+def test_oldest_unpinned_messages_shortened_over_budget():
+    manager = ContextManager(max_tokens=450, keep_last=1, summary_tokens=20)
+    messages = _conversation()
+    messages[4] = {"role": "assistant", "content": "long " * 400}
+    compacted = manager.compact(messages)
+    assert compacted[4]["content"].startswith("[digested message")
+    assert "ANALYSIS_COMPLETE" in compacted[3]["content"] and len(compacted[3]["content"]) == len(messages[3]["content"])
+    assert manager.stats[-1]["tokens_after"] < manager.stats[-1]["tokens_before"]
+
+
+def test_summarizer_is_called_once_per_content():
+    calls = []
+
+    def summarizer(text):
+        calls.append(text)
+        return "short summary"
+
+    manager = ContextManager(keep_last=2, summary_tokens=20, summarizer=summarizer)
+    messages = _conversation()
+    manager.compact(messages)
+    compacted = manager.compact(messages)
+    assert len(calls) == 1
+    assert "short summary" in compacted[2]["content"]
+
+
+def test_failing_summarizer_falls_back_to_truncation():
+    def summarizer(text):
+        raise RuntimeError("model unavailable")
+
+    manager = ContextManager(keep_last=2, summary_tokens=20, summarizer=summarizer)
+    compacted = manager.compact(_conversation())
+    assert compacted[2]["content"].split("\n")[0].endswith(" ...")
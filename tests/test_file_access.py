@@ -0,0 +1,71 @@
+import pytest
+
+from src.tools import file_access
+from src.tools.file_access import count_lines, line_offset, read_page, sniff_file
+
+
+def test_sniff_file_kinds(tmp_path):
+    (tmp_path / "empty.txt").write_bytes(b"")
+    (tmp_path / "a.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 20)
+    (tmp_path / "a.bin").write_bytes(bytes(range(256)))
+    (tmp_path / "app.jar").write_bytes(b"PK\x03\x04" + b"x" * 20)
+    (tmp_path / "latin1.txt").write_bytes("caf\xe9 cr\xe8me".encode("latin-1"))
+    (tmp_path / "a.tf").write_text('resource "x" "y" {}\n')
+    assert sniff_file(str(tmp_path / "empty.txt")).kind == "empty"
+    assert sniff_file(str(tmp_path / "a.png")).kind == "image"
+    assert sniff_file(str(tmp_path / "a.bin")).kind == "binary"
+    assert sniff_file(str(tmp_path / "app.jar")).description.startswith("zip archive")
+    assert sniff_file(str(tmp_path / "latin1.txt")).kind == "text"
+    assert sniff_file(str(tmp_path / "a.tf")).kind == "text"
+
+
+def test_line_offsets():
+    buffer = b"one\ntwo\nthree\n"
+    assert line_offset(buffer, 1) == 0
+    assert line_offset(buffer, 3) == 8
+    assert line_offset(buffer, 10) == len(buffer)
+    assert count_lines(buffer, 8) == 2
+
+
+def test_pages_end_on_line_breaks(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("".join(f"line {number}\n" for number in range(1, 101)))
+    page = read_page(str(path), page_bytes=100)
+    assert page.content.endswith("\n") and page.start_line == 1
+    text, offset = "", 0
+    while offset is not None:
+        page = read_page(str(path), offset=offset, page_bytes=100)
+        text += page.content
+        offset = page.next_offset
+    assert text == path.read_text()
+    assert "[more content: continue with offset=" in read_page(str(path), page_bytes=100).format()
+
+
+def test_start_line_and_max_lines(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("".join(f"line {number}\n" for number in range(1, 101)))
+    page = read_page(str(path), start_line=10, max_lines=3)
+    assert page.content == "line 10\nline 11\nline 12\n"
+    assert (page.start_line, page.end_line) == (10, 12)
+
+
+@pytest.mark.parametrize("page_bytes", [4, 5, 6, 7, 10, 33])
+def test_long_line_pages_split_on_character_boundaries(tmp_path, page_bytes):
+    text = "ab€😀çd" * 20
+    path = tmp_path / "long.txt"
+    path.write_text(text, encoding="utf-8")
+    pages, offset = [], 0
+    while offset is not None:
+        page = read_page(str(path), offset=offset, page_bytes=page_bytes)
+        assert "�" not in page.content
+        pages.append(page.content)
+        offset = page.next_offset
+    assert "".join(pages) == text
+
+
+def test_large_files_are_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_access, "MMAP_THRESHOLD", 16)
+    path = tmp_path / "big.txt"
+    path.write_text("x" * 50 + "\ny\n")
+    page = read_page(str(path), start_line=2)
+    assert page.content == "y\n" and page.start_line == 2
@@ -0,0 +1,51 @@
+from src.tools import tools
+from src.tools.tools import iter_folder_files, iter_folder_tree, read_folder_structure_tool
+
+
+def _make_tree(root):
+    (root / "src" / "big").mkdir(parents=True)
+    for index in range(5):
+        (root / "src" / "big" / f"file{index}.py").write_text("")
+    (root / "src" / "main.py").write_text("")
+    (root / "src" / ".gitignore").write_text("*.log\n")
+    (root / "src" / "debug.log").write_text("")
+    (root / "node_modules").mkdir()
+    (root / "node_modules" / "lib.js").write_text("")
+
+
+def test_tree_respects_excludes_and_nested_gitignore(tmp_path):
+    _make_tree(tmp_path)
+    lines = list(iter_folder_tree(str(tmp_path)))
+    text = "\n".join(lines)
+    assert "main.py" in text and "file0.py" in text
+    assert "node_modules" not in text
+    assert "debug.log" not in text
+
+
+def test_summary_mode_collapses_large_folders(tmp_path):
+    _make_tree(tmp_path)
+    text = "\n".join(iter_folder_tree(str(tmp_path), summary_threshold=3))
+    assert "big/ [5 files, 0 dirs]" in text
+    assert "debug.log" not in text
+
+
+def test_summary_mode_lists_each_folder_once(tmp_path, monkeypatch):
+    _make_tree(tmp_path)
+    listed = []
+    original = tools._list_dir
+    monkeypatch.setattr(tools, "_list_dir", lambda path, *args: listed.append(path) or original(path, *args))
+    list(iter_folder_tree(str(tmp_path), summary_threshold=10))
+    assert len(listed) == len(set(listed))
+
+
+def test_read_folder_structure_truncates(tmp_path):
+    _make_tree(tmp_path)
+    result = read_folder_structure_tool(str(tmp_path), max_entries=2)(str(tmp_path))
+    assert "truncated after 2 entries" in result
+
+
+def test_iter_folder_files(tmp_path):
+    _make_tree(tmp_path)
+    files = sorted(path[len(str(tmp_path)) + 1:] for path in iter_folder_files(str(tmp_path)))
+    assert files == ["src/.gitignore", "src/big/file0.py", "src/big/file1.py", "src/big/file2.py",
+                     "src/big/file3.py", "src/big/file4.py", "src/main.py"]
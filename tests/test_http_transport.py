@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from src.llm import http
+from src.llm.http import PooledTransport, RateLimiter, parse_duration, retry_after
+
+
+class ScriptedServer:
+    """
+    Local threaded HTTP server answering each request with the next (status, headers) of a script,
+    then 200 with a body counting the requests.
+    """
+
+    def __init__(self, script=(), delay=0.0):
+        self.script = list(script)
+        self.delay = delay
+        self.requests = 0
+        self.request_times = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+
+    def _handler(self):
+        scripted = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with scripted._lock:
+                    scripted.requests += 1
+                    scripted.request_times.append(time.monotonic())
+                    status, headers = scripted.script.pop(0) if scripted.script else (200, {})
+                    number = scripted.requests
+                time.sleep(scripted.delay)
+                payload = json.dumps({"request": number}).encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def make_server():
+    servers = []
+
+    def make(*args, **kwargs):
+        servers.append(ScriptedServer(*args, **kwargs))
+        return servers[-1]
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def _client(**kwargs):
+    transport = PooledTransport(**kwargs)
+    return httpx.Client(transport=transport), transport
+
+
+def test_parse_duration_and_retry_after():
+    assert parse_duration("20") == 20.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("250ms") == 0.25
+    assert parse_duration("soon") is None
+    response = httpx.Response(429, headers={"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "1.5s"})
+    assert retry_after(response) == 1.5
+    assert retry_after(httpx.Response(429, headers={"retry-after-ms": "300"})) == 0.3
+
+
+def test_identical_requests_are_coalesced(make_server):
+    server = make_server(delay=0.3)
+    client, transport = _client()
+    body = {"model": "m", "messages": [{"role": "user", "content": "same"}]}
+    with ThreadPoolExecutor(5) as pool:
+        responses = list(pool.map(lambda _: client.post(server.url, json=body), range(5)))
+    assert server.requests == 1
+    assert {response.json()["request"] for response in responses} == {1}
+    assert transport.summary()["coalesced"] == 4
+    # Streamed requests and different bodies are sent on their own
+    client.post(server.url, json=dict(body, stream=True))
+    client.post(server.url, json=dict(body, messages=[]))
+    assert server.requests == 3
+    client.close()
+
+
+def test_429_pauses_the_whole_pool(make_server):
+    server = make_server(script=[(429, {"retry-after-ms": "400"})])
+    client, transport = _client(max_retries=2)
+    started = time.monotonic()
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(client.post, server.url, json={"n": 1})
+        time.sleep(0.1)
+        # Sent while the pool is paused, it waits for the reset instead of hitting the limit
+        second = pool.submit(client.post, server.url, json={"n": 2})
+        assert first.result().status_code == 200 and second.result().status_code == 200
+    assert transport.summary()["rate_limited"] == 1
+    assert transport.summary()["retries"] == 1
+    assert all(request_time - started >= 0.35 for request_time in server.request_times[1:])
+    client.close()
+
+
+def test_retries_use_full_jitter(make_server, monkeypatch):
+    server = make_server(script=[(503, {}), (503, {}), (502, {})])
+    ranges, sleeps = [], []
+
+    def uniform(low, high):
+        ranges.append((low, high))
+        return high / 2
+
+    monkeypatch.setattr(http.random, "uniform", uniform)
+    monkeypatch.setattr(http.time, "sleep", sleeps.append)
+    client, transport = _client(max_retries=3, backoff=0.5, max_backoff=1.5)
+    response = client.post(server.url, json={"n": 1})
+    assert response.status_code == 200 and server.requests == 4
+    assert ranges[:3] == [(0, 0.5), (0, 1.0), (0, 1.5)]
+    # The stub server thread sleeps too (0 seconds)
+    assert [seconds for seconds in sleeps if seconds] == [0.25, 0.5, 0.75]
+    assert transport.summary()["retries"] == 3
+    client.close()
+
+
+def test_retries_give_up_after_max_retries(make_server, monkeypatch):
+    server = make_server(script=[(503, {})] * 5)
+    monkeypatch.setattr(http.time, "sleep", lambda seconds: None)
+    client, _ = _client(max_retries=2)
+    assert client.post(server.url, json={}).status_code == 503
+    assert server.requests == 3
+    client.close()
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.14
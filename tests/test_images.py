@@ -0,0 +1,64 @@
+import base64
+import struct
+import sys
+import zlib
+
+from src.tools.images import choose_detail, encode_data_url, encode_file_data_url, estimate_image_tokens, \
+    read_image_size, tile_image
+
+
+def _write_png(path, width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr
+                     + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr)))
+    return path
+
+
+def test_read_image_size(tmp_path):
+    assert read_image_size(str(_write_png(tmp_path / "a.png", 3000, 1200))) == (3000, 1200)
+    gif = tmp_path / "a.gif"
+    gif.write_bytes(b"GIF89a" + struct.pack("<HH", 40, 30) + b"\x00" * 16)
+    assert read_image_size(str(gif)) == (40, 30)
+    text = tmp_path / "a.txt"
+    text.write_text("not an image")
+    assert read_image_size(str(text)) is None
+
+
+def test_read_image_size_of_truncated_headers(tmp_path):
+    png = _write_png(tmp_path / "a.png", 3000, 1200)
+    png.write_bytes(png.read_bytes()[:20])
+    gif = tmp_path / "a.gif"
+    gif.write_bytes(b"GIF89a\x28")
+    jpeg = tmp_path / "a.jpg"
+    jpeg.write_bytes(b"\xff\xd8\xff\xe0\x00\x04\x00\x00\xff\xc0\x00\x11\x08\x00")
+    for path in (png, gif, jpeg):
+        assert read_image_size(str(path)) is None
+    jpeg.write_bytes(jpeg.read_bytes() + b"\x10\x00\x20")
+    assert read_image_size(str(jpeg)) == (32, 16)
+
+
+def test_encode_data_url_matches_base64():
+    data = bytes(range(256)) * 5000
+    url = encode_data_url(data, "image/png")
+    assert url == "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+
+def test_encode_file_data_url(tmp_path):
+    path = _write_png(tmp_path / "a.png", 10, 10)
+    assert encode_file_data_url(str(path), "image/png").endswith(base64.b64encode(path.read_bytes()).decode())
+
+
+def test_estimate_tokens_and_detail():
+    assert estimate_image_tokens(4000, 4000, "low") == 85
+    assert estimate_image_tokens(1024, 1024, "high") == 85 + 170 * 4
+    assert choose_detail(400, 300) == "low"
+    assert choose_detail(2000, 300) == "high"
+
+
+def test_tile_image_without_pillow_returns_whole_image(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "PIL", None)
+    path = _write_png(tmp_path / "big.png", 3000, 3000)
+    tiles = tile_image(str(path), 1024)
+    assert len(tiles) == 1
+    assert tiles[0]["url"].startswith("data:image/png;base64,")
+    assert tiles[0]["detail"] == "high"
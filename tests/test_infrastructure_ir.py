@@ -0,0 +1,90 @@
+import json
+
+from src.pipeline.infrastructure import compact_infrastructure_ir, extract_infrastructure_ir, InfrastructureIR
+from src.pipeline.routing import ANALYSIS_COMPLETE, INFRASTRUCTURE_IR_ERROR, message_status
+
+IR = {
+    "region": "us-central1",
+    "zones": ["us-central1-a", "us-central1-c"],
+    "components": [
+        {"id": "ilb", "kind": "internal_load_balancer", "requirements": ["R1"]},
+        {"id": "proxysql", "kind": "compute_engine", "zones": ["us-central1-a", "us-central1-c"],
+         "requirements": ["R2"], "scaling": {"min": 2, "max": 4, "metric": "cpu", "target": 0.6}},
+        {"id": "mysql", "kind": "cloud_sql", "requirements": ["R3"]},
+    ],
+    "links": [{"from": "ilb", "to": "proxysql", "protocol": "tcp", "port": 6033},
+              {"from": "proxysql", "to": "mysql", "protocol": "tcp", "port": 3306}],
+}
+
+
+def _document(ir, fenced=False, preamble="The INFRASTRUCTURE_IR below describes the components."):
+    block = json.dumps(ir, indent=2)
+    if fenced:
+        block = f"```json\n{block}\n```"
+    return (f"{preamble}\n- [R1] (sources: doc/a.txt) Internal load balancer\n"
+            f"- [R2] (sources: doc/a.txt) ProxySQL instances\n- [R3] (sources: doc/b.png) MySQL\n"
+            f"INFRASTRUCTURE_IR\n{block}\n{ANALYSIS_COMPLETE}")
+
+
+def test_marker_mentioned_in_a_sentence_is_not_a_block():
+    infrastructure = extract_infrastructure_ir(_document(IR))
+    assert infrastructure is not None and [component.id for component in infrastructure.components] == \
+        ["ilb", "proxysql", "mysql"]
+    assert extract_infrastructure_ir(_document(IR, fenced=True)).region == "us-central1"
+    assert extract_infrastructure_ir("Write the INFRASTRUCTURE_IR {\"components\": []} later") is None
+    assert extract_infrastructure_ir("INFRASTRUCTURE_IR_ERROR\n- no components") is None
+
+
+def test_valid_ir_is_compacted():
+    document = _document(IR, fenced=True)
+    compacted, errors = compact_infrastructure_ir(document, ["R1", "R2", "R3"])
+    assert errors == []
+    assert len(compacted) < len(document) and "```" not in compacted
+    assert compacted.endswith(ANALYSIS_COMPLETE)
+    assert extract_infrastructure_ir(compacted).to_dict() == InfrastructureIR.from_dict(IR).to_dict()
+
+
+def test_invalid_ir_reports_problems():
+    ir = json.loads(json.dumps(IR))
+    ir["components"][1]["scaling"] = {"min": 5, "max": 2, "target": 60}
+    ir["components"][2]["id"] = "MySQL DB"
+    ir["components"][0]["zones"] = ["europe-west1-b"]
+    ir["links"].append({"from": "ilb", "to": "redis", "port": 70000})
+    compacted, errors = compact_infrastructure_ir(_document(ir), ["R1", "R2"])
+    assert "INFRASTRUCTURE_IR\n{" not in compacted
+    assert any("invalid scaling range 5..2" in error for error in errors)
+    assert any("scaling target" in error for error in errors)
+    assert any("unknown zones europe-west1-b" in error for error in errors)
+    assert any("unknown requirements R3" in error for error in errors)
+    assert any("unknown component 'redis'" in error for error in errors)
+    assert any("invalid port 70000" in error for error in errors)
+
+
+def test_malformed_json_is_reported_and_removed():
+    document = "- [R1] (sources: a) x\nINFRASTRUCTURE_IR\n{\"components\": [\n" + ANALYSIS_COMPLETE
+    compacted, errors = compact_infrastructure_ir(document)
+    assert compacted == "- [R1] (sources: a) x\n" + ANALYSIS_COMPLETE
+    assert errors[0].startswith("unreadable INFRASTRUCTURE_IR")
+
+
+def test_malformed_fenced_json_is_removed_up_to_the_fence():
+    document = ("- [R1] (sources: a) x\nINFRASTRUCTURE_IR:\n```json\n{\"components\": [}\n```\n"
+                "- [R2] (sources: b) y\n" + ANALYSIS_COMPLETE)
+    compacted, errors = compact_infrastructure_ir(document)
+    assert compacted == "- [R1] (sources: a) x\n\n- [R2] (sources: b) y\n" + ANALYSIS_COMPLETE
+    assert "INFRASTRUCTURE_IR" not in compacted and len(errors) == 1
+
+
+def test_slice_keeps_neighbors_by_id_only():
+    infrastructure = InfrastructureIR.from_dict(IR)
+    sliced = infrastructure.slice(["R2"])
+    assert [component.id for component in sliced.components] == ["proxysql", "ilb", "mysql"]
+    assert sliced.components[1].to_dict() == {"id": "ilb", "kind": "internal_load_balancer"}
+    assert len(sliced.links) == 2
+    assert infrastructure.digest() == InfrastructureIR.from_dict(json.loads(json.dumps(IR))).digest()
+
+
+def test_ir_error_status_is_routed_back():
+    assert message_status(f"{INFRASTRUCTURE_IR_ERROR}\n- no components\n\n[R1] x {ANALYSIS_COMPLETE}") == \
+        INFRASTRUCTURE_IR_ERROR
+    assert message_status(_document(IR)) == ANALYSIS_COMPLETE
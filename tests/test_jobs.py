@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from src.pipeline.instrumentation import RunCancelledError
+from src.pipeline.jobs import CANCELLED, FAILED, SUCCEEDED, JobQueue
+from src.pipeline.routing import execute_tool_requests
+
+
+def test_jobs_run_and_finish():
+    def run_job(job):
+        if job.source_dir == "broken":
+            raise ValueError("bad project")
+        return job.source_dir != "unchecked"
+
+    queue = JobQueue(run_job, max_workers=2)
+    ok = queue.submit("alice", "project", "dest")
+    broken = queue.submit("alice", "broken", "dest")
+    unchecked = queue.submit("alice", "unchecked", "dest")
+    for job in (ok, broken, unchecked):
+        job.future.result(timeout=5)
+    assert ok.status == SUCCEEDED
+    assert broken.status == FAILED and "bad project" in broken.message
+    assert unchecked.status == FAILED and "did not complete" in unchecked.message
+    assert queue.jobs_for_user("alice")[0] is unchecked
+
+
+def test_concurrent_submits_respect_max_pending():
+    release = threading.Event()
+    queue = JobQueue(lambda job: release.wait(5), max_workers=1, max_pending=5)
+    accepted, rejected = [], []
+    start = threading.Barrier(20)
+
+    def submit():
+        start.wait()
+        try:
+            accepted.append(queue.submit("bob", "project", "dest"))
+        except RuntimeError:
+            rejected.append(True)
+
+    threads = [threading.Thread(target=submit) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    assert len(accepted) == 5 and len(rejected) == 15
+    for job in accepted:
+        job.future.result(timeout=5)
+
+
+def test_cancel_running_job():
+    started = threading.Event()
+
+    def run_job(job):
+        started.set()
+        while True:
+            job.trace.check_cancelled()
+            threading.Event().wait(0.01)
+
+    queue = JobQueue(run_job, max_workers=1)
+    job = queue.submit("carol", "project", "dest")
+    assert started.wait(5)
+    assert queue.cancel(job.id, user="dave") is False
+    assert queue.cancel(job.id, user="carol") is True
+    job.future.result(timeout=5)
+    assert job.status == CANCELLED
+
+
+def test_tool_errors_are_reported_but_cancellation_propagates():
+    def failing(path):
+        raise OSError("no such file")
+
+    def cancelled(path):
+        raise RunCancelledError("Run 'x' was cancelled")
+
+    result = execute_tool_requests([("read", {"path": "a"})], {"read": failing})
+    assert "Error: no such file" in result
+    with pytest.raises(RunCancelledError):
+        execute_tool_requests([("read", {"path": "a"})], {"read": cancelled})
@@ -0,0 +1,72 @@
+import os
+import time
+
+from src.cache.llm_cache import file_digest, LLMResponseCache
+
+
+def test_set_and_get(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path)
+    key = LLMResponseCache.make_key("digest", "prompt", "model")
+    assert cache.get(key) is None
+    cache.set(key, {"content": "diagram"})
+    assert cache.get(key) == {"content": "diagram"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_key_depends_on_content_prompt_and_model():
+    keys = {
+        LLMResponseCache.make_key("a", "prompt", "model"),
+        LLMResponseCache.make_key("b", "prompt", "model"),
+        LLMResponseCache.make_key("a", "other", "model"),
+        LLMResponseCache.make_key("a", "prompt", "other"),
+    }
+    assert len(keys) == 4
+
+
+def test_disabled_cache(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path, enabled=False)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+    assert not any(tmp_path.iterdir())
+
+
+def test_expired_entry(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path, max_age_seconds=60)
+    cache.set("key", "value")
+    old = time.time() - 120
+    os.utime(cache._entry_path("key"), (old, old))
+    assert cache.get("key") is None
+    assert not cache._entry_path("key").exists()
+
+
+def test_evicts_least_recently_used_above_max_entries(tmp_path):
+    cache = LLMResponseCache(cache_dir=tmp_path, max_entries=2)
+    for index, key in enumerate(["a", "b", "c"]):
+        cache.set(key, key)
+        modified = time.time() - 100 + index
+        os.utime(cache._entry_path(key), (modified, modified))
+    cache.set("d", "d")
+    assert [key for key in "abcd" if cache._entry_path(key).exists()] == ["c", "d"]
+
+
+def test_usage_is_tracked_without_scanning(tmp_path, monkeypatch):
+    cache = LLMResponseCache(cache_dir=tmp_path, max_entries=100)
+    cache.set("a", "a")
+    scans = []
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1))
+    cache.set("b", "b")
+    cache.set("b", "bb")
+    assert scans == []
+    assert cache._usage[0] == 2
+
+
+def test_cache_dir_expands_user(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache = LLMResponseCache(cache_dir="~/llm-cache")
+    assert cache.cache_dir == tmp_path / "llm-cache"
+
+
+def test_file_digest(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"x" * 3000)
+    assert file_digest(path, chunk_size=1000) == file_digest(path)
@@ -0,0 +1,97 @@
+from src.pipeline.manifest import GenerationManifest, parse_requirements, scan_terraform_modules
+
+REQUIREMENTS = """
+- [R1] (sources: app/Dockerfile) Containerized web application
+- [R2] (sources: db/schema.sql, docs/arch.png) MySQL database with a replica
+"""
+
+SOURCE_HASHES = {"app/Dockerfile": "a1", "db/schema.sql": "b1", "docs/arch.png": "c1"}
+
+
+def _write_terraform(dest):
+    terraform = dest / "terraform"
+    (terraform / "modules" / "app").mkdir(parents=True)
+    (terraform / "modules" / "db").mkdir(parents=True)
+    (terraform / "main.tf").write_text('module "app" {}\n')
+    (terraform / "modules" / "app" / "main.tf").write_text("# Requirements: R1\nresource \"x\" \"app\" {}\n")
+    (terraform / "modules" / "db" / "main.tf").write_text("# Requirements: R2\nresource \"x\" \"db\" {}\n")
+    return terraform
+
+
+def _saved_manifest(dest, message=None):
+    terraform = _write_terraform(dest)
+    manifest = GenerationManifest.load(dest)
+    manifest.update(SOURCE_HASHES, REQUIREMENTS, terraform, message)
+    manifest.save()
+    return GenerationManifest.load(dest), terraform
+
+
+def test_parse_requirements():
+    requirements = parse_requirements(REQUIREMENTS)
+    assert requirements["R2"]["sources"] == ["db/schema.sql", "docs/arch.png"]
+    assert requirements["R1"]["text"] == "Containerized web application"
+
+
+def test_scan_terraform_modules(tmp_path):
+    modules = scan_terraform_modules(_write_terraform(tmp_path))
+    assert set(modules) == {"terraform", "terraform/modules/app", "terraform/modules/db"}
+    assert modules["terraform/modules/db"]["requirements"] == ["R2"]
+
+
+def test_first_run_is_full(tmp_path):
+    plan = GenerationManifest.load(tmp_path).plan(SOURCE_HASHES, tmp_path / "terraform")
+    assert plan.full_run and not plan.up_to_date
+
+
+def test_unchanged_project_is_up_to_date(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    assert manifest.plan(SOURCE_HASHES, terraform).up_to_date
+
+
+def test_changed_source_affects_its_modules(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    plan = manifest.plan(dict(SOURCE_HASHES, **{"docs/arch.png": "c2"}), terraform)
+    assert not plan.full_run
+    assert plan.changed_sources == ["docs/arch.png"]
+    assert plan.affected_requirements == ["R2"]
+    assert plan.affected_modules == ["terraform/modules/db"]
+
+
+def test_removed_source(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    hashes = {path: digest for path, digest in SOURCE_HASHES.items() if path != "app/Dockerfile"}
+    plan = manifest.plan(hashes, terraform)
+    assert plan.removed_sources == ["app/Dockerfile"]
+    assert plan.affected_modules == ["terraform/modules/app"]
+
+
+def test_edited_module_is_affected(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    (terraform / "modules" / "app" / "main.tf").write_text("# Requirements: R1\nresource \"x\" \"edited\" {}\n")
+    plan = manifest.plan(SOURCE_HASHES, terraform)
+    assert not plan.up_to_date
+    assert plan.changed_modules == ["terraform/modules/app"]
+    assert plan.affected_requirements == ["R1"]
+    assert plan.affected_modules == ["terraform/modules/app"]
+
+
+def test_removed_module_is_affected(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    (terraform / "modules" / "db" / "main.tf").unlink()
+    plan = manifest.plan(SOURCE_HASHES, terraform)
+    assert plan.changed_modules == ["terraform/modules/db"]
+    assert plan.affected_modules == ["terraform/modules/db"]
+
+
+def test_missing_terraform_folder_is_a_full_run(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path)
+    for path in sorted(terraform.rglob("*.tf")):
+        path.unlink()
+    assert manifest.plan(SOURCE_HASHES, terraform).full_run
+
+
+def test_changed_message_is_a_full_run(tmp_path):
+    manifest, terraform = _saved_manifest(tmp_path, message="Use GKE")
+    assert manifest.plan(SOURCE_HASHES, terraform, "Use GKE").up_to_date
+    assert manifest.plan(SOURCE_HASHES, terraform, "Use Cloud Run").full_run
+    assert manifest.plan(SOURCE_HASHES, terraform).full_run
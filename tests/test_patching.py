@@ -0,0 +1,64 @@
+import pytest
+
+from src.tools import patching
+from src.tools.patching import apply_unified_diff, atomic_write, file_hash, replace_block
+
+ORIGINAL = "\n".join(f"line {number}" for number in range(1, 11)) + "\n"
+
+
+def test_apply_unified_diff():
+    diff = "--- a/main.tf\n+++ b/main.tf\n@@ -2,3 +2,3 @@\n line 2\n-line 3\n+line three\n line 4\n"
+    assert apply_unified_diff(ORIGINAL, diff) == ORIGINAL.replace("line 3\n", "line three\n")
+
+
+def test_apply_unified_diff_tolerates_offsets_and_trailing_whitespace():
+    original = "header\n\n" + ORIGINAL.replace("line 8\n", "line 8   \n")
+    diff = "@@ -7,3 +7,2 @@\n line 7\n-line 8\n line 9\n@@ -1,1 +1,2 @@\n header\n+# added\n"
+    with pytest.raises(ValueError):
+        # Hunks are applied in order, the second one lies before the first
+        apply_unified_diff(original, diff)
+    diff = "@@ -1,1 +1,2 @@\n header\n+# added\n@@ -7,3 +8,2 @@\n line 7\n-line 8\n line 9\n"
+    patched = apply_unified_diff(original, diff)
+    assert patched.startswith("header\n# added\n\nline 1\n")
+    assert "line 7\nline 9\n" in patched and "line 8" not in patched
+
+
+def test_apply_unified_diff_rejects_mismatched_context():
+    with pytest.raises(ValueError, match="does not apply near line 2"):
+        apply_unified_diff(ORIGINAL, "@@ -2,2 +2,2 @@\n line 2\n-line thirty\n+line 30\n")
+    with pytest.raises(ValueError, match="No hunks"):
+        apply_unified_diff(ORIGINAL, "just some text\n")
+
+
+def test_replace_block():
+    text = 'variable "a" {\n  type = string\n}\n\nvariable "b" {\n  type = number\n}\n'
+    replaced = replace_block(text, 'variable "a"', 'variable "a" {\n  type = bool\n}')
+    assert replaced == text.replace("type = string", "type = bool")
+    appended = replace_block(text, 'variable "c"', 'variable "c" {}\n')
+    assert appended == text + '\nvariable "c" {}\n'
+    removed = replace_block(text, 'variable "b"', "")
+    assert 'variable "b"' not in removed and removed.startswith('variable "a" {\n  type = string\n}')
+    assert replace_block(text, 'variable "c"', "") == text
+    assert replace_block("", 'variable "c"', 'variable "c" {}') == 'variable "c" {}\n'
+
+
+def test_atomic_write_skips_identical_content(tmp_path):
+    path = tmp_path / "nested" / "main.tf"
+    assert atomic_write(str(path), "a = 1\n")
+    modified = path.stat().st_mtime_ns
+    assert not atomic_write(str(path), "a = 1\n")
+    assert path.stat().st_mtime_ns == modified
+    assert atomic_write(str(path), "a = 2\n") and path.read_text() == "a = 2\n"
+    assert [item.name for item in path.parent.iterdir()] == ["main.tf"]
+    assert file_hash(str(tmp_path / "missing.tf")) is None
+
+
+def test_atomic_write_keeps_permissions(tmp_path, monkeypatch):
+    path = tmp_path / "run.sh"
+    path.write_text("echo 1\n")
+    path.chmod(0o754)
+    assert atomic_write(str(path), "echo 2\n")
+    assert path.stat().st_mode & 0o777 == 0o754
+    monkeypatch.setattr(patching, "UMASK", 0o022)
+    assert atomic_write(str(tmp_path / "new.tf"), "a = 1\n")
+    assert (tmp_path / "new.tf").stat().st_mode & 0o777 == 0o644
@@ -0,0 +1,38 @@
+import pytest
+
+from src.pipeline.instrumentation import RunCancelledError
+from src.pipeline.planner import ModuleSpec, run_planned_generation
+
+DOCUMENT = "- [REQ-1] Redis cache for sessions\n- [REQ-2] Nightly report export\nANALYSIS_COMPLETE"
+
+
+class FailingClient:
+    def __init__(self, error):
+        self.error = error
+
+    def create(self, messages):
+        raise self.error
+
+
+def test_planner_errors_leave_requirements_to_the_generator(tmp_path):
+    specs, remaining = run_planned_generation(FailingClient(TimeoutError("read timed out")), DOCUMENT,
+                                              ["REQ-1", "REQ-2"], "", tmp_path, write_file=None)
+    assert specs == [] and remaining == ["REQ-1", "REQ-2"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_planner_cancellation_propagates(tmp_path):
+    with pytest.raises(RunCancelledError):
+        run_planned_generation(FailingClient(RunCancelledError("cancelled")), DOCUMENT, ["REQ-1"], "", tmp_path,
+                               write_file=None)
+
+
+def test_module_spec_skips_malformed_interface_entries():
+    spec = ModuleSpec.from_dict({"name": "Session_Cache", "requirements": ["REQ-1"],
+                                 "variables": ["memory_size_gb", {"name": "tier", "type": "string"}, {}],
+                                 "outputs": [None, {"name": "host"}], "inputs": None})
+    assert spec.name == "session-cache"
+    assert [variable["name"] for variable in spec.variables] == ["tier"]
+    assert [output["name"] for output in spec.outputs] == ["host"]
+    with pytest.raises(ValueError):
+        ModuleSpec.from_dict({"name": "9 bad name"})
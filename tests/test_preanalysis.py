@@ -0,0 +1,68 @@
+import os
+import struct
+from pathlib import Path
+
+import pytest
+
+from src.pipeline.preanalysis import build_preanalysis_bundle, classify_file
+
+
+def _png(path, width, height):
+    path.write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR" + struct.pack(">II", width, height) + b"\x00" * 8)
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path_factory, monkeypatch):
+    monkeypatch.setenv("RELEVANCE_INDEX_DIR", str(tmp_path_factory.mktemp("index")))
+
+
+def test_classify_skips_lockfiles_and_generic_data():
+    assert classify_file("package-lock.json") is None
+    assert classify_file("src/fixtures/users.json") is None
+    assert classify_file("deploy/task-definition.json") == "text"
+    assert classify_file("docker-compose.yml") == "text"
+    assert classify_file("doc/diagram.png") == "image"
+
+
+def test_bundle_respects_byte_budget_and_ranking(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "architecture.md").write_text("kubernetes cluster with mysql database and load balancer\n")
+    (tmp_path / "notes.txt").write_text("lunch menu " * 200)
+    (tmp_path / "package-lock.json").write_text("{}")
+    bundle = build_preanalysis_bundle(tmp_path, max_bytes=500)
+    assert "## File: docs/architecture.md" in bundle
+    assert "## File: notes.txt" not in bundle
+    assert "- notes.txt" in bundle
+    assert "package-lock.json" not in bundle
+
+
+def test_bundle_caps_images_and_skips_icons(tmp_path):
+    for index in range(4):
+        _png(tmp_path / f"diagram{index}.png", 1024, 768)
+    _png(tmp_path / "icon.png", 32, 32)
+    described = []
+
+    def describer(image_path, work_dir):
+        described.append(image_path)
+        return {"content": f"description of {image_path}"}
+
+    bundle = build_preanalysis_bundle(tmp_path, image_describer=describer, max_images=2)
+    assert len(described) == 2
+    assert "icon.png" not in bundle
+    assert bundle.count("## Image:") == 2
+
+
+def test_bundle_keeps_truncated_images(tmp_path):
+    _png(tmp_path / "diagram.png", 1024, 768)
+    (tmp_path / "broken.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR\x00\x00")
+    bundle = build_preanalysis_bundle(tmp_path, image_describer=lambda image_path, work_dir: {"content": "boxes"})
+    assert "## Image: diagram.png" in bundle and "## Image: broken.png" in bundle
+
+
+def test_bundle_without_index_ranks_by_path(tmp_path):
+    (tmp_path / "terraform").mkdir()
+    (tmp_path / "terraform" / "main.tf").write_text('resource "google_compute_network" "main" {}\n')
+    (tmp_path / "readme.txt").write_text("hello " * 100)
+    bundle = build_preanalysis_bundle(tmp_path, max_bytes=100, use_index=False)
+    assert "## File: terraform/main.tf" in bundle and "- readme.txt" in bundle
+    assert not any(Path(os.environ["RELEVANCE_INDEX_DIR"]).iterdir())
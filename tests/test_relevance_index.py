@@ -0,0 +1,65 @@
+import threading
+
+from src.pipeline.relevance_index import RelevanceIndex, split_text
+
+
+def _project(root):
+    (root / "k8s").mkdir(parents=True)
+    (root / "k8s" / "deployment.yaml").write_text(
+        "apiVersion: apps/v1\nkind: Deployment\nspec:\n  replicas: 3\n  image: shop:1.0\n")
+    (root / "Dockerfile").write_text("FROM python:3.11\nEXPOSE 8080\n")
+    (root / "app.py").write_text("def add(a, b):\n    return a + b\n")
+    (root / "docs").mkdir()
+    (root / "docs" / "arch.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    return root
+
+
+def test_split_text_covers_all_lines():
+    text = "\n".join(f"line {number}" for number in range(1, 101))
+    chunks = split_text(text, 200, 20)
+    assert chunks[0][0] == 1 and chunks[-1][1] == 100
+    assert all(start <= end for start, end in chunks)
+
+
+def test_search_ranks_infrastructure_files_first(tmp_path):
+    root = _project(tmp_path / "project")
+    index = RelevanceIndex(root, index_dir=tmp_path / "index")
+    assert index.update() == {"files": 4, "changed": 4, "removed": 0}
+    paths = [result["path"] for result in index.search(top_k=10)]
+    assert paths[0] == "k8s/deployment.yaml"
+    assert "app.py" not in paths[:2]
+    # Unchanged files are not re-indexed, the index is persisted
+    assert RelevanceIndex(root, index_dir=tmp_path / "index").update()["changed"] == 0
+
+
+def test_format_results_skips_vanished_files(tmp_path):
+    root = _project(tmp_path / "project")
+    index = RelevanceIndex(root, index_dir=tmp_path / "index")
+    index.update()
+    results = index.search("deployment replicas dockerfile expose", top_k=10)
+    (root / "k8s" / "deployment.yaml").unlink()
+    text = index.format_results(results)
+    assert "k8s/deployment.yaml" not in text
+    assert "## File: Dockerfile" in text
+
+
+def test_search_during_update(tmp_path):
+    root = _project(tmp_path / "project")
+    index = RelevanceIndex(root, index_dir=tmp_path / "index")
+    index.update()
+    errors = []
+
+    def search():
+        try:
+            for _ in range(50):
+                index.search(top_k=5)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=search)
+    thread.start()
+    for number in range(20):
+        (root / f"service{number}.yaml").write_text(f"kind: Service\nport: {8000 + number}\n")
+        index.update()
+    thread.join()
+    assert errors == []
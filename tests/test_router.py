@@ -0,0 +1,118 @@
+import gzip
+import json
+import socket
+
+import httpx
+import pytest
+
+from benchmarks.stub_server import start_stub_server
+from src.llm.router import LLMBackend, LLMRouter, _UsageStream, parse_routes, parse_usage
+
+
+@pytest.fixture
+def stub_url(tmp_path):
+    recording = tmp_path / "recording.json"
+    recording.write_text(json.dumps({"rules": [], "default": "OK from stub"}))
+    server, backend = start_stub_server(str(recording))
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def _closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+
+
+def _backend(name, base_url, configured=True):
+    return LLMBackend(name, [{"model": "stub" if configured else "", "base_url": base_url, "api_key": "x"}],
+                      max_retries=0)
+
+
+def _complete(router, task, content="hello"):
+    """
+    Try the config list of the task in order the way autogen clients fail over between configs.
+    """
+    for entry in router.llm_config(task)["config_list"]:
+        try:
+            response = entry["http_client"].post(f"{entry['base_url']}/chat/completions",
+                                                  json={"model": entry["model"],
+                                                        "messages": [{"role": "user", "content": content}]})
+        except httpx.ConnectError:
+            continue
+        return entry, response.json()
+    raise RuntimeError("all backends failed")
+
+
+def test_parse_routes():
+    assert parse_routes("summarization:ollama, generation:openai>ollama,broken") == {
+        "summarization": ["ollama"], "generation": ["openai", "ollama"]}
+
+
+def test_parse_usage_from_json_and_stream_tail():
+    body = b'{"choices": [], "usage": {"prompt_tokens": 12, "completion_tokens": 5, ' \
+           b'"completion_tokens_details": {"reasoning_tokens": 0}}}'
+    assert parse_usage(body) == {"prompt_tokens": 12, "completion_tokens": 5}
+    stream = b'data: {"usage": null}\n\ndata: {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 3}}\n\n'
+    assert parse_usage(stream) == {"prompt_tokens": 7, "completion_tokens": 3}
+    assert parse_usage(b"no usage") == {}
+
+
+def test_usage_stream_decodes_gzip():
+    body = json.dumps({"filler": "x" * 10000, "usage": {"prompt_tokens": 4, "completion_tokens": 2}}).encode()
+    compressed = gzip.compress(body)
+    usages = []
+    stream = _UsageStream(httpx.ByteStream(compressed), "gzip", usages.append)
+    assert b"".join(stream) == compressed
+    stream.close()
+    stream.close()
+    assert usages == [{"prompt_tokens": 4, "completion_tokens": 2}]
+
+
+def test_stats_counted_when_body_is_closed(stub_url):
+    backend = _backend("openai", stub_url)
+    try:
+        # Streamed requests are not coalesced, the body comes straight from the connection
+        request = {"model": "stub", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+        with backend.http_client.stream("POST", f"{stub_url}/chat/completions", json=request) as response:
+            # The hook did not read the body, it is still a stream for the caller
+            assert not response.is_stream_consumed
+            assert backend.stats.summary()["completion_tokens"] == 0
+            body = json.loads(b"".join(response.iter_bytes(chunk_size=16)))
+        stats = backend.stats.summary()
+        assert body["choices"][0]["message"]["content"] == "OK from stub"
+        assert stats["requests"] == 1 and stats["errors"] == 0
+        assert stats["prompt_tokens"] == body["usage"]["prompt_tokens"]
+        assert stats["completion_tokens"] == body["usage"]["completion_tokens"]
+    finally:
+        backend.close()
+
+
+def test_routing_and_failover(stub_url):
+    backends = {"openai": _backend("openai", _closed_port_url()), "ollama": _backend("ollama", stub_url)}
+    router = LLMRouter(backends, {"generation": ["openai"], "summarization": ["ollama"]}, "openai")
+    try:
+        assert [backend.name for backend in router.backends_for("generation")] == ["openai", "ollama"]
+        assert [backend.name for backend in router.backends_for("summarization")] == ["ollama"]
+        entry, body = _complete(router, "generation")
+        assert entry["base_url"] == stub_url
+        assert body["choices"][0]["message"]["content"] == "OK from stub"
+        stats = router.stats()
+        assert stats["openai"]["failed_connections"] == 1
+        assert stats["ollama"]["requests"] == 1 and stats["ollama"]["prompt_tokens"] > 0
+        assert "ollama" in router.format_stats_table()
+    finally:
+        router.close()
+
+
+def test_no_failover_for_local_tasks_and_unconfigured_backends(stub_url):
+    backends = {"openai": _backend("openai", stub_url), "ollama": _backend("ollama", stub_url, configured=False)}
+    router = LLMRouter(backends, {"summarization": ["ollama"]}, "openai")
+    try:
+        assert router.backends_for("summarization") == []
+        assert router.summarizer() is None
+        router.failover = False
+        assert [backend.name for backend in router.backends_for("generation")] == ["openai"]
+    finally:
+        router.close()
@@ -0,0 +1,20 @@
+from src.pipeline.routing import generation_succeeded
+
+
+def _messages(*contents):
+    return [{"content": content} for content in contents]
+
+
+def test_generation_succeeded_after_checked_scripts():
+    assert generation_succeeded(_messages("requirements ANALYSIS_COMPLETE", "written SCRIPTS_GENERATED",
+                                          "EXECUTION_ERROR\nmissing variable", "fixed SCRIPTS_GENERATED",
+                                          "Terraform checks passed"))
+
+
+def test_generation_failed_runs():
+    # Stopped during the analysis, before the executor answered, and out of execution retries
+    assert not generation_succeeded(_messages("requirements ANALYSIS_COMPLETE", "NEED_TOOL\nTool: write_file\n{}"))
+    assert not generation_succeeded(_messages("written SCRIPTS_GENERATED"))
+    assert not generation_succeeded(_messages("written SCRIPTS_GENERATED", "EXECUTION_ERROR\nmissing variable"))
+    assert not generation_succeeded(_messages("```\nSCRIPTS_GENERATED\n```", "Terraform checks passed"))
+    assert not generation_succeeded(None)
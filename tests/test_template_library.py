@@ -0,0 +1,75 @@
+from src.terraform.template_library import format_template_outputs, match_requirements, render_template_plan
+from src.terraform.validator import TerraformValidator
+
+
+def _requirements(*texts):
+    return {f"REQ-{number}": {"text": text, "sources": []} for number, text in enumerate(texts, 1)}
+
+
+def test_match_requirements_adds_dependencies_in_root_order():
+    plan = match_requirements(_requirements(
+        "Cloud SQL PostgreSQL database with high availability",
+        "Prometheus and Grafana monitoring in zone B",
+        "Nightly export of reports to a partner SFTP server",
+    ))
+    assert [instance.name for instance in plan.instances] == ["network", "database", "monitoring"]
+    assert plan.uncovered == ["REQ-3"]
+    assert plan.covered == ["REQ-1", "REQ-2"]
+    assert plan.module_dirs == ["modules/database", "modules/monitoring", "modules/network"]
+    database, monitoring = plan.instances[1], plan.instances[2]
+    assert database.parameters() == {"database_version": "POSTGRES_15", "availability_type": "REGIONAL",
+                                     "binary_log_enabled": False}
+    assert monitoring.parameters() == {"zone": "b"}
+
+
+def test_compute_groups_and_autoscaling():
+    plan = match_requirements(_requirements(
+        "ProxySQL: Compute Engine VMs in zones (A and C)",
+        "Application servers: instance group in zone B",
+        "Autoscale: both ProxySQL and application servers",
+    ))
+    groups = {instance.name: instance for instance in plan.instances if instance.template.multiple}
+    assert sorted(groups) == ["application", "proxysql"]
+    assert groups["proxysql"].requirements == ["REQ-1", "REQ-3"]
+    assert groups["proxysql"].parameters() == {"name": "proxysql", "zones": ["a", "c"], "instance_count": 2,
+                                               "enable_autoscaling": True}
+    assert groups["application"].parameters()["zones"] == ["b"]
+    # Compute nodes are wired to the network and the firewall
+    assert [instance.name for instance in plan.instances][:2] == ["network", "firewall"]
+    assert plan.module_dirs == ["modules/compute-nodes", "modules/firewall", "modules/network"]
+    assert plan.uncovered == []
+
+
+def test_autoscaling_without_groups_is_uncovered():
+    plan = match_requirements(_requirements("VPC network with one subnet", "Autoscale the workers"))
+    assert [instance.name for instance in plan.instances] == ["network"]
+    assert plan.uncovered == ["REQ-2"]
+
+
+def test_render_template_plan(tmp_path):
+    terraform = tmp_path / "terraform"
+    terraform.mkdir()
+    (terraform / "main.tf").write_text('resource "google_storage_bucket" "reports" {\n  name = "reports"\n}\n')
+    (terraform / "terraform.tfvars").write_text('project_id = "shop-prod"\n')
+    plan = match_requirements(_requirements(
+        "Cloud SQL MySQL database",
+        "Web servers: Compute Engine VMs in zones A, B",
+        "Firewall rules for HTTP ingress",
+    ))
+    written = render_template_plan(plan, terraform)
+    assert "terraform/modules/compute-nodes/main.tf" in written and "terraform/main.tf" in written
+
+    main_tf = (terraform / "main.tf").read_text()
+    assert main_tf.startswith("# Requirements: REQ-3, REQ-1, REQ-2\n")
+    assert 'resource "google_storage_bucket" "reports"' in main_tf
+    assert 'module "web" {' in main_tf and "depends_on" in main_tf
+    tfvars = (terraform / "terraform.tfvars").read_text()
+    assert 'project_id = "shop-prod"' in tfvars
+    assert 'web_zones = ["a", "b"]' in tfvars and 'database_database_version = "MYSQL_8_0"' in tfvars
+
+    validator = TerraformValidator(terraform, autofix=False)
+    validator.validate()
+    assert [str(issue) for issue in validator.errors] == []
+    # Rendering the same plan again leaves every file untouched
+    assert render_template_plan(plan, terraform) == []
+    assert "- module.web from modules/compute-nodes (requirements: REQ-2)" in format_template_outputs(plan)
@@ -0,0 +1,157 @@
+import json
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+from src.terraform.executor import StepResult, TerraformRunner, TerraformRunResult, called_modules, \
+    init_fingerprint, parse_diagnostics, sweep_run_dirs, sync_tree
+
+# Stand-in for the terraform CLI: logs its calls, init checks the providers are in the configured filesystem mirror
+FAKE_TERRAFORM = """#!{python}
+import json, os, re, sys
+step = sys.argv[1]
+with open(os.environ["FAKE_TERRAFORM_LOG"], "a") as log:
+    log.write(json.dumps({{"step": step, "cwd": os.getcwd(), "args": sys.argv[2:]}}) + "\\n")
+if step == "init":
+    config = open(os.environ["TF_CLI_CONFIG_FILE"]).read()
+    mirror = re.search(r'path = "([^"]+)"', config).group(1)
+    if "direct" in config or not os.path.isdir(os.path.join(mirror, "registry.terraform.io", "hashicorp", "google")):
+        sys.stderr.write("Error: provider hashicorp/google not found in the mirror")
+        sys.exit(1)
+    os.makedirs(".terraform", exist_ok=True)
+elif step == "validate":
+    # Like terraform, validating a folder covers the modules it calls (here: all subfolders)
+    diagnostics = []
+    for root, dirs, files in os.walk("."):
+        dirs[:] = sorted(name for name in dirs if name != ".terraform")
+        for name in sorted(files):
+            path = os.path.normpath(os.path.join(root, name))
+            if name.endswith(".tf") and "broken" in open(path).read():
+                diagnostics.append({{"severity": "error", "summary": "Unsupported argument",
+                                     "range": {{"filename": path, "start": {{"line": 2}}}}}})
+    print(json.dumps({{"valid": not diagnostics, "diagnostics": diagnostics}}))
+    sys.exit(1 if diagnostics else 0)
+"""
+
+
+@pytest.fixture
+def fake_terraform(tmp_path, monkeypatch):
+    path = tmp_path / "bin" / "terraform"
+    path.parent.mkdir()
+    path.write_text(FAKE_TERRAFORM.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    log = tmp_path / "terraform.log"
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(log))
+    return str(path), log
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    provider = tmp_path / "mirror" / "registry.terraform.io" / "hashicorp" / "google"
+    provider.mkdir(parents=True)
+    return tmp_path / "mirror"
+
+
+def _project(root, broken=False):
+    for module in ("db", "network", "unused"):
+        (root / "modules" / module).mkdir(parents=True)
+        (root / "modules" / module / "main.tf").write_text(f'resource "x" "{module}" {{}}\n')
+    (root / "main.tf").write_text('module "db" {\n  source = "./modules/db"\n}\n'
+                                  'module "network" {\n  source = "./modules/network"\n}\n')
+    # network calls db again
+    (root / "modules" / "network" / "calls.tf").write_text('module "db" {\n  source = "../db"\n}\n')
+    if broken:
+        (root / "modules" / "db" / "main.tf").write_text('resource "x" "db" {\n  broken = true\n}\n')
+    return root
+
+
+def _runner(tmp_path, terraform_bin, mirror_dir, **kwargs):
+    return TerraformRunner(_project(tmp_path / "terraform", kwargs.pop("broken", False)),
+                           work_root=tmp_path / "runs", plugin_cache_dir=tmp_path / "plugins",
+                           mirror_dir=mirror_dir, offline=True, terraform_bin=terraform_bin, **kwargs)
+
+
+def _calls(log):
+    return [json.loads(line) for line in log.read_text().splitlines()]
+
+
+def test_called_modules(tmp_path):
+    assert called_modules(_project(tmp_path)) == {"modules/db", "modules/network"}
+
+
+def test_root_and_uncalled_modules_are_checked_with_the_mirror(tmp_path, fake_terraform, mirror):
+    terraform_bin, log = fake_terraform
+    runner = _runner(tmp_path, terraform_bin, mirror)
+    result = runner.run()
+    assert result.ok, result.summary()
+    checked = sorted({(call["step"], os.path.relpath(call["cwd"], runner.work_dir)) for call in _calls(log)})
+    assert checked == [("init", "."), ("init", "modules/unused"), ("validate", "."), ("validate", "modules/unused")]
+    assert 'filesystem_mirror' in (runner.run_dir / "terraform.rc").read_text()
+
+    # A retry of the same run reuses the initialized folders
+    log.write_text("")
+    result = runner.run()
+    assert all(step.skipped for step in result.steps if step.step == "init")
+    assert {call["step"] for call in _calls(log)} == {"validate"}
+    runner.cleanup()
+    assert not runner.run_dir.exists()
+
+
+def test_init_fails_without_provider_in_mirror(tmp_path, fake_terraform):
+    terraform_bin, _ = fake_terraform
+    empty_mirror = tmp_path / "empty"
+    empty_mirror.mkdir()
+    result = _runner(tmp_path, terraform_bin, empty_mirror).run()
+    assert not result.ok
+    assert any("not found in the mirror" in issue.message for issue in result.issues())
+
+
+def test_diagnostics_are_reported_once(tmp_path, fake_terraform, mirror):
+    terraform_bin, _ = fake_terraform
+    result = _runner(tmp_path, terraform_bin, mirror, broken=True).run()
+    issues = [str(issue) for issue in result.issues()]
+    assert issues == ["error: modules/db/main.tf:2: terraform validate: Unsupported argument"]
+
+
+def test_issues_are_deduplicated_by_file_line_and_summary():
+    diagnostic = [{"severity": "error", "summary": "Unsupported argument",
+                   "range": {"filename": "main.tf", "start": {"line": 2}}}]
+    steps = [StepResult("validate", "", 1, 0.1, parse_diagnostics(diagnostic, "modules/db")),
+             StepResult("validate", "modules/db", 1, 0.1, parse_diagnostics(diagnostic, "modules/db"))]
+    assert len(TerraformRunResult(steps).issues()) == 1
+
+
+def test_old_run_dirs_are_swept(tmp_path, fake_terraform, mirror):
+    terraform_bin, _ = fake_terraform
+    old_run = tmp_path / "runs" / "old"
+    recent_run = tmp_path / "runs" / "recent"
+    old_run.mkdir(parents=True)
+    recent_run.mkdir()
+    past = time.time() - 48 * 3600
+    os.utime(old_run, (past, past))
+    runner = _runner(tmp_path, terraform_bin, mirror)
+    runner.run()
+    assert not old_run.exists() and recent_run.exists() and runner.run_dir.exists()
+    assert sweep_run_dirs(tmp_path / "runs", 0) == 0
+
+
+def test_sync_tree_keeps_init_state(tmp_path):
+    source = _project(tmp_path / "source")
+    target = tmp_path / "target"
+    assert sync_tree(source, target) == 5
+    (target / ".terraform").mkdir()
+    (target / ".terraform.lock.hcl").write_text("lock")
+    fingerprint = init_fingerprint(target)
+    # Resource bodies don't change what init installs
+    (source / "modules" / "db" / "main.tf").write_text('resource "x" "db" {\n  name = "db"\n}\n')
+    os.utime(source / "modules" / "db" / "main.tf", (time.time() + 5, time.time() + 5))
+    # Files removed from the sources are removed from the run directory
+    (target / "modules" / "unused" / "calls.tf").write_text('module "db" {\n  source = "../db"\n}\n')
+    assert sync_tree(source, target) == 1
+    assert 'name = "db"' in (target / "modules" / "db" / "main.tf").read_text()
+    assert (target / ".terraform").is_dir() and (target / ".terraform.lock.hcl").is_file()
+    assert not (target / "modules" / "unused" / "calls.tf").exists()
+    assert init_fingerprint(target) == fingerprint
@@ -0,0 +1,104 @@
+from src.terraform.validator import TerraformValidator, infer_type, strip_comments
+
+
+def _write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def _project(tmp_path):
+    terraform = tmp_path / "terraform"
+    _write(terraform / "main.tf", '''
+module "db" {
+  source   = "./modules/db"
+  name     = var.name
+  replicas = 2
+  tier     = "db-n1"
+}
+
+output "endpoint" {
+  value = module.db.endpoint
+}
+''')
+    _write(terraform / "variables.tf", '''
+variable "name" {}
+
+variable "region" {
+  default = "us-central1"
+}
+''')
+    _write(terraform / "outputs.tf", "")
+    _write(terraform / "terraform.tfvars", 'name = "shop"\nproject_id = "demo"\n')
+    _write(terraform / "modules" / "db" / "main.tf", '''
+resource "google_sql_database_instance" "main" {
+  name = var.name  # var.not_a_reference
+  tier = var.tier
+  settings { replicas = var.replicas }
+}
+''')
+    _write(terraform / "modules" / "db" / "variables.tf", 'variable "name" {}\n')
+    _write(terraform / "modules" / "db" / "outputs.tf", 'output "endpoint" {\n  value = "x"\n}\n')
+    return terraform
+
+
+def test_strip_comments_keeps_offsets():
+    text = 'a = "#not a comment" # comment\n/* block\n */ b = 1'
+    stripped = strip_comments(text)
+    assert len(stripped) == len(text) and stripped.count("\n") == text.count("\n")
+    assert '"#not a comment"' in stripped and "comment\n" not in stripped.split('"')[-1]
+
+
+def test_infer_type():
+    assert infer_type('"db-n1"') == "string"
+    assert infer_type("2") == "number"
+    assert infer_type("true") == "bool"
+    assert infer_type("var.name") == "any"
+    assert infer_type("[1, 2]") == "any"
+
+
+def test_autofix_declares_variables_with_types(tmp_path):
+    terraform = _project(tmp_path)
+    validator = TerraformValidator(terraform)
+    issues = validator.validate()
+    assert validator.errors == []
+    fixed = [issue.message for issue in issues if issue.fixed]
+    assert any("'replicas'" in message for message in fixed) and any("'tier'" in message for message in fixed)
+    variables = (terraform / "modules" / "db" / "variables.tf").read_text()
+    assert 'variable "replicas" {\n  description = "replicas"\n  type        = number\n}' in variables
+    assert 'type        = string' in variables
+    tfvars = (terraform / "terraform.tfvars").read_text()
+    assert 'region = "us-central1"' in tfvars
+    # A second run finds nothing left to fix
+    assert [issue for issue in TerraformValidator(terraform).validate() if not issue.warning] == []
+
+
+def test_undeclared_tfvars_values_are_warnings(tmp_path):
+    terraform = _project(tmp_path)
+    validator = TerraformValidator(terraform)
+    validator.validate()
+    assert [str(issue) for issue in validator.warnings] == [
+        "warning: terraform/terraform.tfvars:2: 'project_id' is not declared in terraform/variables.tf"]
+
+
+def test_missing_conventional_files_are_warnings_and_not_created(tmp_path):
+    terraform = _project(tmp_path)
+    (terraform / "outputs.tf").unlink()
+    validator = TerraformValidator(terraform)
+    validator.validate()
+    assert not (terraform / "outputs.tf").exists()
+    assert any("missing conventional file outputs.tf" in issue.message for issue in validator.warnings)
+    assert validator.errors == []
+
+
+def test_errors_without_autofix(tmp_path):
+    terraform = _project(tmp_path)
+    _write(terraform / "extra.tf", 'locals {\n  x = module.db.missing\n  y = var.undeclared\n}\n')
+    validator = TerraformValidator(terraform, autofix=False)
+    validator.validate()
+    messages = [issue.message for issue in validator.errors]
+    assert any("module 'db' has no variable 'replicas'" in message for message in messages)
+    assert any("output 'missing' is not declared" in message for message in messages)
+    assert any("var.undeclared is not declared" in message for message in messages)
+    assert any("root variable 'region' has no value" in message for message in messages)
+    assert not (terraform / "modules" / "db" / "variables.tf").read_text().count("replicas")